@@ -0,0 +1,108 @@
+import json
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class Backplane:
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    def add_handler(self, topic: str, handler: Handler):
+        self._handlers.setdefault(topic, []).append(handler)
+
+    async def _dispatch(self, raw: str | bytes):
+        try:
+            envelope = json.loads(raw)
+            topic = envelope["topic"]
+            payload = envelope["payload"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("malformed backplane envelope dropped: %.200r", raw)
+            return
+        for handler in self._handlers.get(topic, []):
+            try:
+                await handler(payload)
+            except Exception:
+                logger.exception("backplane handler for %s failed", topic)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, topic: str, payload: dict):
+        raise NotImplementedError
+
+
+class InMemoryBackplane(Backplane):
+    async def publish(self, topic: str, payload: dict):
+        await self._dispatch(json.dumps({"topic": topic, "payload": payload}, default=str))
+
+
+class RedisBackplane(Backplane):
+    def __init__(self, url: str, channel: str):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self._redis = None
+        self._reader: asyncio.Task | None = None
+
+    async def start(self):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("Для WS_BACKPLANE_URL=redis://... потрібен пакет redis") from e
+        self._redis = redis.from_url(self.url)
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        delay = 0.5
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                delay = 0.5
+                async for msg in pubsub.listen():
+                    if msg.get("type") == "message":
+                        await self._dispatch(msg["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("redis subscription lost; retry in %ss", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def stop(self):
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def publish(self, topic: str, payload: dict):
+        await self._redis.publish(
+            self.channel, json.dumps({"topic": topic, "payload": payload}, default=str)
+        )
+
+
+def create_backplane(url: str, channel: str) -> Backplane:
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackplane(url, channel)
+    if url.startswith("memory://"):
+        return InMemoryBackplane()
+    raise ValueError(f"Непідтримуваний WS_BACKPLANE_URL: {url}")
@@ -1,31 +1,89 @@
+import time
+import threading
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.dependencies import get_db
+from app.database.database import SessionLocal
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Немає такого користувача",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
 
+class AuthError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    id: int
+    username: str
+    email: str
+    gender: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(user.id, user.username, user.email, user.gender, bool(user.is_active))
+
+
+_tokens = TTLCache("auth_tokens", settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL_SECONDS)
+_users = TTLCache("auth_users", settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL_SECONDS)
+_generations: dict[int, int] = {}
+_generations_lock = threading.Lock()
+
+
+def invalidate_user(user_id: int):
+    with _generations_lock:
+        _generations[user_id] = _generations.get(user_id, 0) + 1
+    _users.pop(user_id)
+
+
+def _user_id_from_token(token: str) -> int:
+    user_id = _tokens.get(token)
+    if user_id is not None:
+        return user_id
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        sub = payload.get("sub")
-        if sub is None:
-            raise credentials_exception
-        user_id = int(sub)
-    except (JWTError, ValueError):
-        raise credentials_exception
-    
-    user = db.get(User, user_id)
+        user_id = int(payload["sub"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        raise AuthError("Недійсний токен")
+    exp = payload.get("exp")
+    _tokens.set(token, user_id, ttl=(exp - time.time()) if exp else None)
+    return user_id
+
+
+def authenticate(token: str, db: Session | None = None) -> CurrentUser:
+    user_id = _user_id_from_token(token)
+    user = _users.get(user_id)
+    if user is None:
+        generation = _generations.get(user_id, 0)
+        own_session = db is None
+        db = db or SessionLocal()
+        try:
+            row = db.get(User, user_id)
+            user = CurrentUser.from_user(row) if row is not None else None
+        finally:
+            if own_session:
+                db.close()
+        if user is not None and _generations.get(user_id, 0) == generation:
+            _users.set(user_id, user)
     if user is None or not user.is_active:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise AuthError("Немає такого користувача")
+    return user
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> CurrentUser:
+    try:
+        return authenticate(token, db)
+    except AuthError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Немає такого користувача",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
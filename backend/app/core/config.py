@@ -4,11 +4,56 @@ from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    DATABASE_READ_URL: str = ""
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_SIZE: int = 10000
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE: int = 64
+    LOGIN_FAILURES_PER_IP: int = 30
+    LOGIN_FAILURES_PER_ACCOUNT: int = 5
+    LOGIN_RATE_WINDOW_SECONDS: int = 60
     STORAGE_DIR: str = "/app/storage"
     MAX_FILES_PER_MESSAGE: int = 10
+    MAX_ATTACHMENT_BYTES: int = 50 * 1024 * 1024
+    MAX_MESSAGE_ATTACHMENTS_BYTES: int = 100 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    ATTACHMENT_URL_TTL_SECONDS: int = 3600
+    ATTACHMENT_OFFLOAD: str = ""
+    ATTACHMENT_ACCEL_PREFIX: str = "/protected-attachments/"
+    THUMBNAIL_WORKERS: int = 2
+    THUMBNAIL_QUEUE_SIZE: int = 256
+    SEARCH_TS_CONFIG: str = "simple"
+    WS_BACKPLANE_URL: str = "memory://"
+    WS_BACKPLANE_CHANNEL: str = "chat:ws"
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_SEND_BATCH_SIZE: int = 100
+    WS_SEND_PENDING: int = 5000
+    WS_COMMANDS_IN_FLIGHT: int = 32
+    OUTBOX_BATCH_SIZE: int = 200
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    USER_EVENT_LOG_SIZE: int = 1000
+    USER_EVENT_REPLAY_MAX: int = 500
+    PRESENCE_TTL_SECONDS: float = 60.0
+    PRESENCE_PUBLISH_INTERVAL_SECONDS: float = 1.0
+    PRESENCE_SUBSCRIBE_MAX: int = 500
+    LAST_SEEN_FLUSH_SECONDS: float = 60.0
+    TYPING_TTL_SECONDS: float = 6.0
+    TYPING_FANOUT_INTERVAL_SECONDS: float = 1.0
+    READ_MARKER_FLUSH_SECONDS: float = 2.0
+    READ_MARKER_PENDING_MAX: int = 10000
+    DB_THREADPOOL_SIZE: int = 16
+    SQL_PROFILE: bool = False
+    SQL_PROFILE_STRICT: bool = False
+    SQL_NPLUS1_THRESHOLD: int = 5
 
     class Config:
         env_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), '..', '.env')
@@ -1,4 +1,4 @@
-from app.database.database import SessionLocal
+from app.database.database import SessionLocal, ReadSessionLocal
 from sqlalchemy.orm import Session
 
 def get_db():
@@ -6,4 +6,11 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
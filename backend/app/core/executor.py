@@ -0,0 +1,53 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from app.core.metrics import counter, gauge, histogram
+
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_THREADPOOL_SIZE,
+    thread_name_prefix="db-worker",
+)
+
+async def run_in_db_pool(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="hash-worker",
+)
+_hash_slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE)
+_hash_pending = 0
+
+hash_seconds = histogram("password_hash_seconds", "Password hashing time including queueing", ["op"])
+hash_rejected = counter("password_hash_rejected_total", "Hashing requests rejected because the pool was full")
+gauge("password_hash_pending", "Hashing requests running or queued", func=lambda: _hash_pending)
+
+
+class PoolBusy(RuntimeError):
+    pass
+
+
+async def run_in_hash_pool(op: str, fn, *args):
+    global _hash_pending
+    if not _hash_slots.acquire(blocking=False):
+        hash_rejected.inc()
+        raise PoolBusy("Сервер перевантажений, спробуйте пізніше")
+    _hash_pending += 1
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(hash_executor, functools.partial(fn, *args))
+    finally:
+        _hash_pending -= 1
+        _hash_slots.release()
+        hash_seconds.observe(time.perf_counter() - started, op=op)
+
+def shutdown():
+    db_executor.shutdown(wait=True, cancel_futures=False)
+    hash_executor.shutdown(wait=True, cancel_futures=False)
@@ -0,0 +1,181 @@
+import time
+import logging
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.core.metrics import counter, gauge, histogram
+
+logger = logging.getLogger("app.sql")
+
+http_request_seconds = histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"]
+)
+http_requests_in_flight = gauge("http_requests_in_flight", "HTTP requests being processed")
+http_request_db_statements = histogram(
+    "http_request_db_statements", "SQL statements executed per HTTP request", ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+http_request_db_seconds = histogram(
+    "http_request_db_seconds", "Time spent in SQL per HTTP request", ["method", "route"]
+)
+db_statement_seconds = histogram(
+    "db_statement_duration_seconds", "SQL statement execution time", ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+db_statement_errors = counter("db_statement_errors_total", "SQL statements that raised", ["pool"])
+sql_nplus1_detected = counter(
+    "sql_nplus1_detected_total", "Requests that repeated one statement with different parameters", ["route"]
+)
+sql_budget_exceeded = counter(
+    "sql_query_budget_exceeded_total", "Requests that ran more statements than their route allows", ["route"]
+)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def query_budget(limit: int):
+    def decorator(endpoint):
+        endpoint.__query_budget__ = limit
+        return endpoint
+    return decorator
+
+
+class StatementProfile:
+    __slots__ = ("count", "seconds", "params")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.params = set()
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "scope", "profile")
+
+    def __init__(self, scope=None, profile: bool = False):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.scope = scope
+        self.profile: Optional[Dict[str, StatementProfile]] = {} if profile else None
+
+    @property
+    def budget(self) -> Optional[int]:
+        route = self.scope.get("route") if self.scope is not None else None
+        return getattr(getattr(route, "endpoint", None), "__query_budget__", None)
+
+    def record(self, statement: str, parameters, elapsed: float):
+        self.statements += 1
+        self.db_seconds += elapsed
+        if self.profile is not None:
+            entry = self.profile.get(statement)
+            if entry is None:
+                entry = self.profile[statement] = StatementProfile()
+            entry.count += 1
+            entry.seconds += elapsed
+            if len(entry.params) <= settings.SQL_NPLUS1_THRESHOLD:
+                entry.params.add(repr(parameters))
+        if settings.SQL_PROFILE_STRICT:
+            budget = self.budget
+            if budget is not None and self.statements > budget:
+                raise QueryBudgetExceeded(
+                    f"{_route_template(self.scope)}: {self.statements} SQL statements, budget {budget}"
+                )
+
+    def repeated(self) -> List[tuple]:
+        if not self.profile:
+            return []
+        return [
+            (sql, p.count, p.seconds) for sql, p in self.profile.items()
+            if p.count >= settings.SQL_NPLUS1_THRESHOLD and len(p.params) > 1
+        ]
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _request_stats.get()
+
+
+def instrument_engine(engine: Engine, label: str):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_statement_seconds.observe(elapsed, pool=label)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.record(statement, parameters, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+        db_statement_errors.inc(pool=label)
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats(scope, profile=settings.SQL_PROFILE)
+        token = _request_stats.set(stats)
+        status = {"code": 500}
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if stats.profile is not None:
+                    total_ms = (time.perf_counter() - started) * 1000
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-sql-queries", str(stats.statements).encode()),
+                        (b"server-timing", (
+                            f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.statements} queries", '
+                            f"app;dur={total_ms:.2f}"
+                        ).encode()),
+                    ]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            _request_stats.reset(token)
+            method, route = scope["method"], _route_template(scope)
+            http_request_seconds.observe(elapsed, method=method, route=route, status=str(status["code"]))
+            http_request_db_statements.observe(stats.statements, method=method, route=route)
+            http_request_db_seconds.observe(stats.db_seconds, method=method, route=route)
+            _report(stats, method, route)
+
+
+def _report(stats: RequestStats, method: str, route: str):
+    budget = stats.budget
+    if budget is not None and stats.statements > budget:
+        sql_budget_exceeded.inc(route=route)
+        logger.warning("%s %s: %d SQL statements, budget %d", method, route, stats.statements, budget)
+    for sql, count, seconds in stats.repeated():
+        sql_nplus1_detected.inc(route=route)
+        logger.warning(
+            "%s %s: possible N+1, %d executions in %.1f ms: %s",
+            method, route, count, seconds * 1000, " ".join(sql.split())[:300],
+        )
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Hashable
+from app.core.config import settings
+from app.core.metrics import counter
+
+rate_limited = counter("rate_limited_total", "Requests rejected by a rate limiter", ["limiter"])
+
+
+class SlidingWindowLimiter:
+    def __init__(self, name: str, limit: int, window: float, max_keys: int = 100_000):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._hits: "OrderedDict[Hashable, deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, key: Hashable, now: float) -> deque:
+        hits = self._hits.get(key)
+        if hits is None:
+            return deque()
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        if not hits:
+            del self._hits[key]
+        return hits
+
+    def retry_after(self, key: Hashable) -> float:
+        if self.limit <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            hits = self._prune(key, now)
+            if len(hits) < self.limit:
+                return 0.0
+            wait = hits[0] + self.window - now
+        rate_limited.inc(limiter=self.name)
+        return max(wait, 0.001)
+
+    def hit(self, key: Hashable) -> float:
+        wait = self.retry_after(key)
+        if wait:
+            return wait
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            hits.append(now)
+            self._hits.move_to_end(key)
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+        return 0.0
+
+    def reset(self, key: Hashable):
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+login_ip_limiter = SlidingWindowLimiter(
+    "login_ip", settings.LOGIN_FAILURES_PER_IP, settings.LOGIN_RATE_WINDOW_SECONDS
+)
+login_account_limiter = SlidingWindowLimiter(
+    "login_account", settings.LOGIN_FAILURES_PER_ACCOUNT, settings.LOGIN_RATE_WINDOW_SECONDS
+)
@@ -1,9 +1,11 @@
+import functools
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, UTC
 from app.core.config import settings
+from app.core.executor import run_in_hash_pool
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -11,6 +13,20 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+@functools.cache
+def _dummy_hash() -> str:
+    return pwd_context.hash("dummy-password-for-timing")
+
+def _verify_and_update(plain_password, hashed_password):
+    return pwd_context.verify_and_update(plain_password, hashed_password or _dummy_hash())
+
+async def verify_password_async(plain_password, hashed_password) -> tuple[bool, str | None]:
+    ok, new_hash = await run_in_hash_pool("verify", _verify_and_update, plain_password, hashed_password)
+    return (ok and hashed_password is not None), new_hash
+
+async def get_password_hash_async(password) -> str:
+    return await run_in_hash_pool("hash", pwd_context.hash, password)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.now(UTC) + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
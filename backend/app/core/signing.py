@@ -0,0 +1,55 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from app.core.config import settings
+
+_KEY = hashlib.sha256(f"{settings.SECRET_KEY}:attachment-urls".encode()).digest()
+
+
+class InvalidSignature(ValueError):
+    pass
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _signature(body: str) -> str:
+    return _b64encode(hmac.new(_KEY, body.encode(), hashlib.sha256).digest()[:20])
+
+def _expiry(ttl: int) -> int:
+    # строк дії вирівнюється по вікнах ttl, щоб URL був стабільним і кешувався браузером
+    return (int(time.time()) // ttl + 2) * ttl
+
+def sign(claims: dict, ttl: int | None = None) -> tuple[str, int]:
+    exp = _expiry(ttl or settings.ATTACHMENT_URL_TTL_SECONDS)
+    body = _b64encode(json.dumps({**claims, "exp": exp}, separators=(",", ":")).encode())
+    return f"{body}.{_signature(body)}", exp
+
+def verify(token: str) -> dict:
+    try:
+        body, sig = token.rsplit(".", 1)
+    except ValueError:
+        raise InvalidSignature("Некоректне посилання")
+    if not hmac.compare_digest(sig, _signature(body)):
+        raise InvalidSignature("Некоректне посилання")
+    try:
+        claims = json.loads(_b64decode(body))
+    except ValueError:
+        raise InvalidSignature("Некоректне посилання")
+    if int(claims.get("exp", 0)) < time.time():
+        raise InvalidSignature("Посилання прострочене")
+    return claims
+
+def attachment_url(
+    attachment_id: int, sha256: str, mimetype: str | None, filename: str, variant: str | None = None
+) -> str:
+    claims = {"a": attachment_id, "h": sha256, "m": mimetype, "f": filename}
+    if variant:
+        claims["v"] = variant
+    token, _ = sign(claims)
+    return f"/messages/attachments/signed/{token}"
@@ -1,8 +1,81 @@
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from app.core.config import settings
+from app.core.metrics import counter, gauge, histogram
+from app.core.instrumentation import instrument_engine
+
+pool_checkout_seconds = histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a pooled connection", ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+pool_timeouts = counter("db_pool_timeouts_total", "Checkouts that gave up waiting for a connection", ["pool"])
+pool_checked_out = gauge("db_pool_checked_out", "Connections currently checked out", ["pool"])
+pool_overflow = gauge("db_pool_overflow", "Connections open beyond pool_size", ["pool"])
+pool_size = gauge("db_pool_size", "Configured pool size", ["pool"])
+
+
+class InstrumentedQueuePool(QueuePool):
+    label = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts.inc(pool=self.label)
+            raise
+        finally:
+            pool_checkout_seconds.observe(time.perf_counter() - started, pool=self.label)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.label = self.label
+        return pool
+
+
+def _instrument(engine: Engine, label: str) -> Engine:
+    instrument_engine(engine, label)
+    pool = engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        pool.label = label
+        pool_size.set(pool.size(), pool=label)
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_conn, record, proxy):
+        pool_checked_out.inc(pool=label)
+        if isinstance(engine.pool, QueuePool):
+            pool_overflow.set(max(engine.pool.overflow(), 0), pool=label)
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_conn, record):
+        pool_checked_out.dec(pool=label)
+        if isinstance(engine.pool, QueuePool):
+            pool_overflow.set(max(engine.pool.overflow(), 0), pool=label)
+
+    return engine
+
+
+def make_engine(url: str, label: str) -> Engine:
+    if url.startswith("sqlite"):
+        return _instrument(create_engine(url), label)
+    return _instrument(create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    ), label)
+
+
+engine = make_engine(settings.DATABASE_URL, "primary")
+read_engine = make_engine(settings.DATABASE_READ_URL, "replica") if settings.DATABASE_READ_URL else engine
 
-engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+Base = declarative_base()
@@ -0,0 +1,103 @@
+import logging
+from sqlalchemy import UniqueConstraint, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn
+from app.database.database import Base
+
+logger = logging.getLogger(__name__)
+
+# колонки, після додавання яких треба перерахувати денормалізовані лічильники
+_COUNTER_COLUMNS = {
+    "conversation_participants.unread_count",
+    "conversation_participants.last_visible_message_id",
+    "conversation_participants.last_message_at",
+}
+
+
+class DuplicateRows(RuntimeError):
+    pass
+
+
+def _missing_unique(conn) -> list[tuple]:
+    insp = inspect(conn)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name) or "id" not in table.c:
+            continue
+        named = {i["name"] for i in insp.get_indexes(table.name)}
+        named |= {u["name"] for u in insp.get_unique_constraints(table.name)}
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name not in named:
+                missing.append((table, constraint.name, [c.name for c in constraint.columns]))
+    return missing
+
+
+def _surplus(table, cols: list[str]) -> str:
+    # рядки-дублікати, які треба прибрати: лишається is_deleted (якщо колонка є), далі найновіший
+    order = "id DESC"
+    if "is_deleted" in table.c:
+        order = "CASE WHEN is_deleted THEN 1 ELSE 0 END DESC, " + order
+    return (
+        f"SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY {', '.join(cols)} ORDER BY {order}) AS rn "
+        f"FROM {table.name}) ranked WHERE rn > 1"
+    )
+
+
+def _add_missing(conn) -> list[str]:
+    insp = inspect(conn)
+    applied = []
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {conn.dialect.identifier_preparer.format_table(table)} ADD COLUMN {ddl}"))
+            applied.append(f"{table.name}.{column.name}")
+
+        named = {i["name"] for i in insp.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in named:
+                index.create(conn)
+                applied.append(f"index {index.name}")
+
+    duplicates = {}
+    for table, name, cols in _missing_unique(conn):
+        count = conn.execute(text(f"SELECT COUNT(*) FROM ({_surplus(table, cols)}) surplus")).scalar()
+        if count:
+            duplicates[name] = count
+            continue
+        # обмеження на існуючу таблицю SQLite не додає; унікальний індекс дає ту саму гарантію і ON CONFLICT
+        conn.execute(text(f"CREATE UNIQUE INDEX {name} ON {table.name} ({', '.join(cols)})"))
+        applied.append(f"unique {name}")
+    if duplicates:
+        found = ", ".join(f"{name}: {count}" for name, count in duplicates.items())
+        raise DuplicateRows(
+            f"Дублікати не дають створити унікальні індекси ({found}). "
+            "Запустіть python -m app.maintenance dedupe-statuses"
+        )
+    return applied
+
+
+def dedupe(engine: Engine) -> dict[str, int]:
+    removed = {}
+    with engine.begin() as conn:
+        for table, name, cols in _missing_unique(conn):
+            count = conn.execute(text(f"DELETE FROM {table.name} WHERE id IN ({_surplus(table, cols)})")).rowcount
+            removed[name] = count
+            logger.warning("dedupe: removed %s duplicate rows from %s (%s)", count, table.name, ", ".join(cols))
+    return removed
+
+
+def upgrade(engine: Engine) -> list[str]:
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        applied = _add_missing(conn)
+    for change in applied:
+        logger.warning("schema upgrade: added %s", change)
+    if _COUNTER_COLUMNS & set(applied):
+        from app.services.counter_service import recompute_all_counters
+        with Session(bind=engine) as db:
+            logger.warning("schema upgrade: recomputed counters for %s participants", recompute_all_counters(db))
+    return applied
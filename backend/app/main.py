@@ -1,13 +1,48 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
-from app.database.database import Base, engine
+from fastapi.responses import PlainTextResponse
+from app.database.database import engine
+from app.database import schema
+from app.core import metrics, executor
+from app.core.config import settings
+from app.core.instrumentation import MetricsMiddleware
+from app.core.auth import authenticate, AuthError
+from app import ws_manager, ws_commands
+from app.outbox import dispatcher as outbox_dispatcher
+from app.presence import presence
+from app.read_markers import aggregator as read_markers
+from app.services import thumbnail_service, search_service, event_log_service
 from app.ws_manager import active_connections
 import asyncio
+import logging
 import app.models
 
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+schema.upgrade(engine)
+search_service.install(engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ws_manager.start()
+    await outbox_dispatcher.start()
+    await ws_commands.batcher.start()
+    await presence.start()
+    await read_markers.start()
+    thumbnail_service.pipeline.start()
+    try:
+        yield
+    finally:
+        await read_markers.stop()
+        await presence.stop()
+        await ws_commands.batcher.stop()
+        await outbox_dispatcher.stop()
+        await ws_manager.stop()
+        thumbnail_service.pipeline.stop()
+        executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +51,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 from app.routers import auth, users, messages, conversations
 
@@ -25,19 +61,45 @@ app.include_router(messages.router)
 app.include_router(conversations.router)
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+_command_tasks: set[asyncio.Task] = set()
+
 
 @app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
+async def websocket_endpoint(websocket: WebSocket, user_id: int, token: str = "", since_seq: int | None = None):
+    try:
+        user = await executor.run_in_db_pool(authenticate, token)
+    except AuthError:
+        user = None
+    if user is None or user.id != user_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
     await websocket.accept()
-    active_connections[user_id] = websocket
-    print(f"WS CONNECT: {user_id} | {list(active_connections.keys())}")
+    conn = ws_manager.register_connection(user_id, websocket, hold=True)
+    presence.connected(conn)
+    logger.debug("WS connect: user %s, %d users connected", user_id, len(active_connections))
     try:
+        current_seq, backlog = await executor.run_in_db_pool(event_log_service.replay, user_id, since_seq)
+        await ws_manager.resume(conn, current_seq, backlog)
+        in_flight = asyncio.Semaphore(settings.WS_COMMANDS_IN_FLIGHT)
         while True:
             data = await websocket.receive_text()
-            print(f"WS RECEIVED from {user_id}: {data}")
+            if in_flight.locked():
+                ws_commands.reject_busy(conn, data)
+                continue
+            await in_flight.acquire()
+            task = asyncio.create_task(ws_commands.handle(conn, user, data))
+            _command_tasks.add(task)
+            task.add_done_callback(_command_tasks.discard)
+            task.add_done_callback(lambda _: in_flight.release())
     except WebSocketDisconnect:
-        print(f"WS DISCONNECT: {user_id} | {list(active_connections.keys())}")
-        active_connections.pop(user_id, None)
-    except Exception as e:
-        print(f"WS ERROR for {user_id}: {e}")
-        active_connections.pop(user_id, None)
\ No newline at end of file
+        logger.debug("WS disconnect: user %s", user_id)
+    except Exception:
+        logger.exception("WS connection of user %s failed", user_id)
+    finally:
+        ws_manager.unregister_connection(conn)
+        presence.disconnected(conn)
\ No newline at end of file
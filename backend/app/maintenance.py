@@ -0,0 +1,65 @@
+import argparse
+from app.database.database import SessionLocal, engine
+from app.database import schema
+from app.services.counter_service import recompute_all_counters
+from app.services.message_service import migrate_to_watermarks
+from app.services.user_service import set_user_active
+from app.models.user import User
+import app.models
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервісні команди бази даних")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    counters = sub.add_parser("recompute-counters", help="Перерахувати лічильники непрочитаних")
+    counters.add_argument("--conversation-id", type=int, default=None)
+
+    sub.add_parser(
+        "migrate-visibility",
+        help="Перенести приховані повідомлення у водяні знаки cleared_before_message_id",
+    )
+
+    sub.add_parser(
+        "dedupe-statuses",
+        help="Прибрати дублікати статусів перед створенням унікальних індексів "
+             "(лишається рядок з is_deleted, інакше найновіший)",
+    )
+
+    deactivate = sub.add_parser(
+        "deactivate-user",
+        help="Заблокувати користувача (інші процеси побачать зміну не пізніше ніж за AUTH_CACHE_TTL_SECONDS)",
+    )
+    deactivate.add_argument("--user-id", type=int, required=True)
+    deactivate.add_argument("--activate", action="store_true", help="Розблокувати замість блокування")
+    args = parser.parse_args()
+
+    if args.command == "dedupe-statuses":
+        removed = schema.dedupe(engine)
+        print(f"Видалено дублікатів: {sum(removed.values())}")
+        schema.upgrade(engine)
+        return
+
+    schema.upgrade(engine)
+    db = SessionLocal()
+    try:
+        if args.command == "recompute-counters":
+            count = recompute_all_counters(db, args.conversation_id)
+            print(f"Оновлено учасників: {count}")
+        elif args.command == "migrate-visibility":
+            migrated = migrate_to_watermarks(db)
+            print(f"Перенесено учасників: {migrated}")
+            count = recompute_all_counters(db)
+            print(f"Оновлено учасників: {count}")
+        elif args.command == "deactivate-user":
+            user = db.get(User, args.user_id)
+            if user is None:
+                raise SystemExit("Користувача не знайдено")
+            set_user_active(db, user, args.activate)
+            print(f"{user.username}: {'активний' if args.activate else 'заблокований'}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ from .user import User
 from .conversation import Conversation, ConversationParticipant, Message
 from .attachment import Attachment, AttachmentStatus
 from .message_status import MessageStatus
+from .blob import Blob, BlobVariant
+from .outbox import OutboxEvent, UserEvent, UserEventSeq
 
 __all__ = [
     "User",
@@ -10,5 +12,10 @@ __all__ = [
     "Message",
     "Attachment",
     "AttachmentStatus",
-    "MessageStatus"
+    "MessageStatus",
+    "Blob",
+    "BlobVariant",
+    "OutboxEvent",
+    "UserEvent",
+    "UserEventSeq",
 ]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, String, Boolean, DateTime, BigInteger
+from sqlalchemy import Column, Integer, ForeignKey, String, Boolean, DateTime, BigInteger, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime, UTC
 from app.database.database import Base
@@ -15,6 +15,7 @@ class Attachment(Base):
     stored_path = Column(String, nullable=False)
     mimetype = Column(String, nullable=True)
     size_bytes = Column(BigInteger, nullable=True)
+    sha256 = Column(String(64), nullable=True, index=True)
 
     is_deleted_for_all = Column(Boolean, default=False)
     created_at = Column(DateTime, default=lambda:datetime.now(UTC))
@@ -32,6 +33,12 @@ class Attachment(Base):
         back_populates="attachment",
         cascade="all, delete-orphan",
     )
+    variants = relationship(
+        "BlobVariant",
+        primaryjoin="foreign(BlobVariant.sha256) == Attachment.sha256",
+        viewonly=True,
+        lazy="selectin",
+    )
 
 
 class AttachmentStatus(Base):
@@ -50,3 +57,5 @@ class AttachmentStatus(Base):
         "User",
         back_populates="attachment_statuses",
     )
+
+    __table_args__ = (UniqueConstraint("attachment_id", "user_id", name="uq_attachment_user"),)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, PrimaryKeyConstraint
+from datetime import datetime, UTC
+from app.database.database import Base
+
+
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    stored_path = Column(String, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=lambda:datetime.now(UTC))
+
+
+class BlobVariant(Base):
+    __tablename__ = "blob_variants"
+
+    sha256 = Column(String(64), nullable=False)
+    variant = Column(String(16), nullable=False)
+    stored_path = Column(String, nullable=False)
+    mimetype = Column(String, nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=lambda:datetime.now(UTC))
+
+    __table_args__ = (PrimaryKeyConstraint("sha256", "variant"),)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Boolean, DateTime, Text, Index
+from sqlalchemy import Column, Integer, ForeignKey, Boolean, DateTime, Text, String, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, UTC
 from app.database.database import Base
@@ -32,6 +32,10 @@ class ConversationParticipant(Base):
     is_cleared = Column(Boolean, default=False)
     last_read_message_id = Column(Integer, nullable=True)
     last_read_at = Column(DateTime, nullable=True)
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_visible_message_id = Column(Integer, nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+    cleared_before_message_id = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.now(UTC))
     
     conversation = relationship(
@@ -54,6 +58,7 @@ class Message(Base):
     is_deleted_for_all = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     edited_at = Column(DateTime, nullable=True)
+    client_msg_id = Column(String(64), nullable=True)
 
     conversation = relationship(
         "Conversation", 
@@ -74,4 +79,10 @@ class Message(Base):
         cascade="all, delete-orphan",
     )
 
-Index("ix_messages_conversation_id", Message.conversation_id, Message.id)
\ No newline at end of file
+Index("ix_messages_conversation_id", Message.conversation_id, Message.id)
+Index("uq_messages_sender_client_msg_id", Message.sender_id, Message.client_msg_id, unique=True)
+Index(
+    "ix_conversation_participants_user_last_message",
+    ConversationParticipant.user_id,
+    ConversationParticipant.last_message_at,
+)
\ No newline at end of file
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, BigInteger, DateTime, Text, JSON, ForeignKey, PrimaryKeyConstraint
+from datetime import datetime
+from app.database.database import Base
+
+
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True)
+    user_ids = Column(JSON, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class UserEventSeq(Base):
+    __tablename__ = "user_event_seqs"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    last_seq = Column(BigInteger, nullable=False, default=0)
+
+
+class UserEvent(Base):
+    __tablename__ = "user_events"
+
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    seq = Column(BigInteger, nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (PrimaryKeyConstraint("user_id", "seq"),)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, Integer, String, Boolean, DateTime
 from sqlalchemy.orm import relationship
 from app.database.database import Base
 
@@ -11,6 +11,7 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     gender = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
+    last_seen_at = Column(DateTime(timezone=True), nullable=True)
 
     conversations = relationship(
         "ConversationParticipant", 
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from datetime import datetime
+from app.core.config import settings
+from app.core import metrics
+from app.core.executor import run_in_db_pool
+from app.database.database import SessionLocal
+from app.services import outbox_service, event_log_service
+from app import ws_manager
+
+logger = logging.getLogger(__name__)
+
+outbox_published = metrics.counter("outbox_events_published_total", "Outbox events handed to the WebSocket backplane")
+outbox_errors = metrics.counter("outbox_dispatch_errors_total", "Outbox batches that failed and will be retried")
+outbox_batch = metrics.histogram(
+    "outbox_batch_size", "Events per dispatched outbox batch",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 200, 500),
+)
+outbox_lag = metrics.histogram("outbox_lag_seconds", "Age of the oldest event in a batch when it is published")
+
+
+def _claim_and_sequence(limit: int):
+    # claim, нумерація, ack і close в одному виклику пулу: скасування drain() не
+    # залишає сесію, яку інший потік закриває посеред коміту.
+    # Після коміту подія вже лежить у user_events: live-доставка нижче best-effort,
+    # а пропущене клієнт отримує через replay за since_seq при перепідключенні
+    db = SessionLocal()
+    try:
+        rows = outbox_service.claim_batch(db, limit)
+        if not rows:
+            return 0, [], []
+        acked = outbox_service.ack_batch(db, [row.id for row in rows])
+        mine = [(row.created_at, row.user_ids, row.payload) for row in rows if row.id in acked]
+        deliveries = event_log_service.append(db, [(user_ids, payload) for _, user_ids, payload in mine])
+        db.commit()
+        return len(rows), [created_at for created_at, _, _ in mine], deliveries
+    finally:
+        db.close()
+
+
+class OutboxDispatcher:
+    def __init__(self, batch_size: int, poll_interval: float):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        outbox_service.add_commit_listener(self.notify)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception("final outbox drain failed")
+        self._loop = None
+
+    def notify(self):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        delay = self.poll_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                while await self.drain() >= self.batch_size:
+                    pass
+                delay = self.poll_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                outbox_errors.inc()
+                delay = min(delay * 2, 30)
+                logger.exception("outbox dispatch failed; retry in %ss", delay)
+
+    async def drain(self) -> int:
+        claimed, created, deliveries = await run_in_db_pool(_claim_and_sequence, self.batch_size)
+        if not created:
+            return claimed
+        await ws_manager.publish_batch(deliveries)
+        outbox_published.inc(len(created))
+        outbox_batch.observe(len(created))
+        outbox_lag.observe(max((datetime.utcnow() - created[0]).total_seconds(), 0))
+        return claimed
+
+
+dispatcher = OutboxDispatcher(settings.OUTBOX_BATCH_SIZE, settings.OUTBOX_POLL_INTERVAL_SECONDS)
@@ -0,0 +1,321 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.core import metrics
+from app.core.executor import run_in_db_pool
+from app.database.database import SessionLocal
+from app.services import user_service
+from app import ws_manager
+from app.ws_manager import Connection
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("online", "away")
+WORKER_ID = uuid.uuid4().hex[:12]
+
+presence_publishes = metrics.counter("presence_publishes_total", "Presence batches sent to the backplane", ["reason"])
+presence_notifications = metrics.counter("presence_notifications_total", "Presence changes delivered to local subscribers")
+presence_last_seen_writes = metrics.counter("presence_last_seen_writes_total", "users.last_seen_at rows written")
+typing_commands = metrics.counter("typing_commands_total", "Typing start/stop commands received")
+typing_fanouts = metrics.counter("typing_fanouts_total", "Coalesced typing events sent to conversation members")
+presence_online = metrics.gauge(
+    "presence_users_online", "Users with an open connection on this worker",
+    func=lambda: len(presence._local),
+)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _write_last_seen(seen: Dict[int, datetime]) -> int:
+    db = SessionLocal()
+    try:
+        return user_service.save_last_seen(db, seen)
+    finally:
+        db.close()
+
+
+class PresenceService:
+    def __init__(self):
+        self.ttl = settings.PRESENCE_TTL_SECONDS
+        self.publish_interval = settings.PRESENCE_PUBLISH_INTERVAL_SECONDS
+        self.typing_ttl = settings.TYPING_TTL_SECONDS
+        self.typing_interval = settings.TYPING_FANOUT_INTERVAL_SECONDS
+        # стан з'єднань цього воркера
+        self._local: Dict[int, Dict[Connection, str]] = {}
+        self._changed: Set[int] = set()
+        self._publish_scheduled = False
+        self._unsaved: Dict[int, datetime] = {}
+        # зведений стан усіх воркерів: user_id -> worker -> (status, expires_at)
+        self._cluster: Dict[int, Dict[str, Tuple[str, float]]] = {}
+        self._last_seen: Dict[int, str] = {}
+        self._subscribers: Dict[int, Set[Connection]] = {}
+        self._subscriptions: Dict[Connection, Set[int]] = {}
+        # conversation_id -> user_id -> expires_at; зміни копляться до наступного fan-out
+        self._typing: Dict[int, Dict[int, float]] = {}
+        self._typing_changes: Dict[int, Dict[int, bool]] = {}
+        self._typing_members: Dict[int, List[int]] = {}
+        self._typing_sent_at: Dict[int, float] = {}
+        self._typing_scheduled: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._pending_sends: Set[asyncio.Task] = set()
+        ws_manager.backplane.add_handler("presence", self._on_presence)
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._refresh_loop()),
+            asyncio.create_task(self._last_seen_loop()),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._local:
+            seen = _now()
+            for uid in self._local:
+                self._unsaved[uid] = seen
+            try:
+                await self._publish([(uid, "offline") for uid in self._local], "shutdown")
+            except Exception:
+                logger.exception("presence shutdown publish failed")
+            self._local.clear()
+        await self._flush_last_seen()
+
+    # --- з'єднання ---
+
+    def connected(self, conn: Connection):
+        self._local.setdefault(conn.user_id, {})[conn] = "online"
+        self._mark_changed(conn.user_id)
+
+    def disconnected(self, conn: Connection):
+        for uid in self._subscriptions.pop(conn, ()):
+            subs = self._subscribers.get(uid)
+            if subs:
+                subs.discard(conn)
+                if not subs:
+                    self._subscribers.pop(uid, None)
+        conns = self._local.get(conn.user_id)
+        if conns is None or conns.pop(conn, None) is None:
+            return
+        if not conns:
+            del self._local[conn.user_id]
+            self._unsaved[conn.user_id] = _now()
+            self._stop_typing_everywhere(conn.user_id)
+        self._mark_changed(conn.user_id)
+
+    def set_status(self, conn: Connection, status: str):
+        if status not in STATUSES:
+            raise ValueError("Статус має бути online або away")
+        conns = self._local.get(conn.user_id)
+        if conns is None or conn not in conns or conns[conn] == status:
+            return
+        conns[conn] = status
+        self._mark_changed(conn.user_id)
+
+    def _local_status(self, user_id: int) -> str:
+        conns = self._local.get(user_id)
+        if not conns:
+            return "offline"
+        return "online" if "online" in conns.values() else "away"
+
+    def _mark_changed(self, user_id: int):
+        self._changed.add(user_id)
+        if self._publish_scheduled:
+            return
+        self._publish_scheduled = True
+        asyncio.get_running_loop().call_later(self.publish_interval, self._publish_changed)
+
+    def _publish_changed(self):
+        self._publish_scheduled = False
+        changed, self._changed = self._changed, set()
+        if changed:
+            self._spawn(self._publish([(uid, self._local_status(uid)) for uid in changed], "change"), "presence publish")
+
+    def _spawn(self, coro, what: str):
+        # тримаємо посилання, щоб задачу не зібрав GC, і не губимо її помилку
+        task = asyncio.create_task(coro)
+        self._pending_sends.add(task)
+
+        def done(t: asyncio.Task):
+            self._pending_sends.discard(t)
+            if not t.cancelled() and t.exception() is not None:
+                logger.exception("%s failed", what, exc_info=t.exception())
+
+        task.add_done_callback(done)
+
+    async def _publish(self, states: List[Tuple[int, str]], reason: str):
+        seen = _now().isoformat()
+        presence_publishes.inc(reason=reason)
+        await ws_manager.backplane.publish("presence", {
+            "worker": WORKER_ID,
+            "states": [[uid, status, seen] for uid, status in states],
+        })
+
+    # --- зведений стан ---
+
+    def status(self, user_id: int) -> str:
+        now = time.monotonic()
+        alive = [s for s, expires in self._cluster.get(user_id, {}).values() if expires > now]
+        if not alive:
+            return "offline"
+        return "online" if "online" in alive else "away"
+
+    def _snapshot(self, user_id: int, last_seen: Optional[str] = None) -> dict:
+        return {"status": self.status(user_id), "last_seen": self._last_seen.get(user_id, last_seen)}
+
+    async def _on_presence(self, payload: dict):
+        worker, expires = payload["worker"], time.monotonic() + self.ttl
+        for uid, status, seen in payload["states"]:
+            before = self.status(uid)
+            entries = self._cluster.setdefault(uid, {})
+            if status == "offline":
+                entries.pop(worker, None)
+                self._last_seen[uid] = seen
+                if not entries:
+                    del self._cluster[uid]
+            else:
+                entries[worker] = (status, expires)
+            if self.status(uid) != before:
+                self._notify(uid)
+
+    def _notify(self, user_id: int):
+        subs = self._subscribers.get(user_id)
+        if not subs:
+            return
+        text = json.dumps({"type": "presence", "user_id": user_id, **self._snapshot(user_id)})
+        for conn in list(subs):
+            conn.enqueue(text)
+        presence_notifications.inc(len(subs))
+
+    def subscribe(self, conn: Connection, last_seen: Dict[int, Optional[datetime]]) -> Dict[int, dict]:
+        if not conn.closed:
+            watched = self._subscriptions.setdefault(conn, set())
+            for uid in last_seen:
+                watched.add(uid)
+                self._subscribers.setdefault(uid, set()).add(conn)
+        return {
+            uid: self._snapshot(uid, seen.isoformat() if seen else None)
+            for uid, seen in last_seen.items()
+        }
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                if self._local:
+                    await self._publish([(uid, self._local_status(uid)) for uid in self._local], "refresh")
+                self._expire()
+            except Exception:
+                logger.exception("presence refresh failed")
+
+    def _expire(self):
+        now = time.monotonic()
+        for uid in list(self._cluster):
+            entries = self._cluster[uid]
+            stale = [w for w, (_, expires) in entries.items() if expires <= now]
+            if not stale:
+                continue
+            for w in stale:
+                del entries[w]
+            if not entries:
+                del self._cluster[uid]
+            self._notify(uid)
+        self._typing_sent_at = {
+            c: at for c, at in self._typing_sent_at.items() if at + self.typing_interval > now
+        }
+
+    # --- last_seen ---
+
+    async def _last_seen_loop(self):
+        while True:
+            await asyncio.sleep(settings.LAST_SEEN_FLUSH_SECONDS)
+            seen = _now()
+            for uid in self._local:
+                self._unsaved[uid] = seen
+            await self._flush_last_seen()
+
+    async def _flush_last_seen(self):
+        pending, self._unsaved = self._unsaved, {}
+        if not pending:
+            return
+        try:
+            presence_last_seen_writes.inc(await run_in_db_pool(_write_last_seen, pending))
+        except Exception:
+            logger.exception("last_seen flush failed")
+            for uid, at in pending.items():
+                self._unsaved.setdefault(uid, at)
+
+    # --- typing ---
+
+    def typing(self, conversation_id: int, user_id: int, members: List[int], active: bool):
+        typing_commands.inc()
+        self._typing_members[conversation_id] = members
+        self._set_typing(conversation_id, user_id, active)
+
+    def _set_typing(self, conversation_id: int, user_id: int, active: bool):
+        users = self._typing.setdefault(conversation_id, {})
+        was = user_id in users
+        if active:
+            # повторне "друкує" лише подовжує TTL, без розсилки і без нового таймера
+            users[user_id] = time.monotonic() + self.typing_ttl
+            if not was:
+                asyncio.get_running_loop().call_later(self.typing_ttl, self._expire_typing, conversation_id, user_id)
+        else:
+            users.pop(user_id, None)
+        if not users:
+            del self._typing[conversation_id]
+        if was == active:
+            return
+        self._typing_changes.setdefault(conversation_id, {})[user_id] = active
+        if conversation_id in self._typing_scheduled:
+            return
+        self._typing_scheduled.add(conversation_id)
+        delay = self._typing_sent_at.get(conversation_id, 0) + self.typing_interval - time.monotonic()
+        asyncio.get_running_loop().call_later(max(0.0, delay), self._fan_out_typing, conversation_id)
+
+    def _expire_typing(self, conversation_id: int, user_id: int):
+        expires = self._typing.get(conversation_id, {}).get(user_id)
+        if expires is None:
+            return
+        left = expires - time.monotonic()
+        if left > 0:
+            asyncio.get_running_loop().call_later(left, self._expire_typing, conversation_id, user_id)
+            return
+        self._set_typing(conversation_id, user_id, False)
+
+    def _stop_typing_everywhere(self, user_id: int):
+        for conversation_id in [c for c, users in self._typing.items() if user_id in users]:
+            self._set_typing(conversation_id, user_id, False)
+
+    def _fan_out_typing(self, conversation_id: int):
+        self._typing_scheduled.discard(conversation_id)
+        changes = self._typing_changes.pop(conversation_id, None)
+        members = self._typing_members.get(conversation_id)
+        if conversation_id not in self._typing:
+            self._typing_members.pop(conversation_id, None)
+        if not changes or not members:
+            return
+        self._typing_sent_at[conversation_id] = time.monotonic()
+        typing_fanouts.inc()
+        recipients = [uid for uid in members if changes.keys() != {uid}]
+        self._spawn(ws_manager.broadcast_to_conversation_participants(recipients, {
+            "type": "typing",
+            "conversation_id": conversation_id,
+            "started": [uid for uid, active in changes.items() if active],
+            "stopped": [uid for uid, active in changes.items() if not active],
+        }), "typing fan-out")
+
+
+presence = PresenceService()
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+from app.core import metrics
+from app.core.executor import run_in_db_pool
+from app.database.database import SessionLocal
+from app.services.conversation_service import apply_read_markers, last_visible_message_id
+from app import ws_manager
+
+logger = logging.getLogger(__name__)
+
+read_marks = metrics.counter("read_marks_total", "Read markers received from clients")
+read_marks_written = metrics.counter("read_marks_written_total", "Participant rows advanced by read marker flushes")
+read_flush_errors = metrics.counter("read_marker_flush_errors_total", "Read marker flushes that failed and were requeued")
+read_flush_size = metrics.histogram(
+    "read_marker_flush_size", "Pending (user, conversation) markers per flush",
+    buckets=(1, 5, 10, 50, 100, 500, 1000, 5000, 10000),
+)
+read_pending = metrics.gauge(
+    "read_markers_pending", "Read markers waiting for the next flush",
+    func=lambda: len(aggregator._pending),
+)
+
+
+def _last_visible(conversation_id: int, user_id: int) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        return last_visible_message_id(db, conversation_id, user_id)
+    finally:
+        db.close()
+
+
+def _apply(markers: Dict[Tuple[int, int], int]):
+    db = SessionLocal()
+    try:
+        return apply_read_markers(db, markers)
+    finally:
+        db.close()
+
+
+class ReadMarkerAggregator:
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Tuple[int, int], int] = {}
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def mark(self, conversation_id: int, user_id: int, up_to_message_id: Optional[int]):
+        read_marks.inc()
+        if up_to_message_id is None:
+            # "все видиме" фіксуємо на момент запиту: до flush можуть прийти повідомлення, яких клієнт ще не бачив
+            up_to_message_id = await run_in_db_pool(_last_visible, conversation_id, user_id)
+            if up_to_message_id is None:
+                return
+        key = (conversation_id, user_id)
+        self._pending[key] = max(self._pending.get(key, up_to_message_id), up_to_message_id)
+        if len(self._pending) >= self.max_pending and self._wake:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        read_flush_size.observe(len(pending))
+        try:
+            receipts = await run_in_db_pool(_apply, pending)
+        except Exception:
+            read_flush_errors.inc()
+            logger.exception("read marker flush failed, markers requeued")
+            for key, up_to in pending.items():
+                self._pending[key] = max(self._pending.get(key, up_to), up_to)
+            return 0
+        read_marks_written.inc(len(receipts))
+        try:
+            await ws_manager.broadcast_many([
+                (r.pop("members"), {"type": "read_receipt", **r}) for r in receipts
+            ])
+        except Exception:
+            logger.exception("read receipt publish failed")
+        return len(receipts)
+
+
+aggregator = ReadMarkerAggregator(settings.READ_MARKER_FLUSH_SECONDS, settings.READ_MARKER_PENDING_MAX)
@@ -1,42 +1,82 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.core.dependencies import get_db
+from app.core.executor import run_in_db_pool, PoolBusy
+from app.core.rate_limit import login_ip_limiter as ip_limiter, login_account_limiter as account_limiter
 from app.schemas.user import UserCreate, UserLogin, UserInDB, Token
 from app.services import user_service
-from app.core.security import verify_password, create_access_token
+from app.core.security import verify_password_async, get_password_hash_async, create_access_token
+from app.core.instrumentation import query_budget
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def _too_many(retry_after: float):
+    return HTTPException(
+        status_code=429,
+        detail="Забагато спроб, спробуйте пізніше",
+        headers={"Retry-After": str(int(retry_after) + 1)},
+    )
+
+def _busy(e: PoolBusy):
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+async def _authenticate(db: Session, request: Request, login: str, password: str):
+    ip, account = _client_ip(request), login.strip().lower()
+    wait = ip_limiter.retry_after(ip) or account_limiter.retry_after(account)
+    if wait:
+        raise _too_many(wait)
+
+    user = await run_in_db_pool(user_service.get_user_by_username_or_email, db, login)
+    try:
+        ok, new_hash = await verify_password_async(password, user.hashed_password if user else None)
+    except PoolBusy as e:
+        raise _busy(e)
+    if not ok:
+        ip_limiter.hit(ip)
+        account_limiter.hit(account)
+        raise HTTPException(status_code=401, detail="Неправильне ім'я користувача або пароль")
+
+    account_limiter.reset(account)
+    user_id = user.id
+    if new_hash:
+        await run_in_db_pool(user_service.replace_password_hash, db, user_id, user.hashed_password, new_hash)
+    return user_id
+
 @router.post("/register", response_model=UserInDB)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+@query_budget(4)
+async def register(user: UserCreate, db: Session = Depends(get_db)):
     if user.password != user.confirm_password:
         raise HTTPException(status_code=400, detail="Паролі повинні співпадати")
-    existing_user = user_service.get_user_by_username_or_email(db, user.username) or \
-                    user_service.get_user_by_username_or_email(db, user.email)
-    
+    existing_user = await run_in_db_pool(user_service.get_user_by_username_or_email, db, user.username) or \
+                    await run_in_db_pool(user_service.get_user_by_username_or_email, db, user.email)
+
     if existing_user:
         raise HTTPException(status_code=400, detail="Користувач з таким іменем або email вже існує")
-    
-    return user_service.create_user(db=db, user=user)
+
+    try:
+        hashed_password = await get_password_hash_async(user.password)
+    except PoolBusy as e:
+        raise _busy(e)
+    return await run_in_db_pool(user_service.create_user, db, user, hashed_password)
 
 @router.post("/login")
-def login(data: UserLogin, db: Session = Depends(get_db)):
-    user = user_service.get_user_by_username_or_email(db, data.login)
-    if not user or not verify_password(data.password, user.hashed_password):
-        raise HTTPException(status_code=401, detail="Неправильне ім'я користувача або пароль")
-    
-    token = create_access_token({"sub": str(user.id)})
+@query_budget(2)
+async def login(data: UserLogin, request: Request, db: Session = Depends(get_db)):
+    user_id = await _authenticate(db, request, data.login, data.password)
+    token = create_access_token({"sub": str(user_id)})
     return {"access_token": token, "token_type": "bearer"}
 
 @router.post("/token", response_model=Token)
-def token(
-    form_data: OAuth2PasswordRequestForm = Depends(), 
+@query_budget(2)
+async def token(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
     ):
-    user = user_service.get_user_by_username_or_email(db, form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(status_code=401, detail="Неправильне ім'я користувача або пароль")
-
-    access_token = create_access_token({"sub": str(user.id)})
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    user_id = await _authenticate(db, request, form_data.username, form_data.password)
+    access_token = create_access_token({"sub": str(user_id)})
+    return {"access_token": access_token, "token_type": "bearer"}
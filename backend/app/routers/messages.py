@@ -1,22 +1,38 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Response
-from sqlalchemy.orm import Session, joinedload
-from datetime import datetime, UTC
+import os
+import time
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header, Query, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.core.config import settings
-from app.core.auth import get_current_user
-from app.core.dependencies import get_db
-from app.models.user import User
+from app.core.auth import get_current_user, CurrentUser
+from app.core.dependencies import get_db, get_read_db
+from app.core.executor import run_in_db_pool
 from app.models.conversation import Conversation, ConversationParticipant, Message
 from app.models.attachment import Attachment, AttachmentStatus
 from app.models.message_status import MessageStatus
 from app.schemas.conversation import MessageBase
-from app.schemas.messages import MessagePage, EditMessageRequest
-from app.services.attachment_service import save_attachments, mark_attachment_deleted_for_me, delete_attachment_for_all
-from app.services.message_service import fetch_messages_page
+from app.schemas.messages import MessagePage, EditMessageRequest, MessageSearchHit
+from app.services.attachment_service import (
+    save_attachments, mark_attachment_deleted_for_me, delete_attachment_for_all,
+    check_upload_sizes, AttachmentTooLarge,
+    get_attachment_access, attachment_available, etag_for, etag_matches, ensure_storage, content_disposition,
+    MeteredFileResponse, attachment_bytes_out,
+)
+from app.services.blob_service import blob_path, variant_path
+from app.services.thumbnail_service import pipeline as thumbnail_pipeline, VARIANTS, VARIANT_MIMETYPE
+from app.core.signing import sign, verify, InvalidSignature
+from app.services import outbox_service, message_service
+from app.services.message_service import (
+    fetch_messages_page, hide_for_user, delete_for_all, find_by_client_id, new_message_event,
+    MessageNotFound, MessageForbidden, CLIENT_MSG_ID_MAX,
+)
+from app.services.search_service import search_messages
+from app.services.counter_service import on_message_created, refresh_counters
 
-import json
-from app.ws_manager import get_active_connections
+from app.core.instrumentation import query_budget
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
@@ -31,16 +47,57 @@ def ensure_participation_or_404(db: Session, conversation_id: int, user_id: int)
         raise HTTPException(status_code=403, detail="Ви не є учасником цієї розмови")
     return conv
 
+def _store_message(
+    db: Session, conversation_id: int, sender_id: int, content: str, files: List[UploadFile],
+    client_msg_id: str | None = None,
+) -> MessageBase:
+    conv = ensure_participation_or_404(db, conversation_id, sender_id)
+    if client_msg_id:
+        existing = find_by_client_id(db, sender_id, client_msg_id)
+        if existing:
+            return MessageBase.model_validate(existing)
+
+    msg = Message(
+        conversation_id=conv.id, sender_id=sender_id, content=content.strip() if content else "",
+        client_msg_id=client_msg_id,
+    )
+    db.add(msg)
+    try:
+        db.flush()
+    except IntegrityError:
+        # WS-пакет з тим самим client_msg_id закомітився між перевіркою і вставкою
+        db.rollback()
+        existing = find_by_client_id(db, sender_id, client_msg_id) if client_msg_id else None
+        if existing is None:
+            raise
+        return MessageBase.model_validate(existing)
+    on_message_created(db, msg)
+    saved = []
+    if files:
+        try:
+            saved = save_attachments(db, msg, sender_id, files)
+        except AttachmentTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+    set_committed_value(msg, "attachments", saved)
+    msg_out = MessageBase.model_validate(msg)
+    outbox_service.enqueue(db, outbox_service.participant_ids(db, conv.id), new_message_event(msg_out))
+    pending_thumbnails = [(a.sha256, a.stored_path, a.mimetype) for a in saved if not a.variants]
+    db.commit()
+
+    for job in pending_thumbnails:
+        thumbnail_pipeline.submit(*job)
+    return msg_out
+
 @router.post("/send", response_model=MessageBase)
+@query_budget(10 + 5 * settings.MAX_FILES_PER_MESSAGE)
 async def send_message(
     conversation_id: int = Form(...),
     content: str = Form(""),
     files: Optional[List[UploadFile]] = File(None),
+    client_msg_id: Optional[str] = Form(None, max_length=CLIENT_MSG_ID_MAX),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    conv = ensure_participation_or_404(db, conversation_id, current_user.id)
-
     file_list: List[UploadFile] = files or []
 
     if len(file_list) > settings.MAX_FILES_PER_MESSAGE:
@@ -49,84 +106,119 @@ async def send_message(
     if not (content.strip() or len(file_list) > 0):
         raise HTTPException(status_code=400, detail="Повідомлення не може бути порожнім")
 
-    msg = Message(conversation_id=conv.id, sender_id=current_user.id, content=content.strip() if content else "")
-    db.add(msg)
-    db.commit()
-    db.refresh(msg)
+    try:
+        check_upload_sizes(file_list)
+    except AttachmentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
-    if file_list:
-        save_attachments(db, msg, current_user.id, file_list)
-
-    msg = (
-        db.query(Message)
-        .options(joinedload(Message.attachments))
-        .filter(Message.id == msg.id)
-        .first()
+    return await run_in_db_pool(
+        _store_message, db, conversation_id, current_user.id, content, file_list, client_msg_id
     )
 
-    active_connections = get_active_connections()
-    participants = db.query(ConversationParticipant).filter_by(conversation_id=conv.id).all()
-    user_ids = [p.user_id for p in participants]
-    from app.schemas.conversation import MessageBase
-    msg_out = MessageBase.from_orm(msg)
-    for user_id in user_ids:
-        ws = active_connections.get(user_id)
-        if ws:
-            try:
-                await ws.send_text(json.dumps({
-                    "type": "new_message",
-                    "message": msg_out.model_dump(mode="json")
-                }, default=str))
-            except Exception:
-                pass
-
-    return msg
-
 @router.get("/attachments/{attachment_id}")
+@query_budget(3)
 def download_attachment(
     attachment_id: int,
+    variant: Literal["thumb", "preview"] | None = None,
+    if_none_match: str | None = Header(default=None),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    att = db.get(Attachment, attachment_id)
+    att, is_participant, hidden = get_attachment_access(db, attachment_id, current_user.id)
     if not att or att.is_deleted_for_all:
         raise HTTPException(status_code=404, detail="Файл не знайдено")
-    
-    conv = db.get(Conversation, att.message.conversation_id)
-    is_participant = db.query(ConversationParticipant).filter_by(
-        conversation_id=conv.id, user_id=current_user.id
-    ).first()
     if not is_participant:
         raise HTTPException(status_code=403, detail="Ви не є учасником цієї розмови")
-    
-    st = db.query(AttachmentStatus).filter_by(
-        attachment_id=att.id, user_id=current_user.id
-    ).first()
-    if st and st.is_deleted:
+    if hidden:
         raise HTTPException(status_code=404, detail="Файл не знайдено")
-    
-    from fastapi.responses import FileResponse
-    return FileResponse(
-        att.stored_path,
-        media_type=att.mimetype or "application/octet-stream",
-        filename=att.filename,
-    )
+
+    path, media_type = att.stored_path, att.mimetype or "application/octet-stream"
+    if variant:
+        derived = next((v for v in att.variants if v.variant == variant), None)
+        if derived is None:
+            raise HTTPException(status_code=404, detail="Мініатюра ще не готова")
+        path, media_type = derived.stored_path, derived.mimetype
+
+    etag = etag_for(att, variant)
+    headers = {"Cache-Control": "private, no-cache"}
+    if etag:
+        headers["ETag"] = etag
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+    return MeteredFileResponse(path, media_type=media_type, filename=att.filename, headers=headers)
+
+@router.post("/attachments/{attachment_id}/signed-url")
+@query_budget(3)
+def create_signed_attachment_url(
+    attachment_id: int,
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    att, is_participant, hidden = get_attachment_access(db, attachment_id, current_user.id)
+    if not att or att.is_deleted_for_all or hidden or not att.sha256:
+        raise HTTPException(status_code=404, detail="Файл не знайдено")
+    if not is_participant:
+        raise HTTPException(status_code=403, detail="Ви не є учасником цієї розмови")
+    token, exp = sign({"a": att.id, "h": att.sha256, "m": att.mimetype, "f": att.filename})
+    return {"url": f"/messages/attachments/signed/{token}", "expires_at": exp}
+
+@router.get("/attachments/signed/{token}")
+@query_budget(1)
+def download_signed_attachment(
+    token: str,
+    if_none_match: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+):
+    try:
+        claims = verify(token)
+    except InvalidSignature as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    # підпис живе до exp, тож видалення для всіх перевіряємо на кожному запиті (пошук за PK)
+    if not attachment_available(db, claims["a"], claims["h"]):
+        raise HTTPException(status_code=404, detail="Файл не знайдено")
+
+    variant = claims.get("v")
+    if variant in VARIANTS:
+        path = variant_path(ensure_storage(), claims["h"], variant)
+        media_type = VARIANT_MIMETYPE
+        etag = f'"{claims["h"]}.{variant}"'
+    else:
+        path = blob_path(ensure_storage(), claims["h"])
+        media_type = claims.get("m") or "application/octet-stream"
+        etag = f'"{claims["h"]}"'
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Файл не знайдено")
+
+    max_age = max(0, int(claims["exp"] - time.time()))
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}, immutable"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    filename = claims.get("f") or claims["h"]
+    if settings.ATTACHMENT_OFFLOAD:
+        headers["Content-Disposition"] = content_disposition(filename)
+        if settings.ATTACHMENT_OFFLOAD == "x-accel":
+            rel = os.path.relpath(path, ensure_storage()).replace(os.sep, "/")
+            headers["X-Accel-Redirect"] = settings.ATTACHMENT_ACCEL_PREFIX.rstrip("/") + "/" + rel
+        else:
+            headers["X-Sendfile"] = path
+        attachment_bytes_out.inc(os.path.getsize(path), via="proxy")
+        return Response(media_type=media_type, headers=headers)
+
+    return MeteredFileResponse(path, media_type=media_type, filename=filename, headers=headers)
 
 @router.delete("/attachments/{attachment_id}")
+@query_budget(9)
 def delete_attachment(
     attachment_id: int,
     scope: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    att = db.get(Attachment, attachment_id)
+    att, is_participant, _ = get_attachment_access(db, attachment_id, current_user.id)
     if not att:
         raise HTTPException(status_code=404, detail="Файл не знайдено")
-    
-    conv = db.get(Conversation, att.message.conversation_id)
-    is_participant = db.query(ConversationParticipant).filter_by(
-        conversation_id=conv.id, user_id=current_user.id
-    ).first()
     if not is_participant:
         raise HTTPException(status_code=403, detail="Ви не є учасником цієї розмови")
     
@@ -134,7 +226,7 @@ def delete_attachment(
         raise HTTPException(status_code=400, detail="Невірний параметр scope")
     
     if scope == "me":
-        mark_attachment_deleted_for_me(db, att.id, current_user.id)
+        mark_attachment_deleted_for_me(db, att, current_user.id)
         return {"detail": "Файл позначено як видалений для вас"}
     else:
         if att.uploader_id != current_user.id:
@@ -143,77 +235,90 @@ def delete_attachment(
         return {"detail": "Файл видалено для всіх учасників"}
     
 @router.get("/page", response_model=MessagePage)
+@query_budget(5)
 def get_messages_page(
     conversation_id: int,
     before_id: int | None = None,
-    limit: int = 30,
+    after_id: int | None = None,
+    around_id: int | None = None,
+    limit: int = Query(default=30, ge=1, le=100),
     search: str | None = None,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    if sum(c is not None for c in (before_id, after_id, around_id)) > 1:
+        raise HTTPException(status_code=400, detail="Вкажіть лише один з параметрів before_id, after_id, around_id")
+    items, has_before, has_after = fetch_messages_page(
+        db, conversation_id, current_user.id, before_id, limit, search, after_id, around_id
+    )
+    return {
+        "items": items,
+        "has_more": has_before,
+        "next_before_id": items[0].id if has_before else None,
+        "has_more_after": has_after,
+        "next_after_id": items[-1].id if has_after else None,
+    }
+
+@router.get("/search", response_model=List[MessageSearchHit])
+@query_budget(3)
+def search_my_messages(
+    q: str = Query(..., min_length=1),
+    conversation_id: int | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    items, has_more, next_before = fetch_messages_page(db, conversation_id, current_user.id, before_id, limit, search)
-    return {"items": items, "has_more": has_more, "next_before_id": next_before}
+    hits = search_messages(db, current_user.id, q, conversation_id, limit, offset)
+    return [{"message": msg, "rank": rank, "snippet": snippet} for msg, rank, snippet in hits]
 
 @router.patch("/{message_id}")
+@query_budget(6)
 async def edit_message(
     message_id: int,
     req: EditMessageRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
+    try:
+        await run_in_db_pool(message_service.edit_message, db, message_id, current_user.id, req.content)
+    except MessageNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except MessageForbidden as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    return {"message": "updated"}
+
+def _delete(db: Session, message_id: int, user_id: int, scope: str) -> str:
     msg = db.get(Message, message_id)
-    if not msg or msg.is_deleted_for_all:
+    if not msg:
         raise HTTPException(status_code=404, detail="Повідомлення не знайдено")
-    
-    if msg.sender_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Ви не можете редагувати це повідомлення")
-    msg.content = req.content
-    msg.edited_at = datetime.now(UTC)
-    db.add(msg)
+
+    if scope == "me":
+        hide_for_user(db, user_id, msg.conversation_id, msg.id)
+        refresh_counters(db, msg.conversation_id, [user_id])
+        db.commit()
+        return "Видалено для мене"
+
+    if msg.sender_id != user_id:
+        raise HTTPException(status_code=403, detail="Тільки автор повідомлення може видалити його для всіх")
+    delete_for_all(db, msg.conversation_id, msg.id)
+    refresh_counters(db, msg.conversation_id)
+    outbox_service.enqueue(db, outbox_service.participant_ids(db, msg.conversation_id), {
+        "type": "message_deleted",
+        "conversation_id": msg.conversation_id,
+        "message_id": msg.id,
+    })
     db.commit()
-    db.refresh(msg)
-    return {"message": "updated"}
+    return "Видалено для всіх"
 
 @router.delete("/{message_id}")
+@query_budget(12)
 async def delete_message(
     message_id: int,
     scope: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    msg = db.get(Message, message_id)
-    if not msg:
-        raise HTTPException(status_code=404, detail="Повідомлення не знайдено")
-    
     if scope not in {"me", "all"}:
         raise HTTPException(status_code=400, detail="Невірний параметр scope")
-    
-    if scope == "me":
-        st = db.query(MessageStatus).filter_by(message_id=message_id, user_id=current_user.id).first()
-        if not st:
-            st = MessageStatus(message_id=message_id, user_id=current_user.id, is_deleted=True)
-            db.add(st)
-        else:
-            st.is_deleted = True
-
-        for att in msg.attachments:
-            asx = db.query(AttachmentStatus).filter_by(attachment_id=att.id, user_id=current_user.id).first()
-            if not asx:
-                db.add(AttachmentStatus(attachment_id=att.id, user_id=current_user.id, is_deleted=True))
-            else:
-                asx.is_deleted = True
-        db.commit()
-        return {"message": "Видалено для мене"}
-    
-    else:
-        if msg.sender_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Тільки автор повідомлення може видалити його для всіх")
-        msg.is_deleted_for_all = True
-        db.add(msg)
-        for att in msg.attachments:
-            att.is_deleted_for_all = True
-            db.add(att)
-
-        db.commit()
-        return {"message": "Видалено для всіх"}
-    
\ No newline at end of file
+    return {"message": await run_in_db_pool(_delete, db, message_id, current_user.id, scope)}
@@ -2,40 +2,59 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.core.dependencies import get_db
-from app.core.auth import get_current_user
+from app.core.auth import get_current_user, CurrentUser
 from app.models.user import User
 from app.schemas.user import UserMe, UserUpdate, PasswordChange
-from app.core.security import verify_password
+from app.core.security import verify_password_async, get_password_hash_async
+from app.core.executor import run_in_db_pool, PoolBusy
+from app.core.rate_limit import login_account_limiter as account_limiter
 from app.services import user_service
+from app.core.instrumentation import query_budget
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/me", response_model=UserMe)
-def get_me(current_user: User = Depends(get_current_user)):
+@query_budget(1)
+def get_me(current_user: CurrentUser = Depends(get_current_user)):
     return current_user
 
 @router.patch("/me", response_model=UserMe)
+@query_budget(5)
 def patch_me(
     payload: UserUpdate, 
     db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
     ):
     if payload.username and user_service.is_username_taken(db, payload.username, exclude_user_id=current_user.id):
         raise HTTPException(status_code=400, detail="Таке ім'я користувача вже зайняте")
     
-    user = user_service.update_user(db, current_user, payload)
+    user = user_service.update_user(db, db.get(User, current_user.id), payload)
     return user
 
 @router.post("/me/change-password")
-def change_password(
+@query_budget(4)
+async def change_password(
     body: PasswordChange,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
 ):
-    if not verify_password(body.old_password, current_user.hashed_password):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Невірний старий пароль")
     if body.new_password != body.confirm_password:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Нові паролі не співпадають")
-    
-    user_service.set_user_password(db, current_user, body.new_password)
-    return {"message": "Пароль успішно змінено"}
\ No newline at end of file
+    account = f"user:{current_user.id}"
+    wait = account_limiter.retry_after(account)
+    if wait:
+        raise HTTPException(status_code=429, detail="Забагато спроб, спробуйте пізніше",
+                            headers={"Retry-After": str(int(wait) + 1)})
+
+    user = await run_in_db_pool(db.get, User, current_user.id)
+    try:
+        ok, _ = await verify_password_async(body.old_password, user.hashed_password)
+        if not ok:
+            account_limiter.hit(account)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Невірний старий пароль")
+        hashed_password = await get_password_hash_async(body.new_password)
+    except PoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    await run_in_db_pool(user_service.set_user_password, db, user, body.new_password, hashed_password)
+    return {"message": "Пароль успішно змінено"}
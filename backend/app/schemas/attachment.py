@@ -1,5 +1,18 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from datetime import datetime
+from typing import List
+from app.core.signing import attachment_url
+
+
+class AttachmentVariantOut(BaseModel):
+    variant: str
+    mimetype: str
+    width: int
+    height: int
+    size_bytes: int
+
+    class Config:
+        from_attributes = True
 
 
 class AttachmentOut(BaseModel):
@@ -7,8 +20,27 @@ class AttachmentOut(BaseModel):
     filename: str
     mimetype: str | None = None
     size_bytes: int | None = None
+    sha256: str | None = None
     is_deleted_for_all: bool
     created_at: datetime
+    variants: List[AttachmentVariantOut] = []
+
+    def _signed_url(self, variant: str | None = None) -> str | None:
+        if self.is_deleted_for_all or not self.sha256:
+            return None
+        return attachment_url(self.id, self.sha256, self.mimetype, self.filename, variant)
+
+    @computed_field
+    @property
+    def download_url(self) -> str | None:
+        return self._signed_url()
+
+    @computed_field
+    @property
+    def thumb_url(self) -> str | None:
+        if not any(v.variant == "thumb" for v in self.variants):
+            return None
+        return self._signed_url("thumb")
 
     class Config:
         from_attributes = True
\ No newline at end of file
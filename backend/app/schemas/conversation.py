@@ -11,6 +11,7 @@ class MessageBase(BaseModel):
     content: str
     created_at: datetime
     edited_at: Optional[datetime] = None
+    client_msg_id: Optional[str] = None
     attachments: List[AttachmentOut] = []
 
     class Config:
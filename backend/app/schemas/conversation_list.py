@@ -12,6 +12,8 @@ class ConversationListItem(BaseModel):
     last_message_preview: Optional[str] = None
     last_message_at: Optional[datetime] = None
     unread_count: int
+    last_read_message_id: Optional[int] = None
+    peer_last_read_message_id: Optional[int] = None
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -7,7 +7,15 @@ class MessagePage(BaseModel):
     items: List[MessageBase]
     has_more: bool
     next_before_id: Optional[int] = None
+    has_more_after: bool = False
+    next_after_id: Optional[int] = None
     
 
 class EditMessageRequest(BaseModel):
-    content: str
\ No newline at end of file
+    content: str
+
+
+class MessageSearchHit(BaseModel):
+    message: MessageBase
+    rank: float
+    snippet: str
@@ -1,12 +1,31 @@
 # app/services/attachment_service.py
 import os
-import uuid
-from typing import List
+import hashlib
+from urllib.parse import quote
+from typing import BinaryIO, List
 from fastapi import UploadFile
+from fastapi.responses import FileResponse
+from sqlalchemy import select, and_, func
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from app.core.config import settings
 from app.models.attachment import Attachment, AttachmentStatus
-from app.models.conversation import Message
+from app.models.blob import BlobVariant
+from app.models.conversation import Message, ConversationParticipant
+from app.core.metrics import counter
+from app.services.blob_service import FileIdentity, acquire_blob, discard_files, release_blob
+
+attachment_bytes_in = counter(
+    "attachment_bytes_in_total", "Attachment bytes uploaded", ["stored"]
+)
+attachment_bytes_out = counter(
+    "attachment_bytes_out_total", "Attachment bytes sent to clients", ["via"]
+)
+
+
+class AttachmentTooLarge(ValueError):
+    pass
+
 
 def ensure_storage() -> str:
     os.makedirs(settings.STORAGE_DIR, exist_ok=True)
@@ -14,44 +33,96 @@ def ensure_storage() -> str:
     os.makedirs(sub, exist_ok=True)
     return sub
 
+def _mb(n: int) -> str:
+    return f"{n / (1024 * 1024):.0f} МБ"
+
+def hash_stream(src: BinaryIO, max_bytes: int, label: str) -> tuple[int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = src.read(settings.UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise AttachmentTooLarge(f"Файл {label} перевищує допустимий розмір ({_mb(max_bytes)})")
+        digest.update(chunk)
+    return size, digest.hexdigest()
+
+def check_upload_sizes(files: List[UploadFile]):
+    total = 0
+    for f in files or []:
+        size = getattr(f, "size", None)
+        if size is None:
+            continue
+        if size > settings.MAX_ATTACHMENT_BYTES:
+            raise AttachmentTooLarge(
+                f"Файл {f.filename} перевищує допустимий розмір ({_mb(settings.MAX_ATTACHMENT_BYTES)})"
+            )
+        total += size
+    if total > settings.MAX_MESSAGE_ATTACHMENTS_BYTES:
+        raise AttachmentTooLarge(
+            f"Загальний розмір файлів перевищує {_mb(settings.MAX_MESSAGE_ATTACHMENTS_BYTES)}"
+        )
+
 def save_attachments(
     db: Session, message: Message, uploader_id: int, files: List[UploadFile]
 ) -> List[Attachment]:
     dest_dir = ensure_storage()
     saved: List[Attachment] = []
-    for f in files or []:
-        if not hasattr(f, "file"):
-            continue
+    owned: List[FileIdentity] = []
+    remaining = settings.MAX_MESSAGE_ATTACHMENTS_BYTES
+    try:
+        for f in files or []:
+            if not hasattr(f, "file"):
+                continue
 
-        ext = os.path.splitext(f.filename)[1] if f.filename else ""
-        stored_name = f"{uuid.uuid4().hex}{ext}"
-        stored_path = os.path.join(dest_dir, stored_name)
+            label = f.filename or "без назви"
+            f.file.seek(0)
+            size, sha256 = hash_stream(f.file, min(settings.MAX_ATTACHMENT_BYTES, remaining), label)
+            remaining -= size
 
-        try:
             f.file.seek(0)
-        except Exception:
-            pass
-
-        with open(stored_path, "wb") as out:
-            out.write(f.file.read())
-
-        size = os.path.getsize(stored_path)
-        att = Attachment(
-            message_id=message.id,
-            uploader_id=uploader_id,
-            filename=f.filename or stored_name,
-            stored_path=stored_path,
-            mimetype=getattr(f, "content_type", None),
-            size_bytes=size,
-        )
-        db.add(att)
-        saved.append(att)
+            stored_path, is_new, created = acquire_blob(db, dest_dir, sha256, size, f.file)
+            if created:
+                owned.append(created)
+            attachment_bytes_in.inc(size, stored="new" if is_new else "dedup")
 
-    db.commit()
-    for att in saved:
-        db.refresh(att)
+            att = Attachment(
+                message_id=message.id,
+                uploader_id=uploader_id,
+                filename=f.filename or sha256,
+                stored_path=stored_path,
+                mimetype=getattr(f, "content_type", None),
+                size_bytes=size,
+                sha256=sha256,
+            )
+            db.add(att)
+            saved.append(att)
+        db.flush()
+    except BaseException:
+        discard_files(owned)
+        raise
+    _load_variants(db, saved)
     return saved
 
+def _load_variants(db: Session, attachments: List[Attachment]):
+    if not attachments:
+        return
+    by_sha: dict[str, list[BlobVariant]] = {}
+    for v in db.scalars(select(BlobVariant).where(BlobVariant.sha256.in_({a.sha256 for a in attachments}))):
+        by_sha.setdefault(v.sha256, []).append(v)
+    for a in attachments:
+        set_committed_value(a, "variants", by_sha.get(a.sha256, []))
+
+class MeteredFileResponse(FileResponse):
+    async def __call__(self, scope, receive, send):
+        async def metered_send(message):
+            if message["type"] == "http.response.body":
+                attachment_bytes_out.inc(len(message.get("body", b"")), via="backend")
+            await send(message)
+        await super().__call__(scope, receive, metered_send)
+
 def mark_attachment_deleted_for_me(db: Session, attachment: Attachment, user_id: int):
     st = db.query(AttachmentStatus).filter_by(
         attachment_id=attachment.id, user_id=user_id
@@ -66,12 +137,84 @@ def mark_attachment_deleted_for_me(db: Session, attachment: Attachment, user_id:
     db.commit()
 
 def delete_attachment_for_all(db: Session, attachment: Attachment):
+    if attachment.is_deleted_for_all:
+        return
     attachment.is_deleted_for_all = True
     db.add(attachment)
-    db.commit()
+    db.flush()
+
+    if attachment.sha256:
+        release_blob(db, attachment.sha256)
+        db.commit()
+        return
 
+    db.commit()
     try:
         if attachment.stored_path and os.path.exists(attachment.stored_path):
             os.remove(attachment.stored_path)
     except Exception:
         pass
+
+
+def get_attachment_access(
+    db: Session, attachment_id: int, user_id: int
+) -> tuple[Attachment | None, bool, bool]:
+    row = db.execute(
+        select(
+            Attachment,
+            ConversationParticipant.id.is_not(None),
+            AttachmentStatus.is_deleted,
+            Attachment.message_id <= func.coalesce(ConversationParticipant.cleared_before_message_id, 0),
+        )
+        .join(Message, Message.id == Attachment.message_id)
+        .outerjoin(
+            ConversationParticipant,
+            and_(
+                ConversationParticipant.conversation_id == Message.conversation_id,
+                ConversationParticipant.user_id == user_id,
+            ),
+        )
+        .outerjoin(
+            AttachmentStatus,
+            and_(
+                AttachmentStatus.attachment_id == Attachment.id,
+                AttachmentStatus.user_id == user_id,
+            ),
+        )
+        .where(Attachment.id == attachment_id)
+        .limit(1)
+    ).first()
+    if row is None:
+        return None, False, False
+    att, is_participant, hidden, cleared = row
+    return att, bool(is_participant), bool(hidden or cleared)
+
+def attachment_available(db: Session, attachment_id: int, sha256: str) -> bool:
+    row = db.execute(
+        select(Attachment.is_deleted_for_all).where(Attachment.id == attachment_id, Attachment.sha256 == sha256)
+    ).first()
+    return row is not None and not row.is_deleted_for_all
+
+def etag_for(attachment: Attachment, variant: str | None = None) -> str | None:
+    if not attachment.sha256:
+        return None
+    return f'"{attachment.sha256}.{variant}"' if variant else f'"{attachment.sha256}"'
+
+def etag_matches(if_none_match: str | None, etag: str | None) -> bool:
+    if not if_none_match or not etag:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
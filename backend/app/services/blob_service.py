@@ -0,0 +1,132 @@
+import os
+import shutil
+import uuid
+from collections import Counter
+from typing import BinaryIO, Iterable, Optional
+from sqlalchemy import bindparam, delete, event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.blob import Blob, BlobVariant
+
+_UNLINK = "blob_unlink"
+FileIdentity = tuple[str, tuple[int, int]]
+
+def blob_path(root: str, sha256: str) -> str:
+    return os.path.join(root, sha256[:2], sha256[2:4], sha256)
+
+def variant_path(root: str, sha256: str, variant: str) -> str:
+    return os.path.join(root, "variants", sha256[:2], f"{sha256}.{variant}.jpg")
+
+def _write_blob(src: BinaryIO, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "wb") as out:
+            shutil.copyfileobj(src, out, settings.UPLOAD_CHUNK_SIZE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def file_identity(path: str) -> Optional[FileIdentity]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return path, (st.st_dev, st.st_ino)
+
+def discard_files(files: Iterable[Optional[FileIdentity]]):
+    # шлях детермінований (sha256), тож паралельний acquire_blob міг уже покласти туди
+    # нову копію через os.replace; видаляємо лише той самий файл, що бачили раніше
+    for item in files:
+        if item is None:
+            continue
+        path, ident = item
+        current = file_identity(path)
+        if current is not None and current[1] == ident:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def acquire_blob(
+    db: Session, root: str, sha256: str, size: int, src: BinaryIO
+) -> tuple[str, bool, Optional[FileIdentity]]:
+    # (шлях, чи записано байти, файл, яким володіє лише ця транзакція — його можна
+    # прибрати при відкаті, бо рядок blobs для нього створено саме тут)
+    path = blob_path(root, sha256)
+    bumped = db.execute(
+        update(Blob)
+        .where(Blob.sha256 == sha256)
+        .values(ref_count=Blob.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if bumped:
+        if os.path.exists(path):
+            return path, False, None
+        _write_blob(src, path)
+        return path, True, None
+
+    _write_blob(src, path)
+    written = file_identity(path)
+    try:
+        with db.begin_nested():
+            db.add(Blob(sha256=sha256, stored_path=path, size_bytes=size, ref_count=1))
+    except IntegrityError:
+        db.execute(
+            update(Blob)
+            .where(Blob.sha256 == sha256)
+            .values(ref_count=Blob.ref_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return path, True, None
+    return path, True, written
+
+def release_blobs(db: Session, sha256s: Iterable[Optional[str]]):
+    # файли видаляються тільки після коміту: відкат не повинен лишати рядки без файлів
+    counts = Counter(s for s in sha256s if s)
+    if not counts:
+        return
+    B = Blob.__table__
+    db.connection().execute(
+        update(B)
+        .where(B.c.sha256 == bindparam("h"), B.c.ref_count > 0)
+        .values(ref_count=B.c.ref_count - bindparam("n")),
+        [{"h": sha256, "n": n} for sha256, n in counts.items()],
+    )
+    dead = db.execute(
+        select(Blob.sha256, Blob.stored_path).where(Blob.sha256.in_(counts), Blob.ref_count <= 0)
+    ).all()
+    if not dead:
+        return
+    dead_shas = [sha256 for sha256, _ in dead]
+    paths = [path for _, path in dead] + list(db.scalars(
+        select(BlobVariant.stored_path).where(BlobVariant.sha256.in_(dead_shas))
+    ))
+    db.execute(
+        delete(Blob)
+        .where(Blob.sha256.in_(dead_shas), Blob.ref_count <= 0)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        delete(BlobVariant)
+        .where(BlobVariant.sha256.in_(dead_shas))
+        .execution_options(synchronize_session=False)
+    )
+    db.info.setdefault(_UNLINK, []).extend(file_identity(path) for path in paths)
+
+def release_blob(db: Session, sha256: str):
+    release_blobs(db, [sha256])
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    discard_files(session.info.pop(_UNLINK, ()))
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_rollback(session: Session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop(_UNLINK, None)
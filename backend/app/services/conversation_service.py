@@ -1,110 +1,160 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, select, update, bindparam, and_, or_
 from datetime import datetime, timezone
 from app.models.conversation import Conversation, ConversationParticipant, Message
 from app.models.user import User
-from app.models.message_status import MessageStatus
+from app.services.counter_service import unread_after
+
+PREVIEW_LENGTH = 200
+
+def _to_naive_utc(dt: datetime | None) -> datetime | None:
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+def list_conversations_with_unread(
+    db: Session,
+    user_id: int,
+    limit: int | None = None,
+    before_last_message_at: datetime | None = None,
+    before_conversation_id: int | None = None,
+) -> list[dict]:
+    me = aliased(ConversationParticipant)
+    peer = aliased(ConversationParticipant)
+    last_msg = aliased(Message)
+
+    peers = (
+        select(
+            peer.conversation_id.label("conversation_id"),
+            peer.user_id.label("peer_id"),
+            peer.last_read_message_id.label("peer_last_read_message_id"),
+            func.row_number().over(
+                partition_by=peer.conversation_id, order_by=peer.user_id
+            ).label("peer_rank"),
+        )
+        .where(
+            peer.user_id != user_id,
+            peer.conversation_id.in_(
+                select(ConversationParticipant.conversation_id)
+                .where(ConversationParticipant.user_id == user_id)
+            ),
+        )
+        .subquery()
+    )
+
+    stmt = (
+        select(
+            me.conversation_id.label("conversation_id"),
+            peers.c.peer_id,
+            peers.c.peer_last_read_message_id,
+            User.username.label("peer_username"),
+            User.gender.label("peer_gender"),
+            me.last_visible_message_id.label("last_message_id"),
+            func.substr(last_msg.content, 1, PREVIEW_LENGTH).label("last_message_preview"),
+            me.last_message_at.label("last_message_at"),
+            me.unread_count.label("unread_count"),
+            me.last_read_message_id.label("last_read_message_id"),
+        )
+        .join(peers, and_(peers.c.conversation_id == me.conversation_id, peers.c.peer_rank == 1))
+        .join(User, User.id == peers.c.peer_id)
+        .outerjoin(last_msg, last_msg.id == me.last_visible_message_id)
+        .where(me.user_id == user_id, me.is_hidden == False)
+    )
+
+    before_last_message_at = _to_naive_utc(before_last_message_at)
+    if before_last_message_at is not None:
+        after_cursor = [me.last_message_at < before_last_message_at, me.last_message_at.is_(None)]
+        if before_conversation_id is not None:
+            after_cursor.append(and_(
+                me.last_message_at == before_last_message_at,
+                me.conversation_id < before_conversation_id,
+            ))
+        stmt = stmt.where(or_(*after_cursor))
+    elif before_conversation_id is not None:
+        stmt = stmt.where(
+            me.last_message_at.is_(None),
+            me.conversation_id < before_conversation_id,
+        )
 
-def list_conversations_with_unread(db: Session, user_id: int) -> list[dict]:
-    parts = db.query(ConversationParticipant).filter(
-        ConversationParticipant.user_id == user_id,
-        ConversationParticipant.is_hidden == False
-    ).all()
+    stmt = stmt.order_by(
+        me.last_message_at.is_(None),
+        me.last_message_at.desc(),
+        me.conversation_id.desc(),
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
 
     items: list[dict] = []
+    for row in db.execute(stmt).mappings():
+        item = dict(row)
+        item["last_message_preview"] = item["last_message_preview"] or None
+        item["unread_count"] = int(item["unread_count"] or 0)
+        items.append(item)
+    return items
 
-    for part in parts:
-        conv_id = part.conversation_id
-
-        peer_part = db.query(ConversationParticipant).filter(
-            ConversationParticipant.conversation_id == conv_id,
-            ConversationParticipant.user_id != user_id
-        ).first()
-        if not peer_part:
+def last_visible_message_id(db: Session, conversation_id: int, user_id: int) -> int | None:
+    return db.scalar(
+        select(ConversationParticipant.last_visible_message_id)
+        .where(ConversationParticipant.conversation_id == conversation_id, ConversationParticipant.user_id == user_id)
+    )
+
+def apply_read_markers(db: Session, markers: dict[tuple[int, int], int]) -> list[dict]:
+    # (conversation_id, user_id) -> up_to_message_id
+    if not markers:
+        return []
+    P = ConversationParticipant
+    rows = db.execute(
+        select(P.conversation_id, P.user_id, P.last_read_message_id)
+        .where(P.conversation_id.in_({cid for cid, _ in markers}))
+    ).all()
+    members: dict[int, list[int]] = {}
+    params = []
+    for cid, uid, last_read in rows:
+        members.setdefault(cid, []).append(uid)
+        if (cid, uid) not in markers:
             continue
-        peer = db.get(User, peer_part.user_id)
-
-        last_msg = (
-            db.query(Message)
-            .filter(
-                Message.conversation_id == conv_id,
-                Message.is_deleted_for_all == False,
-            )
-            .outerjoin(
-                MessageStatus,
-                (MessageStatus.message_id == Message.id)
-                & (MessageStatus.user_id == user_id)
-            )
-            .filter(
-                (MessageStatus.id.is_(None)) | (MessageStatus.is_deleted == False)
-            )
-            .order_by(Message.id.desc())
-            .first()
-        )
-
-        last_id = int(part.last_read_message_id or 0)
-
-        unread_count = (
-            db.query(func.count(Message.id))
-            .filter(
-                Message.conversation_id == conv_id,
-                Message.id > last_id,
-                Message.sender_id != user_id,
-                Message.is_deleted_for_all == False,
-            )
-            .outerjoin(
-                MessageStatus,
-                (MessageStatus.message_id == Message.id)
-                & (MessageStatus.user_id == user_id)
-            )
-            .filter(
-                (MessageStatus.id.is_(None)) | (MessageStatus.is_deleted == False)
-            )
-            .scalar()
+        up_to = markers[(cid, uid)]
+        if last_read is not None and up_to <= last_read:
+            continue
+        params.append({"cid": cid, "uid": uid, "mark": int(up_to)})
+    if not params:
+        return []
+
+    # умова на last_read_message_id тримає маркер монотонним і при паралельних flush з різних воркерів
+    t = P.__table__
+    db.connection().execute(
+        update(t)
+        .where(
+            t.c.conversation_id == bindparam("cid"),
+            t.c.user_id == bindparam("uid"),
+            or_(t.c.last_read_message_id.is_(None), t.c.last_read_message_id < bindparam("mark")),
         )
-
-        items.append({
-            "conversation_id": conv_id,
-            "peer_id": peer.id,
-            "peer_username": peer.username,
-            "peer_gender": peer.gender,
-            "last_message_id": last_msg.id if last_msg else None,
-            "last_message_preview": (last_msg.content[:200] if last_msg and last_msg.content else None),
-            "last_message_at": last_msg.created_at if last_msg else None,
-            "unread_count": int(unread_count or 0),
-        })
-
-    def to_utc(dt):
-        if dt is None:
-            return datetime.min.replace(tzinfo=timezone.utc)
-        if dt.tzinfo is None:
-            return dt.replace(tzinfo=timezone.utc)
-        return dt.astimezone(timezone.utc)
-
-    items.sort(key=lambda x: to_utc(x["last_message_at"]), reverse=True)
-    return items
-
-def mark_conversation_read(db: Session, conversation_id: int, user_id: int, up_to_message_id: int | None):
-    part = db.query(ConversationParticipant).filter_by(
-        conversation_id=conversation_id, user_id=user_id
-    ).first()
-    if not part:
-        return
-    
-    if up_to_message_id is None:
-        last = db.query(Message).filter(
-            Message.conversation_id == conversation_id,
-            Message.is_deleted_for_all == False
-        ).order_by(Message.id.desc()).first()
-        if not last:
-            return
-        up_to_message_id = last.id
-
-    if part.last_read_message_id is None or up_to_message_id > part.last_read_message_id:
-        part.last_read_message_id = int(up_to_message_id)
-        part.last_read_at = datetime.now(timezone.utc)
-        db.add(part)
-        db.commit()
+        .values(
+            last_read_message_id=bindparam("mark"),
+            last_read_at=datetime.now(timezone.utc),
+            unread_count=unread_after(bindparam("mark")),
+        ),
+        params,
+    )
+    db.commit()
+    return [
+        {"conversation_id": p["cid"], "user_id": p["uid"], "up_to_message_id": p["mark"], "members": members[p["cid"]]}
+        for p in params
+    ]
+
+def peers_last_seen(db: Session, user_id: int, candidate_ids: list[int]) -> dict[int, datetime | None]:
+    if not candidate_ids:
+        return {}
+    me = aliased(ConversationParticipant)
+    peer = aliased(ConversationParticipant)
+    rows = db.execute(
+        select(User.id, User.last_seen_at)
+        .join(peer, peer.user_id == User.id)
+        .join(me, and_(me.conversation_id == peer.conversation_id, me.user_id == user_id))
+        .where(User.id.in_(candidate_ids))
+        .distinct()
+    ).all()
+    return {uid: seen for uid, seen in rows}
 
 def get_or_create_dialog(db: Session, user_a_id: int, user_b_id: int) -> Conversation:
     if user_a_id == user_b_id:
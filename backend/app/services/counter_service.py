@@ -0,0 +1,97 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, select, update, case, or_
+from app.models.conversation import ConversationParticipant, Message
+from app.services.message_service import visible_to
+
+def _recomputed_values() -> dict:
+    P = ConversationParticipant
+    last_id = (
+        select(func.max(Message.id))
+        .where(
+            Message.conversation_id == P.conversation_id,
+            Message.is_deleted_for_all == False,
+            visible_to(P.user_id, P.cleared_before_message_id),
+        )
+        .correlate(P)
+        .scalar_subquery()
+    )
+    last_msg = aliased(Message)
+    last_at = (
+        select(last_msg.created_at)
+        .where(last_msg.id == last_id)
+        .correlate(P)
+        .scalar_subquery()
+    )
+    return {
+        "last_visible_message_id": last_id,
+        "last_message_at": last_at,
+        "unread_count": unread_after(func.coalesce(P.last_read_message_id, 0)),
+    }
+
+def unread_after(last_read):
+    P = ConversationParticipant
+    return (
+        select(func.count(Message.id))
+        .where(
+            Message.conversation_id == P.conversation_id,
+            Message.id > last_read,
+            Message.sender_id != P.user_id,
+            Message.is_deleted_for_all == False,
+            visible_to(P.user_id, P.cleared_before_message_id),
+        )
+        .correlate(P)
+        .scalar_subquery()
+    )
+
+def on_message_created(db: Session, msg: Message):
+    on_messages_created(db, [msg])
+
+def on_messages_created(db: Session, msgs: list[Message]):
+    P = ConversationParticipant
+    by_conversation: dict[int, list[Message]] = {}
+    for m in msgs:
+        by_conversation.setdefault(m.conversation_id, []).append(m)
+    for conversation_id, group in by_conversation.items():
+        last = max(group, key=lambda m: m.id)
+        own: dict[int, int] = {}
+        for m in group:
+            own[m.sender_id] = own.get(m.sender_id, 0) + 1
+        is_newer = or_(P.last_visible_message_id.is_(None), P.last_visible_message_id < last.id)
+        db.execute(
+            update(P)
+            .where(P.conversation_id == conversation_id)
+            .values(
+                last_visible_message_id=case((is_newer, last.id), else_=P.last_visible_message_id),
+                last_message_at=case((is_newer, last.created_at), else_=P.last_message_at),
+                unread_count=P.unread_count + len(group) - case(own, value=P.user_id, else_=0),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+def refresh_counters(db: Session, conversation_id: int, user_ids: list[int] | None = None):
+    P = ConversationParticipant
+    stmt = update(P).where(P.conversation_id == conversation_id)
+    if user_ids is not None:
+        stmt = stmt.where(P.user_id.in_(user_ids))
+    db.execute(
+        stmt.values(**_recomputed_values()).execution_options(synchronize_session=False)
+    )
+
+def reset_counters(db: Session, conversation_id: int, user_ids: list[int] | None = None):
+    P = ConversationParticipant
+    stmt = update(P).where(P.conversation_id == conversation_id)
+    if user_ids is not None:
+        stmt = stmt.where(P.user_id.in_(user_ids))
+    db.execute(
+        stmt.values(unread_count=0, last_visible_message_id=None, last_message_at=None)
+        .execution_options(synchronize_session=False)
+    )
+
+def recompute_all_counters(db: Session, conversation_id: int | None = None) -> int:
+    P = ConversationParticipant
+    stmt = update(P).values(**_recomputed_values())
+    if conversation_id is not None:
+        stmt = stmt.where(P.conversation_id == conversation_id)
+    result = db.execute(stmt.execution_options(synchronize_session=False))
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,70 @@
+import json
+from sqlalchemy import bindparam, delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.database.database import SessionLocal
+from app.models.outbox import UserEvent, UserEventSeq
+
+def _upsert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(UserEventSeq)
+    return sqlite.insert(UserEventSeq)
+
+def append(db: Session, events: list[tuple[list[int], str]]) -> list[tuple[int, int, str]]:
+    counts: dict[int, int] = {}
+    for user_ids, _ in events:
+        for uid in user_ids:
+            counts[uid] = counts.get(uid, 0) + 1
+    if not counts:
+        return []
+
+    stmt = _upsert(db).values([{"user_id": uid, "last_seq": n} for uid, n in sorted(counts.items())])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"], set_={"last_seq": UserEventSeq.last_seq + stmt.excluded.last_seq}
+    ).returning(UserEventSeq.user_id, UserEventSeq.last_seq)
+    last = dict(db.execute(stmt).all())
+    next_seq = {uid: last[uid] - n + 1 for uid, n in counts.items()}
+
+    out: list[tuple[int, int, str]] = []
+    for user_ids, payload in events:
+        event = json.loads(payload)
+        for uid in user_ids:
+            seq = next_seq[uid]
+            next_seq[uid] += 1
+            out.append((uid, seq, json.dumps({**event, "seq": seq}, default=str)))
+
+    db.execute(insert(UserEvent), [{"user_id": uid, "seq": seq, "payload": text} for uid, seq, text in out])
+    expired = [
+        {"u": uid, "s": seq - settings.USER_EVENT_LOG_SIZE}
+        for uid, seq in last.items() if seq > settings.USER_EVENT_LOG_SIZE
+    ]
+    if expired:
+        E = UserEvent.__table__
+        db.connection().execute(
+            delete(E).where(E.c.user_id == bindparam("u"), E.c.seq <= bindparam("s")),
+            expired,
+        )
+    return out
+
+def last_seq(db: Session, user_id: int) -> int:
+    return db.scalar(select(UserEventSeq.last_seq).where(UserEventSeq.user_id == user_id)) or 0
+
+def replay(user_id: int, since_seq: int | None) -> tuple[int, list[str] | None]:
+    db = SessionLocal()
+    try:
+        current = last_seq(db, user_id)
+        if since_seq is None or since_seq == current:
+            return current, []
+        if since_seq > current or current - since_seq > settings.USER_EVENT_REPLAY_MAX:
+            return current, None
+        rows = db.execute(
+            select(UserEvent.seq, UserEvent.payload)
+            .where(UserEvent.user_id == user_id, UserEvent.seq > since_seq, UserEvent.seq <= current)
+            .order_by(UserEvent.seq)
+        ).all()
+        if len(rows) != current - since_seq:
+            return current, None
+        return current, [payload for _, payload in rows]
+    finally:
+        db.close()
@@ -1,16 +1,54 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from datetime import datetime, UTC
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import and_, or_, exists, select, update, delete, true, literal, func
+from sqlalchemy.dialects import postgresql, sqlite
 from app.models.conversation import Message, ConversationParticipant
 from app.models.message_status import MessageStatus
+from app.models.attachment import Attachment, AttachmentStatus
+from app.schemas.conversation import MessageBase
+from app.services import outbox_service
+from app.services.blob_service import release_blobs
 
 DEFAULT_PAGE_SIZE = 30
+CLIENT_MSG_ID_MAX = 64
 
-def _exclude_deleted_for_user(q, user_id: int):
-    return q.outerjoin(
-        MessageStatus, (MessageStatus.message_id == Message.id) & (MessageStatus.user_id == user_id)
-    ).filter(
-        (MessageStatus.id.is_(None)) | (MessageStatus.is_deleted == False)
-    )
+
+class MessageNotFound(ValueError):
+    pass
+
+
+class MessageForbidden(ValueError):
+    pass
+
+
+class InvalidMessage(ValueError):
+    pass
+
+
+def visible_to(user_id, cleared_before_message_id=None):
+    not_hidden = ~exists().where(
+        MessageStatus.message_id == Message.id,
+        MessageStatus.user_id == user_id,
+        MessageStatus.is_deleted == True,
+    ).correlate_except(MessageStatus)
+    if cleared_before_message_id is None:
+        return not_hidden
+    return and_(Message.id > func.coalesce(cleared_before_message_id, 0), not_hidden)
+
+def _page_filter(db: Session, conversation_id: int, user_id: int, part, search: str | None):
+    conds = [
+        Message.conversation_id == conversation_id,
+        Message.is_deleted_for_all == False,
+        visible_to(user_id, part.cleared_before_message_id),
+    ]
+    if search:
+        from app.services.search_service import match_clause
+        clause = match_clause(db, search)
+        if clause is None:
+            return None
+        conds.append(clause)
+    return and_(*conds)
 
 def fetch_messages_page(
     db: Session,
@@ -19,25 +57,241 @@ def fetch_messages_page(
     before_id: int | None,
     limit: int = DEFAULT_PAGE_SIZE,
     search: str | None = None,
+    after_id: int | None = None,
+    around_id: int | None = None,
 ):
     part = db.query(ConversationParticipant).filter_by(conversation_id=conversation_id, user_id=user_id).first()
     if not part:
-        return [], False, None
-    
-    q = db.query(Message).filter(
-        Message.conversation_id == conversation_id,
-        Message.is_deleted_for_all == False
+        return [], False, False
+    cond = _page_filter(db, conversation_id, user_id, part, search)
+    if cond is None:
+        return [], False, False
+
+    q = db.query(Message).options(selectinload(Message.attachments))
+    if around_id is not None:
+        # два зустрічні діапазони по (conversation_id, id) в одному запиті; опорне повідомлення — у старшій половині.
+        # Кожен бік читаємо на всю сторінку, щоб добрати нестачу з протилежного біля краю історії
+        head = (
+            select(Message.id).where(cond, Message.id <= around_id)
+            .order_by(Message.id.desc()).limit(limit + 1).subquery()
+        )
+        tail = (
+            select(Message.id).where(cond, Message.id > around_id)
+            .order_by(Message.id.asc()).limit(limit + 1).subquery()
+        )
+        window = select(head.c.id).union_all(select(tail.c.id))
+        rows = q.filter(Message.id.in_(window)).order_by(Message.id.asc()).all()
+        split = sum(1 for m in rows if m.id <= around_id)
+        newer = min(len(rows) - split, limit // 2)
+        older = min(split, limit - newer)
+        newer = min(len(rows) - split, limit - older)
+        return rows[split - older:split + newer], split > older, len(rows) - split > newer
+
+    if after_id is not None:
+        rows = q.filter(cond, Message.id > after_id).order_by(Message.id.asc()).limit(limit + 1).all()
+        has_after = len(rows) > limit
+        return rows[:limit], bool(rows), has_after
+
+    if before_id is not None:
+        cond = and_(cond, Message.id < before_id)
+    rows = q.filter(cond).order_by(Message.id.desc()).limit(limit + 1).all()
+    has_before = len(rows) > limit
+    return list(reversed(rows[:limit])), has_before, before_id is not None and bool(rows)
+
+def new_message_event(msg: MessageBase) -> dict:
+    return {"type": "new_message", "message": msg.model_dump(mode="json")}
+
+def find_by_client_id(db: Session, sender_id: int, client_msg_id: str) -> Message | None:
+    return db.scalar(select(Message).where(Message.sender_id == sender_id, Message.client_msg_id == client_msg_id))
+
+def store_text_messages(db: Session, items: list[tuple[int, int, str, str | None]]) -> list[MessageBase | ValueError]:
+    from app.services.counter_service import on_messages_created
+    P = ConversationParticipant
+    members: dict[int, list[int]] = {}
+    for cid, uid in db.execute(
+        select(P.conversation_id, P.user_id).where(P.conversation_id.in_({cid for _, cid, _, _ in items}))
+    ):
+        members.setdefault(cid, []).append(uid)
+    client_ids = {key for _, _, _, key in items if key}
+    known: dict[tuple[int, str], Message] = {}
+    if client_ids:
+        for m in db.scalars(select(Message).where(Message.client_msg_id.in_(client_ids))):
+            known[(m.sender_id, m.client_msg_id)] = m
+
+    results: list[Message | ValueError] = []
+    created: list[Message] = []
+    for sender_id, conversation_id, content, client_msg_id in items:
+        content = (content or "").strip()
+        if sender_id not in members.get(conversation_id, ()):
+            results.append(MessageForbidden("Ви не є учасником цієї розмови"))
+        elif not content:
+            results.append(InvalidMessage("Повідомлення не може бути порожнім"))
+        elif client_msg_id and len(client_msg_id) > CLIENT_MSG_ID_MAX:
+            results.append(InvalidMessage("Занадто довгий client_msg_id"))
+        elif client_msg_id and (sender_id, client_msg_id) in known:
+            results.append(known[(sender_id, client_msg_id)])
+        else:
+            msg = Message(
+                conversation_id=conversation_id, sender_id=sender_id, content=content, client_msg_id=client_msg_id
+            )
+            created.append(msg)
+            results.append(msg)
+            if client_msg_id:
+                known[(sender_id, client_msg_id)] = msg
+
+    if created:
+        db.add_all(created)
+        db.flush()
+        on_messages_created(db, created)
+        for msg in created:
+            set_committed_value(msg, "attachments", [])
+    out = {id(m): MessageBase.model_validate(m) for m in results if isinstance(m, Message)}
+    for msg in created:
+        outbox_service.enqueue(db, members[msg.conversation_id], new_message_event(out[id(msg)]))
+    db.commit()
+    return [out[id(m)] if isinstance(m, Message) else m for m in results]
+
+def edit_message(db: Session, message_id: int, user_id: int, content: str):
+    msg = db.get(Message, message_id)
+    if not msg or msg.is_deleted_for_all:
+        raise MessageNotFound("Повідомлення не знайдено")
+    if msg.sender_id != user_id:
+        raise MessageForbidden("Ви не можете редагувати це повідомлення")
+    msg.content = content
+    msg.edited_at = datetime.now(UTC)
+    outbox_service.enqueue(db, outbox_service.participant_ids(db, msg.conversation_id), {
+        "type": "message_edited",
+        "conversation_id": msg.conversation_id,
+        "message": {
+            "id": msg.id,
+            "conversation_id": msg.conversation_id,
+            "sender_id": msg.sender_id,
+            "content": msg.content,
+            "created_at": msg.created_at,
+            "edited_at": msg.edited_at,
+            "attachments": [{"id": a.id, "filename": a.filename} for a in msg.attachments],
+        },
+    })
+    db.commit()
+
+def _upsert(db: Session, model):
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+def _message_scope(conversation_id: int, message_id: int | None):
+    cond = Message.conversation_id == conversation_id
+    if message_id is not None:
+        cond = and_(cond, Message.id == message_id)
+    return cond
+
+def hide_for_user(db: Session, user_id: int, conversation_id: int, message_id: int | None = None):
+    scope = _message_scope(conversation_id, message_id)
+
+    ins = _upsert(db, MessageStatus).from_select(
+        ["message_id", "user_id", "is_deleted"],
+        select(Message.id, literal(user_id), true()).where(scope),
     )
-    if before_id:
-        q = q.filter(Message.id < before_id)
-    if search:
-        q = q.filter(Message.content.ilike(f"%{search}%"))
+    db.execute(ins.on_conflict_do_update(
+        index_elements=["message_id", "user_id"], set_={"is_deleted": True}
+    ))
 
-    q = _exclude_deleted_for_user(q, user_id)
-    q = q.order_by(Message.id.desc()).limit(limit + 1)
-    rows = q.all()
+    ins = _upsert(db, AttachmentStatus).from_select(
+        ["attachment_id", "user_id", "is_deleted"],
+        select(Attachment.id, literal(user_id), true())
+        .join(Message, Message.id == Attachment.message_id)
+        .where(scope),
+    )
+    db.execute(ins.on_conflict_do_update(
+        index_elements=["attachment_id", "user_id"], set_={"is_deleted": True}
+    ))
 
-    has_more = len(rows) > limit
-    items = list(reversed(rows[:limit])) if has_more else list(reversed(rows))
-    next_before = items[0].id if has_more else (items[0].id if items else None)
-    return items, has_more, next_before
\ No newline at end of file
+def delete_for_all(db: Session, conversation_id: int, message_id: int | None = None):
+    scope = _message_scope(conversation_id, message_id)
+    # вкладення, вже видалені для всіх поодинці, свій blob уже відпустили
+    released = db.scalars(
+        update(Attachment)
+        .where(
+            Attachment.message_id.in_(select(Message.id).where(scope)),
+            or_(Attachment.is_deleted_for_all.is_(None), Attachment.is_deleted_for_all == False),
+        )
+        .values(is_deleted_for_all=True)
+        .returning(Attachment.sha256)
+        .execution_options(synchronize_session=False)
+    ).all()
+    release_blobs(db, released)
+    db.execute(
+        update(Message)
+        .where(scope)
+        .values(is_deleted_for_all=True)
+        .execution_options(synchronize_session=False)
+    )
+
+def clear_for_user(db: Session, part: ConversationParticipant):
+    watermark = db.query(func.max(Message.id)).filter(
+        Message.conversation_id == part.conversation_id
+    ).scalar()
+    if watermark is None:
+        return
+    if part.cleared_before_message_id is None or watermark > part.cleared_before_message_id:
+        part.cleared_before_message_id = watermark
+    part.is_cleared = True
+    db.add(part)
+    db.flush()
+    _drop_exceptions_below(db, part.user_id, part.conversation_id, part.cleared_before_message_id)
+
+def _drop_exceptions_below(db: Session, user_id: int, conversation_id: int, watermark: int):
+    covered = select(Message.id).where(
+        Message.conversation_id == conversation_id, Message.id <= watermark
+    )
+    db.execute(
+        delete(MessageStatus)
+        .where(MessageStatus.user_id == user_id, MessageStatus.message_id.in_(covered))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        delete(AttachmentStatus)
+        .where(
+            AttachmentStatus.user_id == user_id,
+            AttachmentStatus.attachment_id.in_(
+                select(Attachment.id).where(Attachment.message_id.in_(covered))
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+def migrate_to_watermarks(db: Session) -> int:
+    P = ConversationParticipant
+    candidates = (
+        db.query(P)
+        .filter(exists().where(
+            MessageStatus.user_id == P.user_id,
+            MessageStatus.is_deleted == True,
+            MessageStatus.message_id.in_(
+                select(Message.id).where(Message.conversation_id == P.conversation_id)
+            ),
+        ))
+        .all()
+    )
+    migrated = 0
+    for part in candidates:
+        first_visible = db.query(func.min(Message.id)).filter(
+            Message.conversation_id == part.conversation_id,
+            Message.is_deleted_for_all == False,
+            visible_to(part.user_id, part.cleared_before_message_id),
+        ).scalar()
+        if first_visible is None:
+            watermark = db.query(func.max(Message.id)).filter(
+                Message.conversation_id == part.conversation_id
+            ).scalar()
+        else:
+            watermark = first_visible - 1
+        if not watermark or (part.cleared_before_message_id or 0) >= watermark:
+            continue
+        part.cleared_before_message_id = watermark
+        db.add(part)
+        db.flush()
+        _drop_exceptions_below(db, part.user_id, part.conversation_id, watermark)
+        db.commit()
+        migrated += 1
+    return migrated
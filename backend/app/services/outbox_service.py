@@ -0,0 +1,44 @@
+import json
+from typing import Callable, Iterable, List
+from sqlalchemy import delete, event, select
+from sqlalchemy.orm import Session
+from app.models.conversation import ConversationParticipant
+from app.models.outbox import OutboxEvent
+
+_PENDING = "outbox_pending"
+_commit_listeners: List[Callable[[], None]] = []
+
+def add_commit_listener(fn: Callable[[], None]):
+    _commit_listeners.append(fn)
+
+def participant_ids(db: Session, conversation_id: int) -> list[int]:
+    return [uid for (uid,) in db.execute(
+        select(ConversationParticipant.user_id).where(ConversationParticipant.conversation_id == conversation_id)
+    )]
+
+def enqueue(db: Session, user_ids: Iterable[int], event: dict):
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return
+    db.add(OutboxEvent(user_ids=user_ids, payload=json.dumps(event, default=str)))
+    db.info[_PENDING] = True
+
+def claim_batch(db: Session, limit: int) -> list[OutboxEvent]:
+    return list(db.scalars(
+        select(OutboxEvent).order_by(OutboxEvent.id).limit(limit).with_for_update(skip_locked=True)
+    ))
+
+def ack_batch(db: Session, ids: list[int]) -> set[int]:
+    # повертає лише рядки, які видалила саме ця транзакція: без SKIP LOCKED (SQLite)
+    # інший диспетчер міг забрати ту саму пачку, і її не можна нумерувати вдруге
+    return set(db.scalars(delete(OutboxEvent).where(OutboxEvent.id.in_(ids)).returning(OutboxEvent.id)))
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    if session.info.pop(_PENDING, False):
+        for fn in _commit_listeners:
+            fn()
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_rollback(session: Session, previous_transaction):
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,170 @@
+import html
+import re
+from sqlalchemy import text, select, func, literal_column, bindparam, Float, and_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, selectinload
+from app.core.config import settings
+from app.models.conversation import Message, ConversationParticipant
+from app.services.message_service import visible_to
+
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content, content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+
+def install(engine: Engine):
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "postgresql":
+            conn.execute(text(
+                "ALTER TABLE messages ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+                f"GENERATED ALWAYS AS (to_tsvector('{settings.SEARCH_TS_CONFIG}', coalesce(content, ''))) STORED"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_messages_content_tsv ON messages USING GIN (content_tsv)"
+            ))
+        elif dialect == "sqlite":
+            created = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+            )).first() is None
+            for ddl in _SQLITE_DDL:
+                conn.execute(text(ddl))
+            if created:
+                conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+
+
+def _terms(query: str) -> list[str]:
+    return _WORD_RE.findall(query.lower())[:16]
+
+
+def match_clause(db: Session, query: str):
+    terms = _terms(query)
+    if not terms:
+        return None
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        tsquery = func.to_tsquery(settings.SEARCH_TS_CONFIG, " & ".join(f"{t}:*" for t in terms))
+        return literal_column("messages.content_tsv").op("@@")(tsquery)
+    if dialect == "sqlite":
+        fts_query = " ".join(f'"{t}"*' for t in terms)
+        return Message.id.in_(
+            text("SELECT rowid FROM messages_fts WHERE messages_fts MATCH :fts_query")
+            .bindparams(fts_query=fts_query)
+        )
+    clause = None
+    for t in terms:
+        cond = Message.content.ilike(f"%{t}%")
+        clause = cond if clause is None else clause & cond
+    return clause
+
+
+def _render_snippet(raw: str | None) -> str:
+    escaped = html.escape(raw or "")
+    return escaped.replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>")
+
+
+def search_messages(
+    db: Session,
+    user_id: int,
+    query: str,
+    conversation_id: int | None = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> list[tuple[Message, float, str]]:
+    terms = _terms(query)
+    if not terms:
+        return []
+    dialect = db.get_bind().dialect.name
+
+    me = ConversationParticipant
+    member_of = and_(me.conversation_id == Message.conversation_id, me.user_id == user_id)
+    if conversation_id is not None:
+        member_of = and_(member_of, me.conversation_id == conversation_id)
+
+    if dialect == "postgresql":
+        tsquery = func.to_tsquery(settings.SEARCH_TS_CONFIG, " & ".join(f"{t}:*" for t in terms))
+        tsv = literal_column("messages.content_tsv")
+        rank = func.ts_rank_cd(tsv, tsquery)
+        hits = (
+            select(Message.id.label("id"), rank.label("rank"))
+            .join(me, member_of)
+            .where(
+                tsv.op("@@")(tsquery),
+                Message.is_deleted_for_all == False,
+                visible_to(user_id, me.cleared_before_message_id),
+            )
+            .order_by(rank.desc(), Message.id.desc())
+            .limit(limit)
+            .offset(offset)
+            .subquery()
+        )
+        snippet = func.ts_headline(
+            settings.SEARCH_TS_CONFIG,
+            Message.content,
+            tsquery,
+            f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, "
+            "MaxWords=24, MinWords=8, MaxFragments=2, FragmentDelimiter=\" … \"",
+        )
+        stmt = (
+            select(Message, hits.c.rank, snippet)
+            .join(hits, hits.c.id == Message.id)
+            .order_by(hits.c.rank.desc(), Message.id.desc())
+        )
+    elif dialect == "sqlite":
+        fts_query = " ".join(f'"{t}"*' for t in terms)
+        hits = text(
+            "SELECT rowid AS id, -bm25(messages_fts) AS rank, "
+            "snippet(messages_fts, 0, :hl_start, :hl_stop, ' … ', 16) AS snippet "
+            "FROM messages_fts WHERE messages_fts MATCH :fts_query"
+        ).bindparams(
+            bindparam("hl_start", HIGHLIGHT_START),
+            bindparam("hl_stop", HIGHLIGHT_STOP),
+            bindparam("fts_query", fts_query),
+        ).columns(id=Message.id.type, rank=Float(), snippet=Message.content.type).subquery()
+        stmt = (
+            select(Message, hits.c.rank, hits.c.snippet)
+            .join(hits, hits.c.id == Message.id)
+            .join(me, member_of)
+            .where(
+                Message.is_deleted_for_all == False,
+                visible_to(user_id, me.cleared_before_message_id),
+            )
+            .order_by(hits.c.rank.desc(), Message.id.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+    else:
+        stmt = (
+            select(Message, literal_column("0.0"), Message.content)
+            .join(me, member_of)
+            .where(
+                match_clause(db, query),
+                Message.is_deleted_for_all == False,
+                visible_to(user_id, me.cleared_before_message_id),
+            )
+            .order_by(Message.id.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+
+    return [
+        (msg, float(rank or 0), _render_snippet(snippet))
+        for msg, rank, snippet in db.execute(stmt.options(selectinload(Message.attachments))).all()
+    ]
@@ -0,0 +1,138 @@
+import logging
+import os
+import queue
+import tempfile
+import threading
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.core import metrics
+from app.database.database import SessionLocal
+from app.models.blob import BlobVariant
+from app.services.blob_service import variant_path
+from app.services.attachment_service import ensure_storage
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+VARIANTS = {"thumb": 320, "preview": 1280}
+VARIANT_MIMETYPE = "image/jpeg"
+SUPPORTED_MIMETYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+
+thumbnail_jobs = metrics.counter(
+    "thumbnail_jobs_total", "Image derivative jobs by outcome", ["outcome"]
+)
+
+
+def _render(source_path: str, dest_path: str, max_side: int) -> tuple[int, int, int]:
+    with Image.open(source_path) as img:
+        img.draft("RGB", (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side))
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        # той самий sha256 можуть рендерити кілька воркерів одночасно: у кожного свій тимчасовий файл
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(dest_path), prefix=os.path.basename(dest_path) + ".", suffix=".tmp", delete=False
+        ) as tmp:
+            tmp_path = tmp.name
+        try:
+            img.save(tmp_path, "JPEG", quality=82, optimize=True, progressive=True)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return img.width, img.height, size
+
+
+class ThumbnailPipeline:
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.jobs: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._threads: list[threading.Thread] = []
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and self.workers > 0
+
+    def start(self):
+        if not self.enabled or self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"thumbnail-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        for _ in self._threads:
+            self.jobs.put(None)
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+
+    def submit(self, sha256: str, source_path: str, mimetype: str | None) -> bool:
+        if not self._threads or (mimetype or "").lower() not in SUPPORTED_MIMETYPES:
+            return False
+        try:
+            self.jobs.put_nowait((sha256, source_path))
+            return True
+        except queue.Full:
+            thumbnail_jobs.inc(outcome="dropped")
+            return False
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            try:
+                self._process(*job)
+            except Exception:
+                thumbnail_jobs.inc(outcome="failed")
+                logger.exception("thumbnail job for %s failed", job[0])
+
+    def _process(self, sha256: str, source_path: str):
+        root = ensure_storage()
+        db = SessionLocal()
+        try:
+            existing = {
+                v for (v,) in db.query(BlobVariant.variant).filter(BlobVariant.sha256 == sha256)
+            }
+            for variant, max_side in VARIANTS.items():
+                if variant in existing:
+                    continue
+                dest_path = variant_path(root, sha256, variant)
+                width, height, size = _render(source_path, dest_path, max_side)
+                db.add(BlobVariant(
+                    sha256=sha256,
+                    variant=variant,
+                    stored_path=dest_path,
+                    mimetype=VARIANT_MIMETYPE,
+                    width=width,
+                    height=height,
+                    size_bytes=size,
+                ))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+            thumbnail_jobs.inc(outcome="done")
+        finally:
+            db.close()
+
+
+pipeline = ThumbnailPipeline(settings.THUMBNAIL_WORKERS, settings.THUMBNAIL_QUEUE_SIZE)
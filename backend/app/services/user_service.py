@@ -1,16 +1,18 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from datetime import datetime
+from sqlalchemy import or_, bindparam, update
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 from app.core.security import get_password_hash
+from app.core.auth import invalidate_user
 
 def get_user_by_username_or_email(db: Session, login: str):
     return db.query(User).filter(
         (User.username == login) | (User.email == login)
     ).first()
 
-def create_user(db: Session, user: UserCreate):
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: UserCreate, hashed_password: str | None = None):
+    hashed_password = hashed_password or get_password_hash(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -36,17 +38,45 @@ def update_user(db: Session, user: User, data: UserUpdate) -> User:
     db.add(user)
     db.commit()
     db.refresh(user)
+    invalidate_user(user.id)
     return user
 
-def set_user_password(db: Session, user: User, new_password: str) -> User:
-    user.hashed_password = get_password_hash(new_password)
+def set_user_password(db: Session, user: User, new_password: str, hashed_password: str | None = None) -> User:
+    user.hashed_password = hashed_password or get_password_hash(new_password)
     db.add(user)
     db.commit()
     db.refresh(user)
+    invalidate_user(user.id)
+    return user
+
+def replace_password_hash(db: Session, user_id: int, old_hash: str, new_hash: str) -> bool:
+    updated = db.query(User).filter(User.id == user_id, User.hashed_password == old_hash).update(
+        {User.hashed_password: new_hash}, synchronize_session=False
+    )
+    db.commit()
+    return bool(updated)
+
+def set_user_active(db: Session, user: User, is_active: bool) -> User:
+    user_id = user.id
+    user.is_active = is_active
+    db.add(user)
+    db.commit()
+    invalidate_user(user_id)
     return user
 
 def search_users(db: Session, query: str, exclude_user_id: int) -> list[User]:
     q = db.query(User).filter(
         (User.username.ilike(f"%{query}%")) | (User.email.ilike(f"%{query}%"))
     ).filter(User.id != exclude_user_id)
-    return q.limit(20).all()
\ No newline at end of file
+    return q.limit(20).all()
+
+def save_last_seen(db: Session, seen: dict[int, datetime]) -> int:
+    if not seen:
+        return 0
+    users = User.__table__
+    db.connection().execute(
+        update(users).where(users.c.id == bindparam("uid")).values(last_seen_at=bindparam("seen_at")),
+        [{"uid": uid, "seen_at": at} for uid, at in seen.items()],
+    )
+    db.commit()
+    return len(seen)
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+from typing import Any, List, Tuple
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.core import metrics
+from app.core.auth import CurrentUser
+from app.core.cache import TTLCache
+from app.core.executor import run_in_db_pool
+from app.database.database import SessionLocal
+from app.services import message_service, outbox_service
+from app.services.conversation_service import peers_last_seen
+from app import ws_manager
+from app.presence import presence
+from app.read_markers import aggregator as read_markers
+
+logger = logging.getLogger(__name__)
+
+ws_commands = metrics.counter("ws_commands_total", "WebSocket commands received", ["type", "result"])
+ws_send_batch = metrics.histogram(
+    "ws_send_batch_size", "Messages stored per grouped commit",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 200),
+)
+
+_members = TTLCache("conversation_members", 10000, 60)
+
+
+class CommandError(ValueError):
+    pass
+
+
+def _with_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def _store(items):
+    try:
+        return _with_session(message_service.store_text_messages, items)
+    except IntegrityError:
+        # паралельний повтор з тим самим client_msg_id — зберігаємо по одному, дублікат стане відповіддю
+        return [_with_session(message_service.store_text_messages, [item])[0] for item in items]
+
+
+class SendBatcher:
+    def __init__(self, max_batch: int, max_pending: int):
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue and not self._queue.empty():
+            _, fut = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(CommandError("Сервер зупиняється"))
+
+    async def submit(self, item: Tuple[int, int, str, str | None]):
+        fut = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, fut))
+        except asyncio.QueueFull:
+            raise CommandError("Сервер перевантажений, спробуйте пізніше")
+        return await fut
+
+    async def _run(self):
+        while True:
+            batch: List[Tuple[Any, asyncio.Future]] = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            ws_send_batch.observe(len(batch))
+            try:
+                results = await run_in_db_pool(_store, [item for item, _ in batch])
+            except Exception:
+                logger.exception("WS send batch insert failed")
+                results = [CommandError("Не вдалося зберегти повідомлення")] * len(batch)
+            for (_, fut), result in zip(batch, results):
+                if fut.done():
+                    continue
+                if isinstance(result, Exception):
+                    fut.set_exception(result)
+                else:
+                    fut.set_result(result)
+
+
+batcher = SendBatcher(settings.WS_SEND_BATCH_SIZE, settings.WS_SEND_PENDING)
+
+
+async def _members_of(conversation_id: int) -> list[int]:
+    members = _members.get(conversation_id)
+    if members is None:
+        members = await run_in_db_pool(_with_session, outbox_service.participant_ids, conversation_id)
+        _members.set(conversation_id, members)
+    return members
+
+
+def _text(data: dict, key: str) -> str:
+    value = data.get(key)
+    if not isinstance(value, str):
+        raise CommandError(f"Поле {key} має бути рядком")
+    return value
+
+
+def _int(data: dict, key: str) -> int:
+    value = data.get(key)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise CommandError(f"Поле {key} має бути числом")
+    return value
+
+
+async def _send(conn: ws_manager.Connection, user: CurrentUser, data: dict) -> dict:
+    client_msg_id = data.get("client_msg_id")
+    if client_msg_id is not None and not isinstance(client_msg_id, str):
+        raise CommandError("Поле client_msg_id має бути рядком")
+    msg = await batcher.submit((user.id, _int(data, "conversation_id"), _text(data, "content"), client_msg_id))
+    return {"message": msg.model_dump(mode="json")}
+
+
+async def _edit(conn: ws_manager.Connection, user: CurrentUser, data: dict) -> dict:
+    message_id = _int(data, "message_id")
+    await run_in_db_pool(_with_session, message_service.edit_message, message_id, user.id, _text(data, "content"))
+    return {"message_id": message_id}
+
+
+async def _read(conn: ws_manager.Connection, user: CurrentUser, data: dict) -> dict:
+    up_to = data.get("up_to_message_id")
+    if up_to is not None and (not isinstance(up_to, int) or isinstance(up_to, bool)):
+        raise CommandError("Поле up_to_message_id має бути числом")
+    await read_markers.mark(_int(data, "conversation_id"), user.id, up_to)
+    return {}
+
+
+async def _typing(conn: ws_manager.Connection, user: CurrentUser, data: dict) -> dict:
+    conversation_id = _int(data, "conversation_id")
+    active = data.get("active", True)
+    if not isinstance(active, bool):
+        raise CommandError("Поле active має бути true або false")
+    members = await _members_of(conversation_id)
+    if user.id not in members:
+        raise message_service.MessageForbidden("Ви не є учасником цієї розмови")
+    presence.typing(conversation_id, user.id, members, active)
+    return {}
+
+
+async def _presence(conn: ws_manager.Connection, user: CurrentUser, data: dict) -> dict:
+    presence.set_status(conn, _text(data, "status"))
+    return {}
+
+
+async def _presence_subscribe(conn: ws_manager.Connection, user: CurrentUser, data: dict) -> dict:
+    user_ids = data.get("user_ids")
+    if not isinstance(user_ids, list) or not all(isinstance(u, int) and not isinstance(u, bool) for u in user_ids):
+        raise CommandError("Поле user_ids має бути списком чисел")
+    if len(user_ids) > settings.PRESENCE_SUBSCRIBE_MAX:
+        raise CommandError(f"Не більше {settings.PRESENCE_SUBSCRIBE_MAX} користувачів за раз")
+    # підписатися можна лише на співрозмовників
+    last_seen = await run_in_db_pool(_with_session, peers_last_seen, user.id, list(set(user_ids)))
+    return {"presence": presence.subscribe(conn, last_seen)}
+
+
+COMMANDS = {
+    "send": _send,
+    "edit": _edit,
+    "read": _read,
+    "typing": _typing,
+    "presence": _presence,
+    "presence_subscribe": _presence_subscribe,
+}
+SILENT = {"typing", "presence"}
+
+
+def reject_busy(conn: ws_manager.Connection, raw: str):
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        data = None
+    data = data if isinstance(data, dict) else {}
+    kind = data.get("type") if data.get("type") in COMMANDS else "unknown"
+    ws_commands.inc(type=kind, result="busy")
+    reply = {"type": "error", "command": kind, "detail": "Забагато незавершених команд, повторіть пізніше"}
+    if data.get("client_msg_id") is not None:
+        reply["client_msg_id"] = data["client_msg_id"]
+    conn.enqueue(json.dumps(reply, default=str))
+
+
+async def handle(conn: ws_manager.Connection, user: CurrentUser, raw: str):
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or data.get("type") not in COMMANDS:
+        ws_commands.inc(type="unknown", result="error")
+        conn.enqueue(json.dumps({"type": "error", "detail": "Невідома команда"}))
+        return
+
+    kind, client_msg_id = data["type"], data.get("client_msg_id")
+    try:
+        reply = {"type": "ack", "command": kind, **await COMMANDS[kind](conn, user, data)}
+        ws_commands.inc(type=kind, result="ok")
+    except ValueError as e:
+        reply = {"type": "error", "command": kind, "detail": str(e)}
+        ws_commands.inc(type=kind, result="error")
+    except Exception:
+        logger.exception("WS command %s from user %s failed", kind, user.id)
+        reply = {"type": "error", "command": kind, "detail": "Внутрішня помилка сервера"}
+        ws_commands.inc(type=kind, result="error")
+    if client_msg_id is not None:
+        reply["client_msg_id"] = client_msg_id
+    if kind not in SILENT or reply["type"] == "error":
+        conn.enqueue(json.dumps(reply, default=str))
@@ -1,132 +1,198 @@
 import json
+import logging
+import time
 import asyncio
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 from fastapi import WebSocket
+from app.core.config import settings
+from app.core import metrics
+from app.backplane import create_backplane
 
-active_connections: Dict[int, WebSocket] = {}
+logger = logging.getLogger(__name__)
+
+
+class Connection:
+    def __init__(self, user_id: int, websocket: WebSocket, max_queue: int):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue[Tuple[str, float]] = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self._held: Optional[List[Tuple[str, Optional[int]]]] = None
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def hold(self):
+        self._held = []
+
+    async def release(self, backlog: List[str], after_seq: int):
+        for text in backlog:
+            if self.closed:
+                return
+            try:
+                await asyncio.wait_for(self.queue.put((text, time.perf_counter())), timeout=10)
+            except asyncio.TimeoutError:
+                self._overflow(len(backlog))
+                return
+        held, self._held = self._held or [], None
+        for text, seq in held:
+            if seq is None or seq > after_seq:
+                self.enqueue(text)
+
+    def enqueue(self, text: str, seq: Optional[int] = None) -> bool:
+        if self.closed:
+            return False
+        if self._held is not None:
+            if len(self._held) >= self.queue.maxsize:
+                return self._overflow(len(self._held) + 1)
+            self._held.append((text, seq))
+            return True
+        try:
+            self.queue.put_nowait((text, time.perf_counter()))
+            return True
+        except asyncio.QueueFull:
+            return self._overflow(self.queue.qsize() + 1)
+
+    def _overflow(self, dropped: int) -> bool:
+        ws_dropped_messages.inc(dropped, reason="queue_full")
+        ws_dropped_connections.inc()
+        asyncio.create_task(self.close(code=1013))
+        unregister_connection(self)
+        return False
+
+    async def _write_loop(self):
+        try:
+            while True:
+                text, enqueued_at = await self.queue.get()
+                started = time.perf_counter()
+                await self.websocket.send_text(text)
+                done = time.perf_counter()
+                ws_send_seconds.observe(done - started)
+                ws_delivery_seconds.observe(done - enqueued_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            ws_send_failures.inc()
+            ws_dropped_messages.inc(self.queue.qsize() + 1, reason="send_failed")
+            unregister_connection(self)
+
+    async def close(self, code: int = 1000):
+        unregister_connection(self)
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def stop(self):
+        self.closed = True
+        self._writer.cancel()
+
+
+active_connections: Dict[int, Set[Connection]] = {}
+
+backplane = create_backplane(settings.WS_BACKPLANE_URL, settings.WS_BACKPLANE_CHANNEL)
+
+def _all_connections():
+    return [c for conns in list(active_connections.values()) for c in list(conns)]
+
+ws_connections = metrics.gauge(
+    "ws_connections", "Open WebSocket connections on this worker",
+    func=lambda: len(_all_connections()),
+)
+ws_queue_depth = metrics.gauge(
+    "ws_outbound_queue_depth", "Messages waiting in outbound WebSocket queues",
+    func=lambda: sum(c.queue.qsize() for c in _all_connections()),
+)
+ws_queue_depth_max = metrics.gauge(
+    "ws_outbound_queue_depth_max", "Deepest outbound WebSocket queue",
+    func=lambda: max((c.queue.qsize() for c in _all_connections()), default=0),
+)
+ws_dropped_messages = metrics.counter(
+    "ws_dropped_messages_total", "WebSocket messages dropped before delivery", ["reason"]
+)
+ws_dropped_connections = metrics.counter(
+    "ws_dropped_connections_total", "WebSocket clients disconnected for outbound queue overflow"
+)
+ws_send_seconds = metrics.histogram(
+    "ws_send_duration_seconds", "Time to write one frame to a WebSocket",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+ws_delivery_seconds = metrics.histogram(
+    "ws_delivery_duration_seconds", "Time from enqueue to frame written, including queueing",
+)
+ws_send_failures = metrics.counter("ws_send_failures_total", "WebSocket writes that raised")
+ws_replayed_events = metrics.counter("ws_replayed_events_total", "Missed events replayed on reconnect")
+ws_resyncs = metrics.counter("ws_resync_required_total", "Reconnects whose since_seq was outside the event log")
 
 def get_active_connections():
     return active_connections
 
-async def send_message_to_user(user_id: int, message: dict):
-    ws = active_connections.get(user_id)
-    if not ws:
-        return False
-    try:
-        await ws.send_text(json.dumps(message, default=str))
-        return True
-    except Exception:
-        active_connections.pop(user_id, None)
-        return False
+def register_connection(user_id: int, ws: WebSocket, hold: bool = False) -> Connection:
+    conn = Connection(user_id, ws, settings.WS_SEND_QUEUE_SIZE)
+    if hold:
+        conn.hold()
+    active_connections.setdefault(user_id, set()).add(conn)
+    return conn
+
+async def resume(conn: Connection, current_seq: int, backlog: Optional[List[str]]):
+    if backlog is None:
+        ws_resyncs.inc()
+        backlog = [json.dumps({"type": "resync_required", "seq": current_seq})]
+    else:
+        ws_replayed_events.inc(len(backlog))
+        backlog = backlog + [json.dumps({"type": "sync", "seq": current_seq})]
+    await conn.release(backlog, current_seq)
+
+def unregister_connection(conn: Connection):
+    conn.stop()
+    conns = active_connections.get(conn.user_id)
+    if not conns:
+        return
+    conns.discard(conn)
+    if not conns:
+        active_connections.pop(conn.user_id, None)
+
+async def _deliver_local(payload: dict):
+    text, seq = payload["data"], payload.get("seq")
+    for uid in payload["user_ids"]:
+        for conn in list(active_connections.get(uid, ())):
+            conn.enqueue(text, seq)
+
+async def _deliver_batch_local(payload: dict):
+    for item in payload["events"]:
+        await _deliver_local(item)
+
+backplane.add_handler("deliver", _deliver_local)
+backplane.add_handler("deliver_batch", _deliver_batch_local)
+
+async def start():
+    await backplane.start()
+
+async def stop():
+    await backplane.stop()
 
 async def broadcast_to_conversation_participants(participant_ids: List[int], message: dict):
-    for uid in list(participant_ids):
-        await send_message_to_user(uid, message)
-
-async def broadcast_message_deleted(conversation_id: int, participant_ids: List[int], message_id: int):
-    await broadcast_to_conversation_participants(
-        participant_ids,
-        {
-            "type": "message_deleted",
-            "conversation_id": conversation_id,
-            "message_id": message_id
-        },
-    )
-
-async def broadcast_message_edited(conversation_id: int, participant_ids: List[int], message: dict):
-    await broadcast_to_conversation_participants(
-        participant_ids,
-        {
-            "type": "message_edited",
-            "conversation_id": conversation_id,
-            "message": message
-        },
-    )
-
-from sqlalchemy import event, select, inspect as sa_inspect
-from sqlalchemy.orm import object_session
-
-Message: Optional[type] = None
-ConversationParticipant: Optional[type] = None
-try:
-    from app.models.conversation import Message as _Msg, ConversationParticipant as _CP
-    Message = _Msg
-    ConversationParticipant = _CP
-except Exception:
-    pass
-
-def _schedule(coro):
+    user_ids = list(dict.fromkeys(participant_ids))
+    if not user_ids:
+        return
     try:
-        loop = asyncio.get_running_loop()
-        loop.create_task(coro)
-    except RuntimeError:
-        pass
-
-def _get_participant_ids(sess, conversation_id: int) -> list[int]:
-    if not ConversationParticipant:
-        return []
-    try:
-        rows = sess.execute(
-            select(ConversationParticipant.user_id)
-            .where(ConversationParticipant.conversation_id == conversation_id)
-        ).all()
-        return [r[0] for r in rows]
+        await backplane.publish("deliver", {
+            "user_ids": user_ids,
+            "data": json.dumps(message, default=str),
+        })
     except Exception:
-        return []
-
-if Message:
-    @event.listens_for(Message, "after_update", propagate=True)
-    def _ws_after_update(mapper, connection, target):
-        sess = object_session(target)
-        if not sess:
-            return
-        insp = sa_inspect(target)
-
-        def _changed(attr):
-            return attr in insp.attrs and insp.attrs[attr].history.has_changes()
-
-        content_changed = _changed("content")
-        edited_changed = _changed("edited_at")
-        deleted_now = hasattr(target, "is_deleted_for_all") and getattr(target, "is_deleted_for_all") is True and _changed("is_deleted_for_all")
-
-        if not (content_changed or edited_changed or deleted_now):
-            return
-
-        participant_ids = _get_participant_ids(sess, target.conversation_id)
-        if not participant_ids:
-            return
-
-        if deleted_now:
-            _schedule(
-                broadcast_message_deleted(
-                    target.conversation_id,
-                    participant_ids,
-                    target.id
-                )
-            )
-        else:
-            attachments = []
-            try:
-                atts = getattr(target, "attachments", []) or []
-                for a in atts:
-                    attachments.append({"id": getattr(a, "id", None), "filename": getattr(a, "filename", None)})
-            except Exception:
-                pass
-            payload = {
-                "id": target.id,
-                "conversation_id": target.conversation_id,
-                "sender_id": getattr(target, "sender_id", None),
-                "content": getattr(target, "content", None),
-                "created_at": getattr(target, "created_at", None),
-                "edited_at": getattr(target, "edited_at", None),
-                "attachments": attachments
-            }
-            _schedule(
-                broadcast_message_edited(
-                    target.conversation_id,
-                    participant_ids,
-                    payload
-                )
-            )
-else:
-    print("[ws_manager] Message model not imported; WS edit/delete broadcasts disabled")
\ No newline at end of file
+        logger.exception("backplane publish failed")
+
+async def publish_batch(events: List[Tuple[int, int, str]]):
+    await backplane.publish("deliver_batch", {
+        "events": [{"user_ids": [user_id], "seq": seq, "data": data} for user_id, seq, data in events],
+    })
+
+async def broadcast_many(items: List[Tuple[List[int], dict]]):
+    events = [
+        {"user_ids": list(dict.fromkeys(user_ids)), "data": json.dumps(message, default=str)}
+        for user_ids, message in items if user_ids
+    ]
+    if events:
+        await backplane.publish("deliver_batch", {"events": events})
+
+async def send_message_to_user(user_id: int, message: dict):
+    await broadcast_to_conversation_participants([user_id], message)
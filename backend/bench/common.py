@@ -0,0 +1,58 @@
+import os
+import statistics
+import tempfile
+
+BENCH_PASSWORD = "bench-pass"
+
+
+def data_dir() -> str:
+    path = os.environ.get("BENCH_DATA_DIR") or os.path.join(tempfile.gettempdir(), "chat-bench")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def prepare_env(root: str | None = None) -> str:
+    root = root or data_dir()
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{root}/bench.db")
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "600")
+    os.environ.setdefault("STORAGE_DIR", os.path.join(root, "storage"))
+    return root
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def summarize(latencies_ms: list[float], elapsed_s: float, errors: int = 0) -> dict:
+    if not latencies_ms:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "throughput_rps": round(len(latencies_ms) / elapsed_s, 1) if elapsed_s else None,
+        "p50_ms": round(statistics.median(latencies_ms), 2),
+        "p90_ms": round(percentile(latencies_ms, 90), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms), 2),
+    }
+
+
+async def login(client, name: str, password: str = BENCH_PASSWORD) -> dict:
+    r = await client.post("/auth/login", json={"login": name, "password": password})
+    r.raise_for_status()
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def register(client, name: str) -> tuple[int, dict]:
+    r = await client.post("/auth/register", json={
+        "username": name, "email": f"{name}@chat-bench.dev", "password": BENCH_PASSWORD,
+        "confirm_password": BENCH_PASSWORD, "gender": "male",
+    })
+    r.raise_for_status()
+    return r.json()["id"], await login(client, name)
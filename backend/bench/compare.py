@@ -0,0 +1,63 @@
+"""Порівняння двох JSON-результатів bench.suite: p50/p99 і пропускна здатність по сценаріях.
+
+Запуск з каталогу backend:
+    python -m bench.compare results/base.json results/head.json [--threshold 10]
+
+Код виходу 1, якщо p99 будь-якого сценарію погіршився більше ніж на --threshold відсотків.
+"""
+import argparse
+import json
+
+METRICS = [("p50_ms", False), ("p99_ms", False), ("throughput_rps", True)]
+
+
+def _delta(old, new) -> float | None:
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(base: dict, head: dict, threshold: float) -> tuple[list[str], bool]:
+    lines = [f"{'сценарій':<16}{'метрика':<16}{'база':>12}{'нове':>12}{'зміна':>10}"]
+    regressed = False
+    for name in sorted(set(base["results"]) | set(head["results"])):
+        old, new = base["results"].get(name, {}), head["results"].get(name, {})
+        for metric, higher_is_better in METRICS:
+            if metric not in old and metric not in new:
+                continue
+            change = _delta(old.get(metric), new.get(metric))
+            mark = ""
+            if change is not None:
+                worse = -change if higher_is_better else change
+                if metric == "p99_ms" and worse > threshold:
+                    regressed = True
+                    mark = " !"
+            shown = f"{change:+.1f}%" if change is not None else "—"
+            lines.append(
+                f"{name:<16}{metric:<16}{old.get(metric, '—')!s:>12}{new.get(metric, '—')!s:>12}{shown:>10}{mark}"
+            )
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.head, encoding="utf-8") as f:
+        head = json.load(f)
+    for label, report in (("база", base), ("нове", head)):
+        meta = report["meta"]
+        print(f"{label}: {(meta.get('commit') or '?')[:10]}{' (dirty)' if meta.get('dirty') else ''} "
+              f"{meta['database']} {meta['dataset']['messages']} повідомлень")
+    lines, regressed = compare(base, head, args.threshold)
+    print("\n".join(lines))
+    raise SystemExit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Генератор синтетичних даних для бенчмарків: користувачі, діалоги, повідомлення, вкладення, статуси.
+
+Генерація детермінована (--seed): однакові параметри дають однакові дані, тож
+результати різних комітів можна порівнювати. Повідомлення розподілені між
+діалогами нерівномірно (розподіл Парето) — є «гарячі» діалоги з великою
+історією і багато малих.
+
+Запуск з каталогу backend (порожня база обов'язкова):
+    python -m bench.seed --users 2000 --dialogs 20000 --messages 1000000
+
+Без DATABASE_URL дані пишуться в SQLite у BENCH_DATA_DIR (типово /tmp/chat-bench).
+Поруч зберігається manifest.json — його читає bench.suite.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from bench.common import BENCH_PASSWORD, prepare_env
+
+SYLLABLES = [
+    "ка", "ло", "ми", "ра", "до", "ве", "ні", "су", "то", "ба", "зе", "ли", "ро", "на", "ко",
+    "пе", "ти", "го", "ва", "ру", "се", "мо", "ді", "ла", "хо", "чу", "жи", "по", "ше", "ць",
+]
+MIMETYPES = ["application/pdf", "image/jpeg", "image/png", "text/plain", "application/zip"]
+
+
+def _vocabulary(rng: random.Random, size: int) -> list[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _sentence(rng: random.Random, vocab: list[str]) -> str:
+    n = rng.randint(3, 20)
+    return " ".join(vocab[min(int(rng.paretovariate(1.2)) - 1, len(vocab) - 1)] for _ in range(n))
+
+
+def _insert(db, model, rows: list[dict]):
+    from sqlalchemy import insert
+    if rows:
+        db.execute(insert(model), rows)
+
+
+def _next_id(db, model) -> int:
+    from sqlalchemy import func
+    return (db.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _sync_sequences(db, *models):
+    from sqlalchemy import text
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for model in models:
+        table = model.__tablename__
+        db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+        ))
+
+
+def seed(args) -> dict:
+    from app.main import app  # noqa: F401  створює схему та пошуковий індекс
+    from app.core.security import get_password_hash
+    from app.database.database import SessionLocal
+    from app.models import (
+        User, Conversation, ConversationParticipant, Message, MessageStatus,
+        Attachment, Blob,
+    )
+    from app.services.attachment_service import ensure_storage
+    from app.services.blob_service import blob_path
+    from app.services.counter_service import recompute_all_counters
+    from sqlalchemy import bindparam, update
+    import hashlib
+
+    rng = random.Random(args.seed)
+    db = SessionLocal()
+    if db.query(User.id).filter(User.username == "bench_u0").first():
+        raise SystemExit("База вже містить дані бенчмарку: вкажіть порожню DATABASE_URL або новий BENCH_DATA_DIR")
+
+    started = time.perf_counter()
+    hashed = get_password_hash(BENCH_PASSWORD)
+    _insert(db, User, [
+        {"username": f"bench_u{i}", "email": f"bench_u{i}@chat-bench.dev",
+         "hashed_password": hashed, "gender": rng.choice(["male", "female"]), "is_active": True}
+        for i in range(args.users)
+    ])
+    db.commit()
+    user_ids = [uid for uid, in db.query(User.id).filter(User.username.like("bench_u%")).order_by(User.id)]
+
+    pairs = set()
+    dialogs: list[tuple[int, int]] = []
+    for i in range(args.dialogs):
+        a = user_ids[i % len(user_ids)]
+        for _ in range(10):
+            b = rng.choice(user_ids)
+            key = (min(a, b), max(a, b))
+            if b != a and key not in pairs:
+                pairs.add(key)
+                dialogs.append((a, b))
+                break
+
+    conv_base = _next_id(db, Conversation)
+    created = datetime.utcnow() - timedelta(days=args.days)
+    _insert(db, Conversation, [
+        {"id": conv_base + i, "created_at": created} for i in range(len(dialogs))
+    ])
+    _insert(db, ConversationParticipant, [
+        {"conversation_id": conv_base + i, "user_id": uid, "created_at": created}
+        for i, pair in enumerate(dialogs) for uid in pair
+    ])
+    db.commit()
+
+    root = ensure_storage()
+    blobs = []
+    for i in range(args.blobs):
+        data = rng.randbytes(rng.randint(4, 512) * 1024)
+        sha = hashlib.sha256(data).hexdigest()
+        path = blob_path(root, sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        blobs.append({"sha256": sha, "stored_path": path, "size_bytes": len(data), "ref_count": 0,
+                      "mimetype": MIMETYPES[i % len(MIMETYPES)]})
+
+    vocab = _vocabulary(rng, args.vocabulary)
+    weights = [rng.paretovariate(1.1) for _ in dialogs]
+    msg_base = _next_id(db, Message)
+    step = timedelta(seconds=args.days * 86400 / max(args.messages, 1))
+    checkpoint: dict[int, int] = {}
+    last_id: dict[int, int] = {}
+    counts = {"messages": 0, "attachments": 0, "hidden": 0}
+
+    for batch_start in range(0, args.messages, args.batch):
+        size = min(args.batch, args.messages - batch_start)
+        messages, attachments, statuses = [], [], []
+        for offset, d in enumerate(rng.choices(range(len(dialogs)), weights, k=size)):
+            n = batch_start + offset
+            mid = msg_base + n
+            sender = rng.choice(dialogs[d])
+            messages.append({
+                "id": mid, "conversation_id": conv_base + d, "sender_id": sender,
+                "content": _sentence(rng, vocab), "is_deleted_for_all": False,
+                "created_at": created + step * n,
+            })
+            last_id[d] = mid
+            if n < args.messages * 0.9:
+                checkpoint[d] = mid
+            if rng.random() < args.attachment_ratio:
+                blob = rng.choice(blobs)
+                blob["ref_count"] += 1
+                attachments.append({
+                    "message_id": mid, "uploader_id": sender, "filename": f"file{n}",
+                    "stored_path": blob["stored_path"], "mimetype": blob["mimetype"],
+                    "size_bytes": blob["size_bytes"], "sha256": blob["sha256"],
+                    "is_deleted_for_all": False,
+                })
+            if rng.random() < args.hidden_ratio:
+                statuses.append({"message_id": mid, "user_id": rng.choice(dialogs[d]), "is_deleted": True})
+        _insert(db, Message, messages)
+        _insert(db, Attachment, attachments)
+        _insert(db, MessageStatus, statuses)
+        db.commit()
+        counts["messages"] += len(messages)
+        counts["attachments"] += len(attachments)
+        counts["hidden"] += len(statuses)
+        print(f"  {counts['messages']}/{args.messages} повідомлень", flush=True)
+
+    _insert(db, Blob, [{k: v for k, v in b.items() if k != "mimetype"} for b in blobs if b["ref_count"]])
+    read_markers = [
+        {"c": conv_base + d, "u": uid, "r": last_id[d] if rng.random() < 0.7 else checkpoint.get(d)}
+        for d, pair in enumerate(dialogs) if d in last_id for uid in pair
+    ]
+    P = ConversationParticipant.__table__
+    db.connection().execute(
+        update(P)
+        .where(P.c.conversation_id == bindparam("c"), P.c.user_id == bindparam("u"))
+        .values(last_read_message_id=bindparam("r")),
+        [m for m in read_markers if m["r"]],
+    )
+    _sync_sequences(db, Conversation, Message)
+    db.commit()
+    recompute_all_counters(db)
+
+    usernames = {uid: f"bench_u{i}" for i, uid in enumerate(user_ids)}
+    actors = []
+    for uid in user_ids[:args.actors]:
+        convs = [
+            {"conversation_id": conv_base + d, "peer_id": peer, "peer_username": usernames[peer]}
+            for d, (a, b) in enumerate(dialogs) if uid in (a, b) and d in last_id
+            for peer in [b if a == uid else a]
+        ]
+        convs.sort(key=lambda c: -weights[c["conversation_id"] - conv_base])
+        att_ids = [aid for aid, in (
+            db.query(Attachment.id)
+            .join(Message, Message.id == Attachment.message_id)
+            .join(ConversationParticipant, ConversationParticipant.conversation_id == Message.conversation_id)
+            .filter(ConversationParticipant.user_id == uid)
+            .order_by(Attachment.id.desc())
+            .limit(50)
+        )]
+        actors.append({
+            "user_id": uid, "username": usernames[uid],
+            "conversations": convs[:50], "attachment_ids": att_ids,
+        })
+    db.close()
+
+    return {
+        "seed": args.seed,
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        "users": len(user_ids),
+        "dialogs": len(dialogs),
+        **counts,
+        "blobs": len(blobs),
+        "search_terms": vocab[:5] + rng.sample(vocab, 5),
+        "password": BENCH_PASSWORD,
+        "actors": actors,
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--dialogs", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--attachment-ratio", type=float, default=0.02)
+    parser.add_argument("--hidden-ratio", type=float, default=0.01)
+    parser.add_argument("--blobs", type=int, default=64)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--actors", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--manifest", default=None)
+    args = parser.parse_args()
+
+    root = prepare_env()
+    manifest = seed(args)
+    path = args.manifest or os.path.join(root, "manifest.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"{manifest['messages']} повідомлень за {manifest['seconds']} с, маніфест: {path}")
+
+
+if __name__ == "__main__":
+    main()
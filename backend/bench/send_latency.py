@@ -0,0 +1,92 @@
+"""Навантажувальний тест POST /messages/send: N одночасних відправників, p50/p99 затримки.
+
+Окрім затримки відправки вимірюється затримка event loop (loop_lag) — наскільки
+довго цикл подій був заблокований синхронною роботою.
+
+Запуск з каталогу backend:
+    python -m bench.send_latency --senders 20 --messages 25
+
+Без DATABASE_URL використовується тимчасова SQLite-база.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from bench.common import percentile, prepare_env, register
+
+
+async def run(senders: int, messages: int, attachment_kb: int) -> dict:
+    import httpx
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        suffix = str(int(time.time() * 1000))
+        peer_id, _ = await register(client, f"peer{suffix}")
+        pairs = []
+        for i in range(senders):
+            _, headers = await register(client, f"s{i}_{suffix}")
+            r = await client.post("/conversations/start", json={"peer_id": peer_id}, headers=headers)
+            r.raise_for_status()
+            pairs.append((headers, r.json()["conversation_id"]))
+
+        payload = os.urandom(attachment_kb * 1024) if attachment_kb else None
+        latencies: list[float] = []
+
+        async def sender(headers, conversation_id):
+            for n in range(messages):
+                files = [("files", ("bench.bin", payload, "application/octet-stream"))] if payload else None
+                started = time.perf_counter()
+                r = await client.post(
+                    "/messages/send",
+                    data={"conversation_id": str(conversation_id), "content": f"bench {n}"},
+                    files=files,
+                    headers=headers,
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+                r.raise_for_status()
+
+        lags: list[float] = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append((time.perf_counter() - started - 0.01) * 1000)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(sender(h, c) for h, c in pairs))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "senders": senders,
+        "messages": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2),
+        "loop_lag_p99_ms": round(percentile(lags, 99), 2),
+        "loop_lag_max_ms": round(max(lags), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--senders", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=25)
+    parser.add_argument("--attachment-kb", type=int, default=256)
+    args = parser.parse_args()
+
+    prepare_env(tempfile.mkdtemp(prefix="chat-bench-"))
+    print(asyncio.run(run(args.senders, args.messages, args.attachment_kb)))
+
+
+if __name__ == "__main__":
+    main()
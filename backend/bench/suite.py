@@ -0,0 +1,344 @@
+"""Набір бенчмарків гарячих шляхів: пропускна здатність і p50/p99 затримки, результат у JSON.
+
+Сценарії: send, ws_send, upload, page, page_search, conversations, download, ws_fanout.
+Дані готує bench.seed; суїт читає його manifest.json.
+
+Без --base-url сервер (uvicorn) піднімається у фоновому потоці цього ж процесу
+з тими самими DATABASE_URL/STORAGE_DIR. Для точніших чисел запустіть сервер окремо
+з тим самим оточенням і передайте --base-url http://127.0.0.1:8000.
+
+Запуск з каталогу backend:
+    python -m bench.seed --messages 1000000
+    python -m bench.suite --out results/$(git rev-parse --short HEAD).json
+    python -m bench.compare results/old.json results/new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import threading
+import time
+from datetime import datetime, UTC
+
+from bench.common import data_dir, login, prepare_env, summarize
+
+SCENARIOS = ["send", "ws_send", "upload", "page", "page_search", "conversations", "download", "ws_fanout"]
+
+
+class ServerThread:
+    def __init__(self):
+        import uvicorn
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        config = uvicorn.Config("app.main:app", host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Сервер не запустився")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+async def _load(worker, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def loop(slot: int):
+        nonlocal errors
+        for n in remaining:
+            started = time.perf_counter()
+            try:
+                await worker(slot, n)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(loop(i) for i in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+class Suite:
+    def __init__(self, client, manifest: dict, args):
+        self.client = client
+        self.manifest = manifest
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.actors = []
+
+    async def setup(self):
+        for actor in self.manifest["actors"][:self.args.actors]:
+            if actor["conversations"]:
+                headers = await login(self.client, actor["username"], self.manifest["password"])
+                self.actors.append((actor, headers))
+        if not self.actors:
+            raise SystemExit("У маніфесті немає користувачів з діалогами")
+
+    def _pick(self, slot: int):
+        actor, headers = self.actors[slot % len(self.actors)]
+        conv = self.rng.choice(actor["conversations"][:10])
+        return actor, headers, conv
+
+    async def _check(self, response):
+        if response.status_code >= 400:
+            raise RuntimeError(response.status_code)
+        return response
+
+    async def send(self):
+        async def worker(slot, n):
+            _, headers, conv = self._pick(slot)
+            await self._check(await self.client.post(
+                "/messages/send",
+                data={"conversation_id": str(conv["conversation_id"]), "content": f"bench {n}"},
+                headers=headers,
+            ))
+        return await _load(worker, self.args.requests, self.args.concurrency)
+
+    async def ws_send(self):
+        import websockets
+        ws_base = self.args.base_url.replace("http", "ws", 1)
+        sockets, pending = [], {}
+
+        async def reader(ws):
+            async for raw in ws:
+                event = json.loads(raw)
+                fut = pending.pop(event.get("client_msg_id"), None)
+                if fut and not fut.done():
+                    if event["type"] == "ack":
+                        fut.set_result(event)
+                    else:
+                        fut.set_exception(RuntimeError(event.get("detail")))
+
+        for actor, headers in self.actors:
+            token = headers["Authorization"].split(" ", 1)[1]
+            sockets.append(await websockets.connect(f"{ws_base}/ws/{actor['user_id']}?token={token}", max_queue=None))
+        readers = [asyncio.create_task(reader(ws)) for ws in sockets]
+        run_id = time.time_ns()
+
+        async def worker(slot, n):
+            actor, _, conv = self._pick(slot)
+            client_msg_id = f"bench-{run_id}-{n}"
+            fut = asyncio.get_running_loop().create_future()
+            pending[client_msg_id] = fut
+            await sockets[slot % len(sockets)].send(json.dumps({
+                "type": "send", "conversation_id": conv["conversation_id"],
+                "content": f"bench ws {n}", "client_msg_id": client_msg_id,
+            }))
+            await asyncio.wait_for(fut, 30)
+        try:
+            return await _load(worker, self.args.requests, self.args.concurrency)
+        finally:
+            for task in readers:
+                task.cancel()
+            for ws in sockets:
+                await ws.close()
+
+    async def upload(self):
+        payload = os.urandom(self.args.attachment_kb * 1024)
+
+        async def worker(slot, n):
+            _, headers, conv = self._pick(slot)
+            await self._check(await self.client.post(
+                "/messages/send",
+                data={"conversation_id": str(conv["conversation_id"]), "content": ""},
+                files=[("files", (f"bench{n}.bin", payload[:-8] + n.to_bytes(8, "big"), "application/octet-stream"))],
+                headers=headers,
+            ))
+        result = await _load(worker, max(1, self.args.requests // 4), self.args.concurrency)
+        result["attachment_kb"] = self.args.attachment_kb
+        return result
+
+    async def _page(self, search: str | None):
+        cursors: dict[int, int | None] = {}
+
+        async def worker(slot, n):
+            _, headers, conv = self._pick(slot)
+            cid = conv["conversation_id"]
+            params = {"conversation_id": cid, "limit": 30}
+            if cursors.get(cid):
+                params["before_id"] = cursors[cid]
+            if search:
+                params["search"] = self.rng.choice(self.manifest["search_terms"])
+            r = await self._check(await self.client.get("/messages/page", params=params, headers=headers))
+            body = r.json()
+            cursors[cid] = body["next_before_id"] if body["has_more"] else None
+        return await _load(worker, self.args.requests, self.args.concurrency)
+
+    async def page(self):
+        return await self._page(None)
+
+    async def page_search(self):
+        return await self._page("search")
+
+    async def conversations(self):
+        async def worker(slot, n):
+            _, headers, _ = self._pick(slot)
+            await self._check(await self.client.get("/conversations", params={"limit": 50}, headers=headers))
+        return await _load(worker, self.args.requests, self.args.concurrency)
+
+    async def download(self):
+        with_files = [(a, h) for a, h in self.actors if a["attachment_ids"]]
+        if not with_files:
+            return {"requests": 0, "skipped": "немає вкладень у маніфесті"}
+        received = 0
+
+        async def worker(slot, n):
+            nonlocal received
+            actor, headers = with_files[slot % len(with_files)]
+            att_id = self.rng.choice(actor["attachment_ids"])
+            r = await self._check(await self.client.get(f"/messages/attachments/{att_id}", headers=headers))
+            received += len(r.content)
+        result = await _load(worker, self.args.requests, self.args.concurrency)
+        result["bytes"] = received
+        return result
+
+    async def ws_fanout(self):
+        import websockets
+        actor, headers = self.actors[0]
+        conv = actor["conversations"][0]
+        peer_id, cid = conv["peer_id"], conv["conversation_id"]
+        peer_headers = await login(self.client, conv["peer_username"], self.manifest["password"])
+        token = peer_headers["Authorization"].split(" ", 1)[1]
+        ws_base = self.args.base_url.replace("http", "ws", 1)
+        sockets = [
+            await websockets.connect(f"{ws_base}/ws/{peer_id}?token={token}", max_queue=None)
+            for _ in range(self.args.ws_clients)
+        ]
+        sent_at: dict[str, float] = {}
+        latencies: list[float] = []
+        last_arrival: dict[str, float] = {}
+
+        async def reader(ws):
+            async for raw in ws:
+                event = json.loads(raw)
+                if event.get("type") != "new_message":
+                    continue
+                tag = event["message"]["content"]
+                if tag in sent_at:
+                    now = time.perf_counter()
+                    latencies.append((now - sent_at[tag]) * 1000)
+                    last_arrival[tag] = max(last_arrival.get(tag, 0), now)
+
+        readers = [asyncio.create_task(reader(ws)) for ws in sockets]
+        messages = max(1, self.args.requests // 10)
+        started = time.perf_counter()
+        for n in range(messages):
+            tag = f"fanout {n} {time.time_ns()}"
+            sent_at[tag] = time.perf_counter()
+            await self._check(await self.client.post(
+                "/messages/send", data={"conversation_id": str(cid), "content": tag}, headers=headers,
+            ))
+        deadline = time.perf_counter() + 10
+        while len(latencies) < messages * len(sockets) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        for task in readers:
+            task.cancel()
+        for ws in sockets:
+            await ws.close()
+
+        result = summarize(latencies, elapsed)
+        result["deliveries"] = result.pop("requests")
+        result.update({
+            "clients": len(sockets),
+            "messages": messages,
+            "expected_deliveries": messages * len(sockets),
+            "last_client_p99_ms": round(
+                summarize([(last_arrival[t] - sent_at[t]) * 1000 for t in last_arrival], elapsed).get("p99_ms", 0), 2
+            ),
+        })
+        return result
+
+
+def _git(*cmd) -> str | None:
+    try:
+        return subprocess.check_output(["git", *cmd], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, manifest: dict) -> dict:
+    import httpx
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=120, limits=limits) as client:
+        suite = Suite(client, manifest, args)
+        await suite.setup()
+        results = {}
+        for name in args.scenarios:
+            print(f"  {name}...", flush=True)
+            results[name] = await getattr(suite, name)()
+            print(f"    {results[name]}", flush=True)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--manifest", default=None)
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--actors", type=int, default=20)
+    parser.add_argument("--attachment-kb", type=int, default=256)
+    parser.add_argument("--ws-clients", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"невідомі сценарії: {', '.join(sorted(unknown))}")
+
+    root = prepare_env()
+    with open(args.manifest or os.path.join(root, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if args.base_url:
+        results = asyncio.run(run(args, manifest))
+    else:
+        with ServerThread() as server:
+            args.base_url = server.base_url
+            results = asyncio.run(run(args, manifest))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(UTC).isoformat(timespec="seconds"),
+            "commit": _git("rev-parse", "HEAD"),
+            "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "database": manifest["database"],
+            "dataset": {k: manifest[k] for k in ("seed", "users", "dialogs", "messages", "attachments", "hidden")},
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("manifest", "out")},
+        },
+        "results": results,
+    }
+    out = args.out or os.path.join(data_dir(), f"results-{report['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результати: {out}")
+
+
+if __name__ == "__main__":
+    main()
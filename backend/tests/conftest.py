@@ -0,0 +1,135 @@
+import os
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+
+_tmp = tempfile.mkdtemp(prefix="chat-tests-")
+
+# TEST_DATABASE_URL=postgresql://... запускає ті самі тести на PostgreSQL; схема public при цьому перестворюється
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite:///{_tmp}/test.db"
+os.environ["STORAGE_DIR"] = os.path.join(_tmp, "storage")
+os.environ.update({
+    "SECRET_KEY": "test-secret-" + "x" * 52,
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "BCRYPT_ROUNDS": "4",
+    "LOGIN_FAILURES_PER_IP": "10000",
+    "SQL_PROFILE": "true",
+    "SQL_PROFILE_STRICT": "true",
+    "OUTBOX_POLL_INTERVAL_SECONDS": "0.05",
+    "READ_MARKER_FLUSH_SECONDS": "3600",
+    # таймінги стиснуті, але в пропорціях за замовчуванням (60 / 6 / 1): typing не повинен
+    # залежати від циклу presence, і тести мають це бачити
+    "PRESENCE_PUBLISH_INTERVAL_SECONDS": "0.05",
+    "PRESENCE_TTL_SECONDS": "6",
+    "TYPING_TTL_SECONDS": "0.6",
+    "TYPING_FANOUT_INTERVAL_SECONDS": "0.1",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if os.environ["DATABASE_URL"].startswith("postgresql"):
+    from sqlalchemy import create_engine, text
+    _engine = create_engine(os.environ["DATABASE_URL"])
+    with _engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA public CASCADE; CREATE SCHEMA public"))
+    _engine.dispose()
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@dataclass
+class User:
+    id: int
+    username: str
+    token: str
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def make_user(client):
+    def make(prefix: str = "u") -> User:
+        name = f"{prefix}{uuid.uuid4().hex[:10]}"
+        r = client.post("/auth/register", json={
+            "username": name, "email": f"{name}@example.com",
+            "password": "secret1", "confirm_password": "secret1", "gender": "male",
+        })
+        assert r.status_code == 200, r.text
+        user_id = r.json()["id"]
+        r = client.post("/auth/login", json={"login": name, "password": "secret1"})
+        assert r.status_code == 200, r.text
+        return User(user_id, name, r.json()["access_token"])
+    return make
+
+
+@pytest.fixture
+def dialog(client, make_user):
+    alice, bob = make_user("alice"), make_user("bob")
+    r = client.post("/conversations/start", json={"peer_id": bob.id}, headers=alice.headers)
+    assert r.status_code == 200, r.text
+    drain_outbox(client)
+    return alice, bob, r.json()["conversation_id"]
+
+
+def send(client, user: User, conversation_id: int, content: str = "hi", files=None, **data) -> dict:
+    r = client.post(
+        "/messages/send",
+        data={"conversation_id": conversation_id, "content": content, **data},
+        files=files, headers=user.headers,
+    )
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def conversation(client, user: User, conversation_id: int) -> dict:
+    r = client.get("/conversations", headers=user.headers)
+    assert r.status_code == 200, r.text
+    return next(c for c in r.json() if c["conversation_id"] == conversation_id)
+
+
+def flush_reads(client) -> int:
+    from app.read_markers import aggregator
+    return client.portal.call(aggregator.flush)
+
+
+def drain_outbox(client, timeout: float = 5.0):
+    # фоновий диспетчер може тримати частину рядків (SKIP LOCKED), тож чекаємо порожньої черги
+    from sqlalchemy import func, select
+    from app.database.database import SessionLocal
+    from app.models.outbox import OutboxEvent
+    from app.outbox import dispatcher
+    deadline = time.monotonic() + timeout
+    while True:
+        client.portal.call(dispatcher.drain)
+        with SessionLocal() as db:
+            if not db.scalar(select(func.count()).select_from(OutboxEvent)):
+                return
+        assert time.monotonic() < deadline, "outbox не спорожнів"
+        time.sleep(0.01)
+
+
+def connect(client, user: User, since_seq: int | None = None):
+    url = f"/ws/{user.id}?token={user.token}"
+    if since_seq is not None:
+        url += f"&since_seq={since_seq}"
+    return client.websocket_connect(url)
+
+
+def receive_until(ws, predicate, limit: int = 50) -> dict:
+    for _ in range(limit):
+        frame = ws.receive_json()
+        if predicate(frame):
+            return frame
+    raise AssertionError("очікуваний кадр не надійшов")
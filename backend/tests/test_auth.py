@@ -0,0 +1,46 @@
+from app.core.security import pwd_context
+from app.database.database import SessionLocal
+from app.models.user import User
+from app.services import user_service
+
+
+def _me(client, user):
+    return client.get("/users/me", headers=user.headers)
+
+
+def test_deactivation_revokes_a_cached_user(client, make_user):
+    user = make_user("gone")
+    assert _me(client, user).status_code == 200
+    with SessionLocal() as db:
+        user_service.set_user_active(db, db.get(User, user.id), False)
+    assert _me(client, user).status_code == 401
+
+
+def test_profile_update_is_visible_through_the_cache(client, make_user):
+    user = make_user("renamed")
+    assert _me(client, user).json()["username"] == user.username
+    r = client.patch("/users/me", json={"username": user.username + "x"}, headers=user.headers)
+    assert r.status_code == 200, r.text
+    assert _me(client, user).json()["username"] == user.username + "x"
+
+
+def test_failed_logins_lock_the_account(client, make_user):
+    user = make_user("locked")
+    for _ in range(5):
+        r = client.post("/auth/login", json={"login": user.username, "password": "wrong"})
+        assert r.status_code == 401
+    r = client.post("/auth/login", json={"login": user.username, "password": "secret1"})
+    assert r.status_code == 429
+    assert int(r.headers["retry-after"]) >= 1
+
+
+def test_login_upgrades_an_outdated_hash(client, make_user):
+    user = make_user("legacy")
+    with SessionLocal() as db:
+        db.get(User, user.id).hashed_password = pwd_context.handler("bcrypt").using(rounds=5).hash("secret1")
+        db.commit()
+    assert client.post("/auth/login", json={"login": user.username, "password": "secret1"}).status_code == 200
+    with SessionLocal() as db:
+        upgraded = db.get(User, user.id).hashed_password
+    assert upgraded.startswith("$2b$04$")
+    assert client.post("/auth/login", json={"login": f"{user.username}@example.com", "password": "secret1"}).status_code == 200
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import threading
+from app.database.database import SessionLocal
+from app.models.blob import Blob
+from app.routers import messages as messages_router
+from app.services import blob_service
+from conftest import send
+
+
+def _blob(sha256: str):
+    with SessionLocal() as db:
+        return db.get(Blob, sha256)
+
+
+def test_identical_uploads_share_one_blob(client, dialog):
+    alice, bob, cid = dialog
+    body = os.urandom(2048)
+    sha256 = hashlib.sha256(body).hexdigest()
+    first = send(client, alice, cid, files=[("files", ("a.bin", body, "application/octet-stream"))])
+    second = send(client, bob, cid, files=[("files", ("b.bin", body, "application/octet-stream"))])
+
+    blob = _blob(sha256)
+    assert blob.ref_count == 2
+    assert os.path.isfile(blob.stored_path)
+    assert len(os.listdir(os.path.dirname(blob.stored_path))) == 1
+
+    r = client.delete(f"/messages/attachments/{first['attachments'][0]['id']}?scope=all", headers=alice.headers)
+    assert r.status_code == 200, r.text
+    assert _blob(sha256).ref_count == 1
+    assert os.path.isfile(blob.stored_path)
+
+    r = client.delete(f"/messages/attachments/{second['attachments'][0]['id']}?scope=all", headers=bob.headers)
+    assert r.status_code == 200, r.text
+    assert _blob(sha256) is None
+    assert not os.path.exists(blob.stored_path)
+
+
+def test_delete_for_me_keeps_the_blob(client, dialog):
+    alice, bob, cid = dialog
+    body = os.urandom(1024)
+    sha256 = hashlib.sha256(body).hexdigest()
+    sent = send(client, alice, cid, files=[("files", ("c.bin", body, "application/octet-stream"))])
+    r = client.delete(f"/messages/attachments/{sent['attachments'][0]['id']}?scope=me", headers=bob.headers)
+    assert r.status_code == 200, r.text
+    assert _blob(sha256).ref_count == 1
+
+
+def _upload(name: str, body: bytes):
+    return [("files", (name, body, "application/octet-stream"))]
+
+
+def test_delete_message_for_all_releases_its_blobs(client, dialog):
+    alice, bob, cid = dialog
+    shared, own = os.urandom(512), os.urandom(512)
+    send(client, bob, cid, files=_upload("s.bin", shared))
+    sent = send(client, alice, cid, files=_upload("s.bin", shared) + _upload("o.bin", own))
+    own_path = _blob(hashlib.sha256(own).hexdigest()).stored_path
+
+    assert client.delete(f"/messages/{sent['id']}?scope=all", headers=alice.headers).status_code == 200
+    assert _blob(hashlib.sha256(shared).hexdigest()).ref_count == 1
+    assert _blob(hashlib.sha256(own).hexdigest()) is None
+    assert not os.path.exists(own_path)
+
+
+def test_clear_for_all_releases_each_attachment_once(client, dialog, make_user):
+    alice, bob, cid = dialog
+    carol = make_user("carol")
+    other = client.post("/conversations/start", json={"peer_id": carol.id}, headers=alice.headers).json()["conversation_id"]
+    body = os.urandom(512)
+    sha256 = hashlib.sha256(body).hexdigest()
+    first = send(client, alice, cid, files=_upload("x.bin", body))
+    send(client, alice, other, files=_upload("x.bin", body))
+    assert _blob(sha256).ref_count == 2
+
+    att = first["attachments"][0]["id"]
+    assert client.delete(f"/messages/attachments/{att}?scope=all", headers=alice.headers).status_code == 200
+    assert client.post(f"/conversations/{cid}/clear?scope=all", headers=alice.headers).status_code == 200
+    assert _blob(sha256).ref_count == 1
+    assert os.path.isfile(_blob(sha256).stored_path)
+
+
+def test_release_unlinks_only_after_commit(client, dialog):
+    alice, _, cid = dialog
+    body = os.urandom(512)
+    sha256 = hashlib.sha256(body).hexdigest()
+    send(client, alice, cid, files=_upload("r.bin", body))
+    path = _blob(sha256).stored_path
+
+    with SessionLocal() as db:
+        blob_service.release_blob(db, sha256)
+        assert os.path.isfile(path)
+        db.rollback()
+    assert _blob(sha256).ref_count == 1
+    assert os.path.isfile(path)
+
+    with SessionLocal() as db:
+        blob_service.release_blob(db, sha256)
+        db.commit()
+    assert _blob(sha256) is None
+    assert not os.path.exists(path)
+
+
+def test_discard_leaves_a_file_that_was_replaced(tmp_path):
+    path = str(tmp_path / "blob")
+    with open(path, "wb") as f:
+        f.write(b"old")
+    seen = blob_service.file_identity(path)
+    with open(path + ".tmp", "wb") as f:
+        f.write(b"new")
+    os.replace(path + ".tmp", path)
+    blob_service.discard_files([seen])
+    assert open(path, "rb").read() == b"new"
+    blob_service.discard_files([blob_service.file_identity(path)])
+    assert not os.path.exists(path)
+
+
+def test_delete_message_runs_in_the_db_pool(client, dialog, monkeypatch):
+    alice, _, cid = dialog
+    sent = send(client, alice, cid, files=_upload("p.bin", os.urandom(256)))
+    threads = []
+    real = messages_router.delete_for_all
+    monkeypatch.setattr(messages_router, "delete_for_all", lambda *a: threads.append(threading.current_thread().name) or real(*a))
+    assert client.delete(f"/messages/{sent['id']}?scope=all", headers=alice.headers).status_code == 200
+    assert [t.startswith("db-worker") for t in threads] == [True]
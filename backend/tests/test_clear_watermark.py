@@ -0,0 +1,46 @@
+from sqlalchemy import func, select
+from app.database.database import SessionLocal
+from app.models.conversation import ConversationParticipant
+from app.models.message_status import MessageStatus
+from conftest import conversation, send
+
+
+def _page_ids(client, user, conversation_id: int) -> list[int]:
+    r = client.get(f"/messages/page?conversation_id={conversation_id}&limit=50", headers=user.headers)
+    assert r.status_code == 200, r.text
+    return [m["id"] for m in r.json()["items"]]
+
+
+def test_clear_for_me_moves_the_watermark(client, dialog):
+    alice, bob, cid = dialog
+    old = [send(client, alice, cid, f"old {i}")["id"] for i in range(3)]
+
+    assert client.post(f"/conversations/{cid}/clear?scope=me", headers=bob.headers).status_code == 200
+    assert _page_ids(client, bob, cid) == []
+    assert _page_ids(client, alice, cid) == old
+    assert conversation(client, bob, cid)["unread_count"] == 0
+
+    with SessionLocal() as db:
+        mark = db.scalar(select(ConversationParticipant.cleared_before_message_id).where(
+            ConversationParticipant.conversation_id == cid, ConversationParticipant.user_id == bob.id,
+        ))
+        per_message = db.scalar(select(func.count()).select_from(MessageStatus).where(
+            MessageStatus.user_id == bob.id, MessageStatus.message_id.in_(old),
+        ))
+    assert mark == old[-1]
+    assert per_message == 0
+
+    new = send(client, alice, cid, "after clear")["id"]
+    assert _page_ids(client, bob, cid) == [new]
+    assert conversation(client, bob, cid)["unread_count"] == 1
+    assert client.get("/messages/search?q=old", headers=bob.headers).json() == []
+
+
+def test_clear_for_all_hides_history_from_everyone(client, dialog):
+    alice, bob, cid = dialog
+    for i in range(2):
+        send(client, bob, cid, f"gone {i}")
+    assert client.post(f"/conversations/{cid}/clear?scope=all", headers=alice.headers).status_code == 200
+    assert _page_ids(client, alice, cid) == []
+    assert _page_ids(client, bob, cid) == []
+    assert conversation(client, alice, cid)["unread_count"] == 0
@@ -0,0 +1,35 @@
+from conftest import send
+
+
+def _list(client, user, **params) -> list[dict]:
+    r = client.get("/conversations", params=params, headers=user.headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_keyset_pages_walk_the_whole_list_once(client, make_user):
+    me = make_user("lister")
+    cids = []
+    for i in range(5):
+        peer = make_user(f"peer{i}")
+        r = client.post("/conversations/start", json={"peer_id": peer.id}, headers=me.headers)
+        cids.append(r.json()["conversation_id"])
+    # дві розмови без повідомлень мають іти в кінці списку
+    for cid in [cids[2], cids[0], cids[4]]:
+        send(client, me, cid, f"in {cid}")
+
+    everything = _list(client, me)
+    assert [c["conversation_id"] for c in everything] == [cids[4], cids[0], cids[2], cids[3], cids[1]]
+    assert everything[0]["last_message_preview"] == f"in {cids[4]}"
+
+    walked, cursor = [], {}
+    while True:
+        page = _list(client, me, limit=2, **cursor)
+        walked += page
+        if len(page) < 2:
+            break
+        last = page[-1]
+        cursor = {"before_conversation_id": last["conversation_id"]}
+        if last["last_message_at"] is not None:
+            cursor["before_last_message_at"] = last["last_message_at"]
+    assert [c["conversation_id"] for c in walked] == [c["conversation_id"] for c in everything]
@@ -0,0 +1,51 @@
+from sqlalchemy import select
+from app.database.database import SessionLocal
+from app.models.conversation import ConversationParticipant
+from app.services.counter_service import recompute_all_counters
+from conftest import conversation, flush_reads, send
+
+
+def _snapshot(conversation_id: int) -> dict:
+    P = ConversationParticipant
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(P.user_id, P.unread_count, P.last_visible_message_id, P.last_message_at)
+            .where(P.conversation_id == conversation_id)
+        ).all()
+    return {row.user_id: tuple(row[1:]) for row in rows}
+
+
+def test_counters_follow_sends_reads_and_deletes(client, dialog):
+    alice, bob, cid = dialog
+    ids = [send(client, alice, cid, f"m{i}")["id"] for i in range(3)]
+    assert conversation(client, bob, cid)["unread_count"] == 3
+    assert conversation(client, alice, cid)["unread_count"] == 0
+    assert conversation(client, bob, cid)["last_message_id"] == ids[-1]
+
+    client.post(f"/conversations/{cid}/read", json={"up_to_message_id": ids[1]}, headers=bob.headers)
+    flush_reads(client)
+    assert conversation(client, bob, cid)["unread_count"] == 1
+
+    reply = send(client, bob, cid, "reply")["id"]
+    assert conversation(client, alice, cid)["unread_count"] == 1
+    assert conversation(client, bob, cid)["unread_count"] == 1
+
+    assert client.delete(f"/messages/{ids[2]}?scope=all", headers=alice.headers).status_code == 200
+    assert conversation(client, bob, cid)["unread_count"] == 0
+
+    assert client.delete(f"/messages/{reply}?scope=me", headers=alice.headers).status_code == 200
+    assert conversation(client, alice, cid)["unread_count"] == 0
+    assert conversation(client, alice, cid)["last_message_id"] == ids[1]
+    assert conversation(client, bob, cid)["last_message_id"] == reply
+
+
+def test_incremental_counters_match_a_full_recompute(client, dialog):
+    alice, bob, cid = dialog
+    ids = [send(client, sender, cid, f"x{i}")["id"] for i, sender in enumerate([alice, bob, alice, alice])]
+    client.post(f"/conversations/{cid}/read", json={"up_to_message_id": ids[2]}, headers=bob.headers)
+    flush_reads(client)
+    client.delete(f"/messages/{ids[0]}?scope=me", headers=bob.headers)
+    before = _snapshot(cid)
+    with SessionLocal() as db:
+        recompute_all_counters(db, cid)
+    assert _snapshot(cid) == before
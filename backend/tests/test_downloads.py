@@ -0,0 +1,40 @@
+import hashlib
+import os
+from conftest import send
+
+
+def _attachment(client, dialog, body: bytes):
+    alice, bob, cid = dialog
+    sent = send(client, alice, cid, files=[("files", ("d.bin", body, "application/octet-stream"))])
+    return bob, f"/messages/attachments/{sent['attachments'][0]['id']}"
+
+
+def test_download_revalidates_with_etag(client, dialog):
+    body = os.urandom(4096)
+    bob, url = _attachment(client, dialog, body)
+    r = client.get(url, headers=bob.headers)
+    assert r.status_code == 200 and r.content == body
+    etag = r.headers["etag"]
+    assert etag == f'"{hashlib.sha256(body).hexdigest()}"'
+
+    r = client.get(url, headers={**bob.headers, "If-None-Match": f'"other", W/{etag}'})
+    assert r.status_code == 304 and r.content == b""
+    assert r.headers["etag"] == etag
+    assert client.get(url, headers={**bob.headers, "If-None-Match": '"other"'}).status_code == 200
+
+
+def test_download_serves_byte_ranges(client, dialog):
+    body = os.urandom(4096)
+    bob, url = _attachment(client, dialog, body)
+    r = client.get(url, headers={**bob.headers, "Range": "bytes=100-199"})
+    assert r.status_code == 206
+    assert r.content == body[100:200]
+    assert r.headers["content-range"] == f"bytes 100-199/{len(body)}"
+
+    r = client.get(url, headers={**bob.headers, "Range": "bytes=-10"})
+    assert r.status_code == 206 and r.content == body[-10:]
+
+    signed = client.post(f"{url}/signed-url", headers=bob.headers).json()["url"]
+    r = client.get(signed, headers={"Range": "bytes=4000-"})
+    assert r.status_code == 206 and r.content == body[4000:]
+    assert client.get(signed, headers={"If-None-Match": r.headers["etag"]}).status_code == 304
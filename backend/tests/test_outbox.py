@@ -0,0 +1,40 @@
+from conftest import connect, drain_outbox, receive_until, send
+
+
+def _sync_seq(ws) -> int:
+    frame = ws.receive_json()
+    assert frame["type"] == "sync"
+    return frame["seq"]
+
+
+def test_sent_message_is_delivered_with_a_sequence_number(client, dialog):
+    alice, bob, cid = dialog
+    with connect(client, bob) as ws:
+        seq = _sync_seq(ws)
+        mid = send(client, alice, cid, "live")["id"]
+        event = receive_until(ws, lambda f: f["type"] == "new_message")
+    assert event["seq"] == seq + 1
+    assert event["message"]["id"] == mid
+    drain_outbox(client)
+
+
+def test_reconnect_replays_missed_events_before_sync(client, dialog):
+    alice, bob, cid = dialog
+    with connect(client, bob) as ws:
+        seq = _sync_seq(ws)
+    missed = [send(client, alice, cid, f"missed {i}")["id"] for i in range(3)]
+    drain_outbox(client)
+
+    with connect(client, bob, since_seq=seq) as ws:
+        frames = [ws.receive_json() for _ in range(4)]
+    assert [f["type"] for f in frames] == ["new_message"] * 3 + ["sync"]
+    assert [f["message"]["id"] for f in frames[:3]] == missed
+    assert [f["seq"] for f in frames] == [seq + 1, seq + 2, seq + 3, seq + 3]
+
+
+def test_reconnect_outside_the_log_requires_resync(client, dialog):
+    alice, bob, _ = dialog
+    with connect(client, bob) as ws:
+        seq = _sync_seq(ws)
+    with connect(client, bob, since_seq=seq + 100) as ws:
+        assert ws.receive_json() == {"type": "resync_required", "seq": seq}
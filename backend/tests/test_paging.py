@@ -0,0 +1,63 @@
+from conftest import send
+
+
+def _page(client, user, cid: int, **params) -> dict:
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    r = client.get(f"/messages/page?conversation_id={cid}&{query}", headers=user.headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _ids(page: dict) -> list[int]:
+    return [m["id"] for m in page["items"]]
+
+
+def test_around_centres_on_the_anchor(client, dialog):
+    alice, bob, cid = dialog
+    ids = [send(client, alice, cid, f"a{i}")["id"] for i in range(9)]
+    page = _page(client, bob, cid, around_id=ids[4], limit=4)
+    assert _ids(page) == ids[3:7]
+    assert page["has_more"] and page["has_more_after"]
+
+
+def test_around_near_the_edges_tops_up_from_the_other_side(client, dialog):
+    alice, bob, cid = dialog
+    ids = [send(client, alice, cid, f"e{i}")["id"] for i in range(6)]
+
+    newest = _page(client, bob, cid, around_id=ids[-1], limit=4)
+    assert _ids(newest) == ids[-4:]
+    assert newest["has_more"] and not newest["has_more_after"]
+
+    oldest = _page(client, bob, cid, around_id=ids[0], limit=4)
+    assert _ids(oldest) == ids[:4]
+    assert not oldest["has_more"] and oldest["has_more_after"]
+
+    everything = _page(client, bob, cid, around_id=ids[2], limit=10)
+    assert _ids(everything) == ids
+    assert not everything["has_more"] and not everything["has_more_after"]
+
+
+def test_before_and_after_cursors_walk_the_history(client, dialog):
+    alice, bob, cid = dialog
+    ids = [send(client, alice, cid, f"w{i}")["id"] for i in range(7)]
+
+    latest = _page(client, bob, cid, limit=3)
+    assert _ids(latest) == ids[-3:]
+    assert latest["has_more"] and latest["next_before_id"] == ids[-3]
+    older = _page(client, bob, cid, limit=3, before_id=latest["next_before_id"])
+    assert _ids(older) == ids[1:4] and older["has_more_after"]
+    oldest = _page(client, bob, cid, limit=3, before_id=older["next_before_id"])
+    assert _ids(oldest) == ids[:1] and not oldest["has_more"]
+
+    forward = _page(client, bob, cid, limit=3, after_id=ids[0])
+    assert _ids(forward) == ids[1:4]
+    assert forward["has_more_after"] and forward["next_after_id"] == ids[3]
+    rest = _page(client, bob, cid, limit=3, after_id=forward["next_after_id"])
+    assert _ids(rest) == ids[4:] and not rest["has_more_after"]
+    assert _ids(_page(client, bob, cid, limit=3, after_id=ids[-1])) == []
+
+
+def test_only_one_cursor_is_accepted(client, dialog):
+    _, bob, cid = dialog
+    r = client.get(f"/messages/page?conversation_id={cid}&before_id=5&after_id=1", headers=bob.headers)
+    assert r.status_code == 400
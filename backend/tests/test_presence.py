@@ -0,0 +1,55 @@
+import time
+from app.core.config import settings
+from conftest import connect, receive_until
+
+
+def test_typing_stops_on_its_own_clock(client, dialog):
+    alice, bob, cid = dialog
+    assert settings.PRESENCE_TTL_SECONDS / 3 > settings.TYPING_TTL_SECONDS * 2
+    with connect(client, alice) as a, connect(client, bob) as b:
+        a.receive_json()
+        b.receive_json()
+        a.send_json({"type": "typing", "conversation_id": cid, "active": True})
+        started_at = time.monotonic()
+        started = receive_until(b, lambda f: f["type"] == "typing")
+        assert started["started"] == [alice.id] and started["stopped"] == []
+
+        stopped = receive_until(b, lambda f: f["type"] == "typing")
+        elapsed = time.monotonic() - started_at
+    assert stopped["stopped"] == [alice.id]
+    assert elapsed < settings.TYPING_TTL_SECONDS + settings.TYPING_FANOUT_INTERVAL_SECONDS + 0.5
+
+
+def test_presence_subscription_sees_peer_come_and_go(client, dialog):
+    alice, bob, _ = dialog
+    with connect(client, bob) as b:
+        b.receive_json()
+        b.send_json({"type": "presence_subscribe", "user_ids": [alice.id], "client_msg_id": "p"})
+        ack = receive_until(b, lambda f: f.get("client_msg_id") == "p")
+        assert ack["presence"][str(alice.id)]["status"] == "offline"
+
+        with connect(client, alice) as a:
+            a.receive_json()
+            online = receive_until(b, lambda f: f["type"] == "presence")
+        offline = receive_until(b, lambda f: f["type"] == "presence")
+    assert (online["user_id"], online["status"]) == (alice.id, "online")
+    assert (offline["user_id"], offline["status"]) == (alice.id, "offline")
+    assert offline["last_seen"] is not None
+
+
+def test_failed_background_send_is_logged(client, caplog):
+    import asyncio
+    from app.presence import presence
+
+    async def broken():
+        raise RuntimeError("backplane down")
+
+    async def run():
+        presence._spawn(broken(), "presence publish")
+        assert presence._pending_sends
+        await asyncio.sleep(0.01)
+
+    with caplog.at_level("ERROR", logger="app.presence"):
+        client.portal.call(run)
+    assert not presence._pending_sends
+    assert any("presence publish failed" in r.getMessage() and r.exc_info for r in caplog.records)
@@ -0,0 +1,98 @@
+import pytest
+from fastapi.routing import APIRoute
+from app.core import auth
+from app.core.instrumentation import QueryBudgetExceeded
+from conftest import send
+
+
+def _budgeted_routes(app) -> set[tuple[str, str]]:
+    return {
+        (method, route.path)
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.include_in_schema
+        for method in route.methods
+    }
+
+
+def test_every_route_declares_a_budget(client):
+    missing = [
+        f"{method} {route.path}"
+        for route in client.app.routes
+        if isinstance(route, APIRoute) and route.include_in_schema
+        for method in route.methods
+        if getattr(route.endpoint, "__query_budget__", None) is None
+    ]
+    assert missing == []
+
+
+def test_every_route_stays_within_budget(client, dialog, make_user):
+    # conftest вмикає SQL_PROFILE_STRICT: перевищення бюджету піднімає QueryBudgetExceeded із запиту
+    alice, bob, cid = dialog
+    hit: set[tuple[str, str]] = set()
+
+    def call(method: str, template: str, url: str, expect: int = 200, **kwargs):
+        # холодний кеш автентифікації: бюджет має покривати й пошук користувача
+        auth._tokens.clear()
+        auth._users.clear()
+        r = client.request(method, url, **kwargs)
+        assert r.status_code == expect, (method, url, r.text)
+        hit.add((method, template))
+        return r
+
+    name = make_user("budget").username
+    call("POST", "/auth/register", "/auth/register", json={
+        "username": name + "x", "email": f"{name}x@example.com",
+        "password": "secret1", "confirm_password": "secret1", "gender": "female",
+    })
+    call("POST", "/auth/login", "/auth/login", json={"login": name, "password": "secret1"})
+    call("POST", "/auth/token", "/auth/token", data={"username": name, "password": "secret1"})
+
+    call("GET", "/users/me", "/users/me", headers=alice.headers)
+    call("PATCH", "/users/me", "/users/me", json={"gender": "female"}, headers=alice.headers)
+    call("POST", "/users/me/change-password", "/users/me/change-password", json={
+        "old_password": "secret1", "new_password": "secret2", "confirm_password": "secret2",
+    }, headers=alice.headers)
+
+    call("POST", "/conversations/start", "/conversations/start", json={"peer_id": bob.id}, headers=alice.headers)
+    call("GET", "/conversations/search-users", f"/conversations/search-users?q={bob.username[:6]}", headers=alice.headers)
+
+    files = [("files", (f"f{i}.txt", f"payload {i}".encode(), "text/plain")) for i in range(3)]
+    sent = call(
+        "POST", "/messages/send", "/messages/send",
+        data={"conversation_id": cid, "content": "with files"}, files=files, headers=alice.headers,
+    ).json()
+    plain = send(client, alice, cid, "plain")
+    att_id = sent["attachments"][0]["id"]
+
+    call("GET", "/conversations", "/conversations", headers=bob.headers)
+    call("POST", "/conversations/{conversation_id}/read", f"/conversations/{cid}/read",
+         json={"up_to_message_id": plain["id"]}, headers=bob.headers)
+    call("POST", "/conversations/{conversation_id}/read", f"/conversations/{cid}/read", headers=bob.headers)
+    call("GET", "/messages/page", f"/messages/page?conversation_id={cid}&limit=10", headers=bob.headers)
+    call("GET", "/messages/search", "/messages/search?q=plain", headers=bob.headers)
+    call("GET", "/messages/attachments/{attachment_id}", f"/messages/attachments/{att_id}", headers=bob.headers)
+    url = call("POST", "/messages/attachments/{attachment_id}/signed-url",
+               f"/messages/attachments/{att_id}/signed-url", headers=bob.headers).json()["url"]
+    call("GET", "/messages/attachments/signed/{token}", url)
+    call("PATCH", "/messages/{message_id}", f"/messages/{plain['id']}", json={"content": "edited"}, headers=alice.headers)
+    call("DELETE", "/messages/attachments/{attachment_id}",
+         f"/messages/attachments/{sent['attachments'][1]['id']}?scope=me", headers=bob.headers)
+    call("DELETE", "/messages/attachments/{attachment_id}",
+         f"/messages/attachments/{att_id}?scope=all", headers=alice.headers)
+    call("DELETE", "/messages/{message_id}", f"/messages/{sent['id']}?scope=me", headers=bob.headers)
+    doomed = send(client, alice, cid, files=[("files", ("d.txt", b"doomed " + bytes(8), "text/plain"))])
+    call("DELETE", "/messages/{message_id}", f"/messages/{doomed['id']}?scope=all", headers=alice.headers)
+    call("POST", "/conversations/{conversation_id}/hide", f"/conversations/{cid}/hide", headers=bob.headers)
+    call("POST", "/conversations/{conversation_id}/clear", f"/conversations/{cid}/clear?scope=me", headers=bob.headers)
+    send(client, alice, cid, files=[("files", ("e.txt", b"cleared " + bytes(8), "text/plain"))])
+    call("POST", "/conversations/{conversation_id}/clear", f"/conversations/{cid}/clear?scope=all", headers=alice.headers)
+
+    assert _budgeted_routes(client.app) - hit == set()
+
+
+def test_exceeding_a_budget_fails_the_request(client, dialog, monkeypatch):
+    alice, _, _ = dialog
+    route = next(r for r in client.app.routes if isinstance(r, APIRoute) and r.path == "/conversations")
+    monkeypatch.setattr(route.endpoint, "__query_budget__", 0)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/conversations", headers=alice.headers)
@@ -0,0 +1,59 @@
+from conftest import connect, conversation, flush_reads, receive_until, send
+
+
+def test_markers_coalesce_into_one_write(client, dialog):
+    alice, bob, cid = dialog
+    ids = [send(client, alice, cid, f"r{i}")["id"] for i in range(5)]
+    flush_reads(client)
+    with connect(client, alice) as ws:
+        ws.receive_json()
+        for mid in [ids[1], ids[3], ids[2], ids[0]]:
+            assert client.post(f"/conversations/{cid}/read", json={"up_to_message_id": mid}, headers=bob.headers).status_code == 200
+        assert flush_reads(client) == 1
+        receipt = receive_until(ws, lambda f: f["type"] == "read_receipt")
+    assert receipt == {"type": "read_receipt", "conversation_id": cid, "user_id": bob.id, "up_to_message_id": ids[3]}
+    assert conversation(client, bob, cid)["last_read_message_id"] == ids[3]
+    assert conversation(client, bob, cid)["unread_count"] == 1
+    assert conversation(client, alice, cid)["peer_last_read_message_id"] == ids[3]
+
+
+def test_markers_never_move_backwards(client, dialog):
+    alice, bob, cid = dialog
+    ids = [send(client, alice, cid, f"b{i}")["id"] for i in range(3)]
+    client.post(f"/conversations/{cid}/read", json={"up_to_message_id": ids[2]}, headers=bob.headers)
+    flush_reads(client)
+    client.post(f"/conversations/{cid}/read", json={"up_to_message_id": ids[0]}, headers=bob.headers)
+    assert flush_reads(client) == 0
+    assert conversation(client, bob, cid)["last_read_message_id"] == ids[2]
+
+
+def test_ws_read_command_goes_through_the_aggregator(client, dialog):
+    alice, bob, cid = dialog
+    mid = send(client, alice, cid)["id"]
+    with connect(client, bob) as ws:
+        ws.receive_json()
+        ws.send_json({"type": "read", "conversation_id": cid, "up_to_message_id": mid, "client_msg_id": "r1"})
+        assert receive_until(ws, lambda f: f.get("client_msg_id") == "r1")["type"] == "ack"
+    assert conversation(client, bob, cid)["unread_count"] == 1
+    flush_reads(client)
+    assert conversation(client, bob, cid)["unread_count"] == 0
+
+
+def test_markers_for_foreign_conversations_are_dropped(client, dialog, make_user):
+    alice, _, cid = dialog
+    mid = send(client, alice, cid)["id"]
+    stranger = make_user("eve")
+    client.post(f"/conversations/{cid}/read", json={"up_to_message_id": mid}, headers=stranger.headers)
+    assert flush_reads(client) == 0
+
+
+def test_read_all_is_bounded_by_what_was_visible_when_marked(client, dialog):
+    alice, bob, cid = dialog
+    seen = [send(client, alice, cid, f"seen {i}")["id"] for i in range(2)]
+    client.post(f"/conversations/{cid}/read", headers=bob.headers)
+    client.post(f"/conversations/{cid}/read", json={"up_to_message_id": seen[0]}, headers=bob.headers)
+    unseen = send(client, alice, cid, "arrived before flush")["id"]
+    flush_reads(client)
+    assert conversation(client, bob, cid)["last_read_message_id"] == seen[-1]
+    assert conversation(client, bob, cid)["unread_count"] == 1
+    assert unseen > seen[-1]
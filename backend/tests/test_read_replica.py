@@ -0,0 +1,23 @@
+from sqlalchemy import event
+from app.core.config import settings
+from app.database.database import ReadSessionLocal, engine, make_engine
+from conftest import send
+
+
+def test_read_endpoints_use_the_replica_engine(client, dialog):
+    alice, bob, cid = dialog
+    replica = make_engine(settings.DATABASE_URL, "replica")
+    statements = []
+    event.listen(replica, "before_cursor_execute", lambda *a: statements.append(a[2]))
+    ReadSessionLocal.configure(bind=replica)
+    try:
+        send(client, alice, cid, "routed")
+        assert statements == []
+
+        for url in ["/conversations", f"/messages/page?conversation_id={cid}"]:
+            before = len(statements)
+            assert client.get(url, headers=bob.headers).status_code == 200
+            assert len(statements) > before, url
+    finally:
+        ReadSessionLocal.configure(bind=engine)
+        replica.dispose()
@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+import app.models
+from app.database import schema
+
+_LEGACY_COLUMNS = ["unread_count", "last_visible_message_id", "last_message_at", "cleared_before_message_id"]
+
+
+def _legacy_database(path) -> str:
+    # база зі схемою до лічильників: таблиці є, нових колонок і індексів на них ще немає
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    schema.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for index in inspect(conn).get_indexes("conversation_participants"):
+            conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+        for column in _LEGACY_COLUMNS:
+            conn.execute(text(f"ALTER TABLE conversation_participants DROP COLUMN {column}"))
+        # старий message_status без унікальності (message_id, user_id)
+        conn.execute(text("DROP TABLE message_status"))
+        conn.execute(text(
+            "CREATE TABLE message_status (id INTEGER PRIMARY KEY, message_id INTEGER NOT NULL, "
+            "user_id INTEGER NOT NULL, is_deleted BOOLEAN)"
+        ))
+        conn.execute(text(
+            "INSERT INTO users (id, username, email, hashed_password, gender, is_active) VALUES "
+            "(1, 'ann', 'ann@example.com', 'x', 'female', 1), (2, 'ben', 'ben@example.com', 'x', 'male', 1)"
+        ))
+        conn.execute(text("INSERT INTO conversations (id) VALUES (1)"))
+        conn.execute(text(
+            "INSERT INTO conversation_participants (id, conversation_id, user_id, is_hidden, is_cleared, last_read_message_id) "
+            "VALUES (1, 1, 1, 0, 0, NULL), (2, 1, 2, 0, 0, 1)"
+        ))
+        conn.execute(text(
+            "INSERT INTO messages (id, conversation_id, sender_id, content, is_deleted_for_all) VALUES "
+            "(1, 1, 1, 'one', 0), (2, 1, 1, 'two', 0), (3, 1, 1, 'three', 0), (4, 1, 2, 'reply', 0)"
+        ))
+    engine.dispose()
+    return url
+
+
+def test_upgrade_adds_columns_and_recomputes_counters(tmp_path):
+    engine = create_engine(_legacy_database(tmp_path / "legacy.db"))
+    applied = schema.upgrade(engine)
+    assert {f"conversation_participants.{c}" for c in _LEGACY_COLUMNS} <= set(applied)
+
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text(
+            "SELECT user_id, unread_count FROM conversation_participants ORDER BY user_id"
+        )).all())
+        visible = conn.execute(text("SELECT last_visible_message_id FROM conversation_participants")).scalars().all()
+    assert rows == {1: 1, 2: 2}
+    assert visible == [4, 4]
+
+    assert schema.upgrade(engine) == []
+    engine.dispose()
+
+
+def test_duplicate_statuses_block_startup_until_deduped(tmp_path):
+    engine = create_engine(_legacy_database(tmp_path / "legacy.db"))
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO message_status (id, message_id, user_id, is_deleted) VALUES "
+            "(1, 1, 2, 1), (2, 1, 2, 0), (3, 2, 2, 0), (4, 2, 2, 0), (5, 3, 2, 0)"
+        ))
+
+    with pytest.raises(schema.DuplicateRows, match="uq_message_user: 2"):
+        schema.upgrade(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM message_status")).scalar() == 5
+
+    assert schema.dedupe(engine) == {"uq_message_user": 2}
+    with engine.connect() as conn:
+        kept = conn.execute(text("SELECT id, message_id, is_deleted FROM message_status ORDER BY id")).all()
+    # для повідомлення 1 лишається прихований рядок, для 2 — найновіший
+    assert [tuple(r) for r in kept] == [(1, 1, 1), (4, 2, 0), (5, 3, 0)]
+
+    assert "unique uq_message_user" in schema.upgrade(engine)
+    engine.dispose()
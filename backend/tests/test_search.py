@@ -0,0 +1,47 @@
+import uuid
+from conftest import send
+
+
+def _search(client, user, q: str, **params) -> list[dict]:
+    r = client.get("/messages/search", params={"q": q, **params}, headers=user.headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _word() -> str:
+    # слово, якого немає в інших тестах спільної бази
+    return "w" + "".join(chr(ord("a") + int(c, 16) % 26) for c in uuid.uuid4().hex[:8])
+
+
+def test_results_are_ranked_and_highlighted(client, dialog):
+    alice, bob, cid = dialog
+    word = _word()
+    weak = send(client, alice, cid, f"{word} among many other unrelated words in a long sentence here")["id"]
+    strong = send(client, alice, cid, f"{word} {word} {word}")["id"]
+    send(client, alice, cid, "nothing to see")
+    escaped = send(client, bob, cid, f"{word} 1 < 2 & 3")["id"]
+
+    hits = _search(client, bob, word, conversation_id=cid)
+    assert {h["message"]["id"] for h in hits} == {weak, strong, escaped}
+    ranks = {h["message"]["id"]: h["rank"] for h in hits}
+    assert ranks[strong] > ranks[weak]
+    snippets = {h["message"]["id"]: h["snippet"] for h in hits}
+    assert f"<mark>{word}</mark>" in snippets[weak]
+    assert "<" not in snippets[escaped].replace("<mark>", "").replace("</mark>", "")
+
+    assert [h["message"]["id"] for h in _search(client, bob, word[:5], conversation_id=cid)]
+    assert _search(client, bob, f"{word} missingterm", conversation_id=cid) == []
+
+
+def test_edit_updates_the_index(client, dialog):
+    alice, bob, cid = dialog
+    old, new = _word(), _word()
+    mid = send(client, alice, cid, f"before {old}")["id"]
+    assert [h["message"]["id"] for h in _search(client, bob, old)] == [mid]
+
+    r = client.patch(f"/messages/{mid}", json={"content": f"after {new}"}, headers=alice.headers)
+    assert r.status_code == 200, r.text
+    assert _search(client, bob, old) == []
+    assert [h["message"]["id"] for h in _search(client, bob, new)] == [mid]
+    page = client.get(f"/messages/page?conversation_id={cid}&search={new}", headers=bob.headers).json()
+    assert [m["id"] for m in page["items"]] == [mid]
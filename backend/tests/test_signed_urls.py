@@ -0,0 +1,25 @@
+import os
+from conftest import send
+
+
+def test_signed_url_stops_working_once_deleted_for_all(client, dialog):
+    alice, bob, cid = dialog
+    body = os.urandom(256)
+    files = lambda: [("files", ("s.bin", body, "application/octet-stream"))]
+    sent = send(client, alice, cid, files=files())
+    send(client, bob, cid, files=files())
+    att = sent["attachments"][0]["id"]
+
+    url = client.post(f"/messages/attachments/{att}/signed-url", headers=bob.headers).json()["url"]
+    r = client.get(url)
+    assert r.status_code == 200 and r.content == body
+
+    assert client.delete(f"/messages/attachments/{att}?scope=all", headers=alice.headers).status_code == 200
+    assert client.get(url).status_code == 404
+
+
+def test_tampered_signed_url_is_rejected(client, dialog):
+    alice, bob, cid = dialog
+    sent = send(client, alice, cid, files=[("files", ("t.txt", b"secret", "text/plain"))])
+    url = client.post(f"/messages/attachments/{sent['attachments'][0]['id']}/signed-url", headers=bob.headers).json()["url"]
+    assert client.get(url[:-2] + ("AA" if not url.endswith("AA") else "BB")).status_code == 403
@@ -0,0 +1,18 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from app.services.thumbnail_service import _render
+
+
+def test_parallel_renders_of_one_variant_do_not_collide(tmp_path):
+    source = tmp_path / "source.png"
+    Image.new("RGB", (1600, 1200), (200, 40, 40)).save(source)
+    dest = tmp_path / "variants" / "abc.thumb.jpg"
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: _render(str(source), str(dest), 320), range(16)))
+
+    assert {(w, h) for w, h, _ in results} == {(320, 240)}
+    assert os.listdir(dest.parent) == ["abc.thumb.jpg"]
+    with Image.open(dest) as img:
+        assert img.size == (320, 240)
@@ -0,0 +1,59 @@
+import asyncio
+from app import ws_commands
+from app.core.config import settings
+from conftest import connect, receive_until
+
+
+def test_commands_over_the_in_flight_limit_are_rejected(client, dialog, monkeypatch):
+    _, bob, _ = dialog
+
+    async def slow(conn, user, data):
+        await asyncio.sleep(0.5)
+        return {}
+
+    monkeypatch.setattr(settings, "WS_COMMANDS_IN_FLIGHT", 1)
+    monkeypatch.setitem(ws_commands.COMMANDS, "edit", slow)
+    with connect(client, bob) as ws:
+        ws.receive_json()
+        ws.send_json({"type": "edit", "client_msg_id": "first"})
+        ws.send_json({"type": "edit", "client_msg_id": "second"})
+        rejected = receive_until(ws, lambda f: f.get("client_msg_id") == "second")
+        accepted = receive_until(ws, lambda f: f.get("client_msg_id") == "first")
+    assert rejected["type"] == "error" and rejected["command"] == "edit"
+    assert accepted["type"] == "ack"
+
+
+def test_failing_command_is_logged_with_traceback(client, dialog, monkeypatch, caplog):
+    _, bob, _ = dialog
+
+    async def broken(conn, user, data):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(ws_commands.COMMANDS, "edit", broken)
+    with caplog.at_level("ERROR", logger="app.ws_commands"), connect(client, bob) as ws:
+        ws.receive_json()
+        ws.send_json({"type": "edit", "client_msg_id": "x"})
+        reply = receive_until(ws, lambda f: f.get("client_msg_id") == "x")
+    assert reply["type"] == "error" and "boom" not in reply["detail"]
+    record = next(r for r in caplog.records if r.name == "app.ws_commands")
+    assert record.exc_info and "boom" in str(record.exc_info[1])
+
+
+def test_http_retry_racing_a_ws_send_returns_the_stored_message(client, dialog, monkeypatch):
+    from app.routers import messages as messages_router
+    from conftest import send
+    alice, _, cid = dialog
+    stored = send(client, alice, cid, "over ws", client_msg_id="dup-1")
+
+    # HTTP-перевірка client_msg_id відбулася ще до коміту WS-пакета
+    real, calls = messages_router.find_by_client_id, []
+
+    def stale_first(*args):
+        calls.append(args)
+        return None if len(calls) == 1 else real(*args)
+
+    monkeypatch.setattr(messages_router, "find_by_client_id", stale_first)
+    again = send(client, alice, cid, "over http", client_msg_id="dup-1")
+    assert again["id"] == stored["id"]
+    assert again["content"] == "over ws"
+    assert len(calls) == 2
@@ -0,0 +1,91 @@
+import asyncio
+import json
+from app import ws_manager
+from app.backplane import InMemoryBackplane
+from app.core.config import settings
+
+
+class FakeSocket:
+    def __init__(self, stuck: bool = False):
+        self.sent: list[dict] = []
+        self.closed_with = None
+        self.stuck = stuck
+
+    async def send_text(self, text: str):
+        if self.stuck:
+            await asyncio.Event().wait()
+        self.sent.append(json.loads(text))
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+def test_every_connection_of_every_recipient_gets_one_copy(client):
+    # від'ємні id не перетинаються з реальними користувачами тестової бази
+    async def run():
+        sockets = {key: FakeSocket() for key in ("a1", "a2", "b")}
+        conns = [
+            ws_manager.register_connection(-1, sockets["a1"]),
+            ws_manager.register_connection(-1, sockets["a2"]),
+            ws_manager.register_connection(-2, sockets["b"]),
+        ]
+        try:
+            await ws_manager.broadcast_to_conversation_participants([-1, -2, -1], {"type": "ping", "n": 1})
+            await asyncio.sleep(0.05)
+        finally:
+            for conn in conns:
+                ws_manager.unregister_connection(conn)
+        return sockets
+
+    sockets = client.portal.call(run)
+    assert {key: s.sent for key, s in sockets.items()} == {key: [{"type": "ping", "n": 1}] for key in sockets}
+    assert -1 not in ws_manager.active_connections and -2 not in ws_manager.active_connections
+
+
+def test_slow_reader_is_dropped_without_holding_up_others(client, monkeypatch):
+    monkeypatch.setattr(settings, "WS_SEND_QUEUE_SIZE", 2)
+
+    async def run():
+        slow, fast = FakeSocket(stuck=True), FakeSocket()
+        ws_manager.register_connection(-3, slow)
+        healthy = ws_manager.register_connection(-4, fast)
+        try:
+            for n in range(5):
+                await asyncio.wait_for(
+                    ws_manager.broadcast_to_conversation_participants([-3, -4], {"n": n}), timeout=1
+                )
+            await asyncio.sleep(0.05)
+        finally:
+            ws_manager.unregister_connection(healthy)
+        return slow, fast
+
+    slow, fast = client.portal.call(run)
+    assert [f["n"] for f in fast.sent] == list(range(5))
+    assert slow.sent == [] and slow.closed_with == 1013
+    assert -3 not in ws_manager.active_connections
+
+
+def test_backplane_isolates_failing_handlers_and_bad_envelopes(client, caplog):
+    bus = InMemoryBackplane()
+    got = []
+
+    async def broken(payload):
+        raise RuntimeError("boom")
+
+    async def good(payload):
+        got.append(payload)
+
+    bus.add_handler("deliver", broken)
+    bus.add_handler("deliver", good)
+
+    async def run():
+        await bus.publish("deliver", {"user_ids": [1]})
+        await bus._dispatch("not json")
+        await bus._dispatch(json.dumps({"payload": {}}))
+
+    with caplog.at_level("WARNING", logger="app.backplane"):
+        client.portal.call(run)
+    assert got == [{"user_ids": [1]}]
+    messages = [r.getMessage() for r in caplog.records]
+    assert any("handler for deliver failed" in m for m in messages)
+    assert sum("malformed backplane envelope" in m for m in messages) == 2
@@ -3,7 +3,7 @@ import type { Json, Listener } from "./wsTypes";
 
 export interface WsCtx {
   addListener: (fn: Listener) => () => void;
-  sendJson: (data: Json) => void;
+  sendJson: (data: Json) => boolean;
 }
 
 export const WebSocketContext = createContext<WsCtx | null>(null);
\ No newline at end of file
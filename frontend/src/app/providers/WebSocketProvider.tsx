@@ -1,27 +1,94 @@
 import React, { useEffect, useRef, useCallback } from "react";
 import { useAuth } from "./useAuth";
+import { apiFetch } from "../../utils/api";
 import type { Json, Listener } from "./wsTypes";
 import { WebSocketContext } from "./WebSocketContext";
 
+const RECONNECT_MAX_MS = 15000;
+
 export const WebSocketProvider: React.FC<{ children: React.ReactNode }> = ({ children }) => {
-  const { user } = useAuth();
+  const { user, logout } = useAuth();
   const wsRef = useRef<WebSocket | null>(null);
   const listenersRef = useRef<Set<Listener>>(new Set());
+  const seqRef = useRef<number | null>(null);
+  const logoutRef = useRef(logout);
+
+  useEffect(() => {
+    logoutRef.current = logout;
+  });
 
   useEffect(() => {
     if (!user) return;
+    const token = localStorage.getItem("access_token");
+    if (!token) return;
     const proto = location.protocol === "https:" ? "wss" : "ws";
-    const ws = new WebSocket(`${proto}://${location.host}/ws/${user.id}`);
-    wsRef.current = ws;
+    let stopped = false;
+    let attempt = 0;
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    seqRef.current = null;
 
-    ws.onmessage = evt => {
-      let parsed: unknown = evt.data;
-      try { parsed = JSON.parse(evt.data); } catch {/* raw */}
-      listenersRef.current.forEach(l => l({ data: parsed }));
+    const reconnect = () => {
+      const delay = Math.min(RECONNECT_MAX_MS, 500 * 2 ** attempt++) * (0.5 + Math.random() / 2);
+      timer = setTimeout(connect, delay);
     };
-    ws.onclose = () => { wsRef.current = null; };
+
+    const connect = () => {
+      let opened = false;
+      let url = `${proto}://${location.host}/ws/${user.id}?token=${encodeURIComponent(token)}`;
+      if (seqRef.current !== null) url += `&since_seq=${seqRef.current}`;
+      const ws = new WebSocket(url);
+      wsRef.current = ws;
+
+      ws.onopen = () => {
+        opened = true;
+        attempt = 0;
+        if (document.hidden) ws.send(JSON.stringify({ type: "presence", status: "away" }));
+      };
+      ws.onmessage = evt => {
+        let parsed: unknown = evt.data;
+        try { parsed = JSON.parse(evt.data); } catch {/* raw */}
+        const seq = (parsed as { seq?: unknown } | null)?.seq;
+        if (typeof seq === "number") seqRef.current = seq;
+        listenersRef.current.forEach(l => l({ data: parsed }));
+      };
+      ws.onclose = evt => {
+        if (wsRef.current === ws) wsRef.current = null;
+        if (stopped) return;
+        if (evt.code === 1008) {
+          logoutRef.current();
+          return;
+        }
+        if (opened) {
+          reconnect();
+          return;
+        }
+        // відхилене рукостискання браузер віддає як 1006 — перед повтором перевіряємо токен по HTTP
+        apiFetch("/users/me").then(
+          res => {
+            if (stopped) return;
+            if (res.status === 401 || res.status === 403) logoutRef.current();
+            else reconnect();
+          },
+          () => {
+            if (!stopped) reconnect();
+          },
+        );
+      };
+    };
+    connect();
+
+    const onVisibility = () => {
+      const ws = wsRef.current;
+      if (ws?.readyState !== WebSocket.OPEN) return;
+      ws.send(JSON.stringify({ type: "presence", status: document.hidden ? "away" : "online" }));
+    };
+    document.addEventListener("visibilitychange", onVisibility);
+
     return () => {
-      ws.close();
+      stopped = true;
+      document.removeEventListener("visibilitychange", onVisibility);
+      clearTimeout(timer);
+      wsRef.current?.close();
       wsRef.current = null;
     };
   }, [user]);
@@ -34,7 +101,9 @@ export const WebSocketProvider: React.FC<{ children: React.ReactNode }> = ({ chi
   const sendJson = useCallback((data: Json) => {
     if (wsRef.current?.readyState === WebSocket.OPEN) {
       wsRef.current.send(JSON.stringify(data));
+      return true;
     }
+    return false;
   }, []);
 
   return (
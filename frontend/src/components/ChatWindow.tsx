@@ -4,6 +4,8 @@ import { MessageList } from "../features/chat/components/MessageList";
 import { MessageComposer } from "../features/chat/components/MessageComposer";
 import { formatDate } from "../utils/formatDate";
 import { useChatController } from "../features/chat/hooks/useChatController";
+import { useConversations } from "../features/conversations/useConversations";
+import { usePeerPresence } from "../features/chat/hooks/usePeerPresence";
 import { DeleteMessageModal } from "../features/chat/components/DeleteMessageModal";
 import { DeleteAttachmentModal } from "../features/chat/components/DeleteAttachmentModal";
 
@@ -31,6 +33,10 @@ export default function ChatWindow({ conversationId, currentUser, peerUser }: Ch
     conversationId,
     currentUserId: currentUser.id
   });
+  const { presence, peerReadUpTo: receiptUpTo, notifyTyping, stopTyping } = usePeerPresence(conversationId, peerUser.id);
+  const { conversations } = useConversations();
+  const listedUpTo = conversations.find(conv => conv.id === conversationId)?.peer_last_read_message_id ?? null;
+  const peerReadUpTo = receiptUpTo === null ? listedUpTo : Math.max(receiptUpTo, listedUpTo ?? 0);
 
   useEffect(() => {
     if (!c.showScrollToBottom) {
@@ -49,7 +55,7 @@ export default function ChatWindow({ conversationId, currentUser, peerUser }: Ch
 
   return (
     <div className="flex flex-col h-full w-full min-h-0">
-      <ChatHeader peerUsername={peerUser.username} />
+      <ChatHeader peerUsername={peerUser.username} presence={presence} formatDate={formatDate} />
 
       <MessageList
         messages={c.messages}
@@ -74,12 +80,18 @@ export default function ChatWindow({ conversationId, currentUser, peerUser }: Ch
         onSaveEdit={c.saveEdit}
         onCancelEdit={c.cancelEdit}
         formatDate={formatDate}
+        peerReadUpTo={peerReadUpTo}
       />
 
       <MessageComposer
         value={c.messageText}
-        onChange={c.setMessageText}
+        onChange={text => {
+          c.setMessageText(text);
+          if (text.trim()) notifyTyping();
+          else stopTyping();
+        }}
         onSend={e => {
+          stopTyping();
           void c.sendMessage(e as React.FormEvent);
         }}
         pending={c.pending}
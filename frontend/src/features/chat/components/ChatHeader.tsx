@@ -1,12 +1,26 @@
 import React from "react";
+import type { PeerPresence } from "../hooks/usePeerPresence";
 
 interface ChatHeaderProps {
   peerUsername: string;
+  presence: PeerPresence;
+  formatDate: (raw: string | null | undefined) => string;
 }
-export const ChatHeader: React.FC<ChatHeaderProps> = ({ peerUsername }) => (
+
+function presenceLabel(presence: PeerPresence, formatDate: ChatHeaderProps["formatDate"]) {
+  if (presence.typing) return "друкує…";
+  if (presence.status === "online") return "у мережі";
+  if (presence.status === "away") return "неактивний";
+  return presence.lastSeen ? `був(ла) у мережі ${formatDate(presence.lastSeen)}` : "не в мережі";
+}
+
+export const ChatHeader: React.FC<ChatHeaderProps> = ({ peerUsername, presence, formatDate }) => (
   <div className="flex justify-between items-center px-4 py-5 border-b bg-white">
     <div className="font-semibold">
       Бесіда з: {peerUsername || "Користувач невідомий"}
     </div>
+    <div className={`text-sm ${presence.status === "online" || presence.typing ? "text-green-600" : "text-gray-500"}`}>
+      {presenceLabel(presence, formatDate)}
+    </div>
   </div>
-);
\ No newline at end of file
+);
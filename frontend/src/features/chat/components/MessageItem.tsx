@@ -15,6 +15,7 @@ interface MessageItemProps {
   onSaveEdit: (m: ChatMessage) => void;
   onCancelEdit: () => void;
   formatDate: (s: string | null | undefined) => string;
+  peerReadUpTo: number | null;
 }
 
 export const MessageItem: React.FC<MessageItemProps> = ({
@@ -29,7 +30,8 @@ export const MessageItem: React.FC<MessageItemProps> = ({
   onEditingTextChange,
   onSaveEdit,
   onCancelEdit,
-  formatDate
+  formatDate,
+  peerReadUpTo
 }) => {
   const mine = message.sender_id === currentUserId;
   const editing = editingId === message.id;
@@ -85,6 +87,7 @@ export const MessageItem: React.FC<MessageItemProps> = ({
       ) : null}
       <div className="flex items-center gap-2 mt-1 text-[10px] text-gray-400">
         <span>{formatDate(message.created_at)}</span>
+        {mine && peerReadUpTo !== null && message.id <= peerReadUpTo && <span>Прочитано</span>}
         {mine && !editing && (
           <button
             type="button"
@@ -23,6 +23,7 @@ interface MessageListProps {
   onSaveEdit: (m: ChatMessage) => void;
   onCancelEdit: () => void;
   formatDate: (s: string | null | undefined) => string;
+  peerReadUpTo: number | null;
 }
 
 export const MessageList: React.FC<MessageListProps> = ({
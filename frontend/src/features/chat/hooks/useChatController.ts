@@ -50,8 +50,8 @@ export function useChatController({ conversationId, currentUserId }: UseChatCont
   } = useSendMessage({
     conversationId,
     pending,
-    afterSuccess: () => {
-      reload();
+    afterSuccess: viaHttp => {
+      if (viaHttp) reload();
       requestAnimationFrame(() => scrollToBottom(true));
     }
   });
@@ -99,7 +99,8 @@ export function useChatController({ conversationId, currentUserId }: UseChatCont
     },
     onOtherConversationUpdated: () => refresh(),
     setActiveUnreadZero: () => setUnreadZero(conversationId),
-    onRemoveMessage: (id: number) => removeMessage(id)
+    onRemoveMessage: (id: number) => removeMessage(id),
+    onResync: () => reload()
   });
 
   useEffect(() => {
@@ -17,6 +17,10 @@ interface WsMessageDeletedEvent {
   conversation_id: number | string;
   message_id: number | string;
 }
+interface WsResyncRequiredEvent {
+  type: "resync_required";
+  seq: number;
+}
 interface WsMessageEditedEvent {
   type: "message_edited";
   conversation_id: number | string;
@@ -27,7 +31,8 @@ type KnownWsEvent =
   | WsNewMessageEvent
   | WsConversationUpdatedEvent
   | WsMessageDeletedEvent
-  | WsMessageEditedEvent;
+  | WsMessageEditedEvent
+  | WsResyncRequiredEvent;
 
 function isKnownWsEvent(data: unknown): data is KnownWsEvent {
   if (!data || typeof data !== "object") return false;
@@ -36,7 +41,8 @@ function isKnownWsEvent(data: unknown): data is KnownWsEvent {
     t === "new_message" ||
     t === "conversation_updated" ||
     t === "message_deleted" ||
-    t === "message_edited"
+    t === "message_edited" ||
+    t === "resync_required"
   );
 }
 
@@ -47,6 +53,7 @@ interface UseChatWsParams {
   onOtherConversationUpdated: () => void;
   setActiveUnreadZero: () => void;
   onRemoveMessage: (id: number) => void;
+  onResync: () => void;
 }
 
 export function useChatWs({
@@ -55,7 +62,8 @@ export function useChatWs({
   onActiveConversationMessage,
   onOtherConversationUpdated,
   setActiveUnreadZero,
-  onRemoveMessage
+  onRemoveMessage,
+  onResync
 }: UseChatWsParams) {
   const { addListener } = useWs();
   const { refresh } = useConversations();
@@ -102,6 +110,10 @@ export function useChatWs({
           refresh();
           break;
         }
+        case "resync_required": {
+          onResync();
+          break;
+        }
       }
     });
     return off;
@@ -113,6 +125,7 @@ export function useChatWs({
     onOtherConversationUpdated,
     setActiveUnreadZero,
     onRemoveMessage,
+    onResync,
     refresh
   ]);
 }
\ No newline at end of file
@@ -26,6 +26,8 @@ interface PageResponse {
   items: ChatMessage[];
   has_more: boolean;
   next_before_id: number | null;
+  has_more_after: boolean;
+  next_after_id: number | null;
 }
 
 const PAGE_SIZE = 20;
@@ -0,0 +1,79 @@
+import { useCallback, useEffect, useRef, useState } from "react";
+import { useWs } from "../../../app/providers/useWs";
+
+export type PresenceStatus = "online" | "away" | "offline";
+
+export interface PeerPresence {
+  status: PresenceStatus;
+  lastSeen: string | null;
+  typing: boolean;
+}
+
+const TYPING_REPEAT_MS = 3000;
+
+interface PresenceSnapshot {
+  status: PresenceStatus;
+  last_seen: string | null;
+}
+
+export function usePeerPresence(conversationId: number, peerId: number) {
+  const { addListener, sendJson } = useWs();
+  const [presence, setPresence] = useState<PeerPresence>({ status: "offline", lastSeen: null, typing: false });
+  const [peerReadUpTo, setPeerReadUpTo] = useState<number | null>(null);
+  const typingSentAt = useRef(0);
+
+  useEffect(() => {
+    setPresence({ status: "offline", lastSeen: null, typing: false });
+    setPeerReadUpTo(null);
+    const subscribe = () => sendJson({ type: "presence_subscribe", user_ids: [peerId] });
+    subscribe();
+    const off = addListener(evt => {
+      const data = evt.data as {
+        type?: string;
+        command?: string;
+        user_id?: number;
+        conversation_id?: number;
+        started?: number[];
+        stopped?: number[];
+        up_to_message_id?: number;
+        presence?: Record<string, PresenceSnapshot>;
+      } & Partial<PresenceSnapshot>;
+      if (!data || typeof data !== "object") return;
+      // підписки живуть у з'єднанні, після перепідключення їх треба відновити
+      if (data.type === "sync" || data.type === "resync_required") {
+        subscribe();
+      } else if (data.type === "ack" && data.command === "presence_subscribe") {
+        const snap = data.presence?.[String(peerId)];
+        if (snap) setPresence(p => ({ ...p, status: snap.status, lastSeen: snap.last_seen }));
+      } else if (data.type === "presence" && data.user_id === peerId) {
+        setPresence(p => ({
+          status: data.status ?? p.status,
+          lastSeen: data.last_seen ?? p.lastSeen,
+          typing: data.status === "offline" ? false : p.typing
+        }));
+      } else if (data.type === "typing" && data.conversation_id === conversationId) {
+        if (data.started?.includes(peerId)) setPresence(p => ({ ...p, typing: true }));
+        if (data.stopped?.includes(peerId)) setPresence(p => ({ ...p, typing: false }));
+      } else if (data.type === "read_receipt" && data.conversation_id === conversationId && data.user_id === peerId) {
+        const upTo = data.up_to_message_id;
+        if (typeof upTo === "number") setPeerReadUpTo(prev => (prev === null ? upTo : Math.max(prev, upTo)));
+      }
+    });
+    return () => { off(); };
+  }, [addListener, sendJson, conversationId, peerId]);
+
+  const notifyTyping = useCallback(() => {
+    const now = Date.now();
+    if (now - typingSentAt.current < TYPING_REPEAT_MS) return;
+    typingSentAt.current = now;
+    sendJson({ type: "typing", conversation_id: conversationId });
+  }, [sendJson, conversationId]);
+
+  const stopTyping = useCallback(() => {
+    if (!typingSentAt.current) return;
+    typingSentAt.current = 0;
+    sendJson({ type: "typing", conversation_id: conversationId, active: false });
+  }, [sendJson, conversationId]);
+
+  return { presence, peerReadUpTo, notifyTyping, stopTyping };
+}
@@ -1,31 +1,76 @@
 import { useState } from "react";
 import { apiFetch } from "../../../utils/api";
+import { useWs } from "../../../app/providers/useWs";
 import type { PendingFilesApi } from "./useAttachments.js";
 
 interface Options {
   conversationId: number;
   pending: PendingFilesApi;
-  afterSuccess: () => void;
+  afterSuccess: (viaHttp: boolean) => void;
+}
+
+const WS_ACK_TIMEOUT_MS = 5000;
+
+function newClientMsgId() {
+  return typeof crypto !== "undefined" && "randomUUID" in crypto
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
 }
 
 export function useSendMessage({ conversationId, pending, afterSuccess }: Options) {
   const [text, setText] = useState("");
   const [sending, setSending] = useState(false);
+  const { addListener, sendJson } = useWs();
+
+  function sendOverWs(content: string, clientMsgId: string): Promise<boolean> {
+    return new Promise(resolve => {
+      let off: () => void = () => {};
+      const timer = setTimeout(() => { off(); resolve(false); }, WS_ACK_TIMEOUT_MS);
+      off = addListener(evt => {
+        const data = evt.data as { type?: string; client_msg_id?: string };
+        if (data?.client_msg_id !== clientMsgId) return;
+        if (data.type !== "ack" && data.type !== "error") return;
+        clearTimeout(timer);
+        off();
+        resolve(data.type === "ack");
+      });
+      const sent = sendJson({
+        type: "send",
+        conversation_id: conversationId,
+        content,
+        client_msg_id: clientMsgId
+      });
+      if (!sent) {
+        clearTimeout(timer);
+        off();
+        resolve(false);
+      }
+    });
+  }
+
+  async function sendOverHttp(content: string, clientMsgId: string) {
+    const form = new FormData();
+    form.append("conversation_id", String(conversationId));
+    form.append("content", content);
+    form.append("client_msg_id", clientMsgId);
+    pending.files.forEach((f: File) => form.append("files", f));
+    const res = await apiFetch("/messages/send", { method: "POST", body: form });
+    return res.ok;
+  }
 
   async function send(e?: React.FormEvent) {
     if (e) e.preventDefault();
-    if (!text.trim() && pending.files.length === 0) return;
+    const content = text.trim();
+    if (!content && pending.files.length === 0) return;
     setSending(true);
     try {
-      const form = new FormData();
-      form.append("conversation_id", String(conversationId));
-      form.append("content", text.trim());
-      pending.files.forEach((f: File) => form.append("files", f));
-      const res = await apiFetch("/messages/send", { method: "POST", body: form });
-      if (res.ok) {
+      const clientMsgId = newClientMsgId();
+      const viaWs = pending.files.length === 0 && (await sendOverWs(content, clientMsgId));
+      const ok = viaWs || (await sendOverHttp(content, clientMsgId));
+      if (ok) {
         setText("");
         pending.clear();
-        afterSuccess();
+        afterSuccess(!viaWs);
       }
     } finally {
       setSending(false);
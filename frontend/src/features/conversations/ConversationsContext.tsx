@@ -6,6 +6,7 @@ export interface Conversation {
   last_message: string | null;
   last_message_at: string | null;
   last_message_id?: number | null;
+  peer_last_read_message_id?: number | null;
   user: { id: number; username: string; gender?: string };
 }
 
@@ -14,6 +14,7 @@ interface BackendConversationItem {
   last_message_preview: string | null;
   last_message_at: string | null;
   unread_count: number;
+  peer_last_read_message_id?: number | null;
 }
 
 interface ConversationUpdatedWs {
@@ -50,6 +51,7 @@ const ConversationsProvider: React.FC<{ children: React.ReactNode }> = ({ childr
     last_message: b.last_message_preview ?? null,
     last_message_at: b.last_message_at ?? null,
     last_message_id: b.last_message_id ?? null,
+    peer_last_read_message_id: b.peer_last_read_message_id ?? null,
     user: {
       id: b.peer_id,
       username: b.peer_username,
@@ -141,7 +143,9 @@ const ConversationsProvider: React.FC<{ children: React.ReactNode }> = ({ childr
       const data = evt.data as WsInbound;
       if (!data || typeof data !== "object") return;
       const type = (data as { type?: unknown }).type;
-      if (type === "conversation_updated") {
+      if (type === "resync_required") {
+        refresh();
+      } else if (type === "conversation_updated") {
         const ev = data as ConversationUpdatedWs;
         updateConversation({
           id: ev.conversation_id,
@@ -165,7 +169,7 @@ const ConversationsProvider: React.FC<{ children: React.ReactNode }> = ({ childr
       }
     });
     return off;
-  }, [addListener, updateConversation]);
+  }, [addListener, updateConversation, refresh]);
 
   const value: ConversationsCtx = {
     conversations,